@@ -0,0 +1,185 @@
+import contextvars
+import gzip
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import orjson
+from pydantic import BaseModel
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# =========================
+# API RESPONSE ENCODING
+# =========================
+# - FastJSONResponse (the app's default response class) renders with
+#   orjson: datetimes, NumPy arrays / scalars and non-str keys natively,
+#   NaN / inf as null. Routes that return a Response themselves (the
+#   response cache) also skip FastAPI's jsonable_encoder pass.
+# - MessagePackMiddleware: a client sending Accept: application/msgpack
+#   gets MessagePack instead of JSON (when msgpack is installed).
+# - CompressionMiddleware: brotli (when installed) or gzip for bodies of
+#   at least COMPRESS_MIN_BYTES, per Accept-Encoding.
+#
+# Payload sizes and timings: python debug/response_benchmark.py
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+COMPRESSIBLE_TYPES = ("application/json", MSGPACK_MEDIA_TYPE, "text/")
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+_wants_msgpack = contextvars.ContextVar("wants_msgpack", default=False)
+
+
+def _default(obj):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    # bson ObjectId and anything else with a plain string form
+    if type(obj).__name__ == "ObjectId":
+        return str(obj)
+    raise TypeError(f"Type is not serializable: {type(obj).__name__}")
+
+
+def dumps_json(content):
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+def dumps_msgpack(content):
+    return msgpack.packb(content, default=_default, use_bin_type=True)
+
+
+def response_format():
+    """
+    Media type the current request negotiated.
+    """
+    return MSGPACK_MEDIA_TYPE if _wants_msgpack.get() else "application/json"
+
+
+def render(content):
+    """
+    (body, media_type) for the current request's format.
+    """
+    if _wants_msgpack.get():
+        return dumps_msgpack(content), MSGPACK_MEDIA_TYPE
+    return dumps_json(content), "application/json"
+
+
+class FastJSONResponse(JSONResponse):
+
+    def render(self, content):
+        body, self.media_type = render(content)
+        return body
+
+
+class MessagePackMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or msgpack is None:
+            return await self.app(scope, receive, send)
+
+        accept = Headers(scope=scope).get("accept", "")
+        token = _wants_msgpack.set(MSGPACK_MEDIA_TYPE in accept)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _wants_msgpack.reset(token)
+
+
+def _encoding(accept_encoding):
+    accepted = {e.split(";")[0].strip().lower() for e in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """
+    Compresses complete (single-message) responses; streamed responses
+    pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        encoding = _encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        streaming = False
+
+        async def send_compressed(message):
+            nonlocal start, streaming
+
+            if message["type"] == "http.response.start":
+                start = message
+                return
+
+            if message["type"] != "http.response.body" or streaming:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                streaming = True
+                await send(start)
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            content_type = headers.get("content-type", "")
+            if (
+                len(body) >= self.minimum_size
+                and "content-encoding" not in headers
+                and content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                if "accept-encoding" not in headers.get("vary", "").lower():
+                    headers.add_vary_header("Accept-Encoding")
+
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,13 +1,21 @@
+import os
 import subprocess
 import sys
 from datetime import datetime
 from pathlib import Path
 
+import certifi
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
 # =========================
 # PROJECT ROOT
 # =========================
 ROOT = Path(__file__).resolve().parents[1]
 
+sys.path.append(str(ROOT))
+from data_version import bump_data_version
+
 # =========================
 # SCRIPT PATHS (EXACT)
 # =========================
@@ -19,6 +27,12 @@ SCRIPTS = [
     # 🔴 Fund NAV
     ROOT / "data_ingestion" / "amfi" / "store_nav.py",
 
+    # 🔴 Month-end collections: first full rebuild (no-op once done)
+    (ROOT / "data_ingestion" / "nav_monthly.py", "--if-missing"),
+
+    # 🔴 Local NAV matrix (mmap, read by Phase-3A/3B/3C)
+    ROOT / "scoring" / "nav_matrix.py",
+
     # 🔴 Phase-3A
     ROOT / "scoring" / "large_cap_score_phase3a.py",
 
@@ -29,7 +43,10 @@ SCRIPTS = [
     ROOT / "scoring" / "large_cap_score_phase3c.py",
     
     # 🔴 Phase-normalization
-    ROOT / "scoring" / "normalise_sub_scores.py"
+    ROOT / "scoring" / "normalise_sub_scores.py",
+
+    # 🔴 Fund cards (detail page view)
+    ROOT / "scoring" / "build_fund_card.py"
 ]
 
 
@@ -41,10 +58,10 @@ def log(msg):
     print(f"[{ts} UTC] {msg}")
 
 
-def run(script_path: Path):
-    log(f"▶ Running {script_path.name}")
+def run(script_path: Path, *args):
+    log(f"▶ Running {script_path.name} {' '.join(args)}".rstrip())
     result = subprocess.run(
-        [sys.executable, str(script_path)],
+        [sys.executable, str(script_path), *args],
         capture_output=True,
         text=True
     )
@@ -64,10 +81,17 @@ def run(script_path: Path):
 def main():
     log("🚀 DAILY PIPELINE STARTED")
 
-    for script in SCRIPTS:
+    for entry in SCRIPTS:
+        script, *args = entry if isinstance(entry, tuple) else (entry,)
         if not script.exists():
             raise FileNotFoundError(f"Missing script: {script}")
-        run(script)
+        run(script, *args)
+
+    # new data is live: the API drops its cached responses
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI"), tlsCAFile=certifi.where())
+    version = bump_data_version(client[os.getenv("DB_NAME", "mfscreener")], "daily_pipeline")
+    log(f"🔖 Data version {version}")
 
     log("🏁 DAILY PIPELINE FINISHED SUCCESSFULLY")
 
@@ -0,0 +1,304 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+from nav_bulk import DEFAULT_BATCH_SIZE, load_nav_span, bulk_upsert_nav
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from nav_monthly import MonthEndTracker, upsert_month_ends
+
+# =========================
+# CONFIG
+# =========================
+# Point MFAPI_BASE_URL at a local stand-in (e.g. http://127.0.0.1:8000)
+# to exercise the engine without hitting api.mfapi.in.
+MFAPI_BASE_URL = os.getenv("MFAPI_BASE_URL", "https://api.mfapi.in")
+CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "8"))
+RATE_PER_SEC = float(os.getenv("BACKFILL_RATE_PER_SEC", "5"))
+MAX_RETRIES = 3
+TIMEOUT = 20
+
+# A scheme whose stored NAVs span fewer days than this (e.g. only the
+# daily AMFI rows written since it was listed) gets its full history
+# fetched; otherwise only dates after the latest stored NAV.
+FULL_HISTORY_SPAN_DAYS = int(os.getenv("BACKFILL_FULL_HISTORY_SPAN_DAYS", "30"))
+
+CHECKPOINT_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "checkpoints"
+)
+
+
+# =========================
+# RATE LIMITER
+# =========================
+class TokenBucket:
+    """
+    Async token bucket: `rate` requests per second on average,
+    bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# =========================
+# CHECKPOINT
+# =========================
+class Checkpoint:
+    """
+    Append-only per-scheme progress log (JSON lines):
+    {"scheme_code", "status", "last_date", "points", "updated_at"}
+    The last line for a scheme wins. Schemes marked "done" are
+    skipped when a run is resumed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        continue   # torn last line after a crash
+                    self.state[row["scheme_code"]] = row
+
+    def is_done(self, scheme_code):
+        return self.state.get(scheme_code, {}).get("status") == "done"
+
+    def mark(self, scheme_code, status, last_date=None, points=0):
+        row = {
+            "scheme_code": scheme_code,
+            "status": status,
+            "last_date": last_date,
+            "points": points,
+            "updated_at": datetime.utcnow().isoformat()
+        }
+        self.state[scheme_code] = row
+
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row) + "\n")
+
+    def clear(self):
+        self.state = {}
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def checkpoint_path_for(name):
+    safe = "".join(c if c.isalnum() else "_" for c in name).strip("_").lower()
+    return os.path.join(CHECKPOINT_DIR, f"backfill_{safe}.jsonl")
+
+
+# =========================
+# MFAPI
+# =========================
+def parse_mfapi_history(payload, after=None, before=None):
+    """
+    MFAPI rows ({"date": "dd-mm-YYYY", "nav": "123.45"}) -> NAV records,
+    keeping only dates strictly after `after` or strictly before
+    `before` (YYYY-MM-DD).
+    """
+    records = []
+
+    for item in payload.get("data", []):
+        try:
+            nav = float(item["nav"])
+            nav_date = datetime.strptime(item["date"], "%d-%m-%Y").date().isoformat()
+        except Exception:
+            continue
+
+        if after and nav_date <= after and not (before and nav_date < before):
+            continue
+
+        records.append({"date": nav_date, "nav": nav})
+
+    return records
+
+
+async def fetch_history(client, bucket, scheme_code, after=None, before=None):
+    """
+    NAV records after `after`; with `before` set, the full history is
+    requested and dates before `before` are kept as well.
+    """
+    params = {}
+    if after and not before:
+        start = date.fromisoformat(after) + timedelta(days=1)
+        params = {"startDate": start.isoformat(), "endDate": date.today().isoformat()}
+
+    last_error = None
+
+    for attempt in range(1, MAX_RETRIES + 1):
+        await bucket.acquire()
+        try:
+            resp = await client.get(f"/mf/{scheme_code}", params=params)
+            if resp.status_code == 429 or resp.status_code >= 500:
+                raise httpx.HTTPStatusError(
+                    f"HTTP {resp.status_code}", request=resp.request, response=resp
+                )
+            if resp.status_code >= 400:
+                # unknown scheme etc. -- retrying will not help
+                raise RuntimeError(f"MFAPI returned HTTP {resp.status_code}")
+            return parse_mfapi_history(resp.json(), after=after, before=before)
+        except (httpx.HTTPError, ValueError) as e:
+            last_error = e
+            if attempt < MAX_RETRIES:
+                await asyncio.sleep(2 ** (attempt - 1))
+
+    raise RuntimeError(f"MFAPI fetch failed for {scheme_code}") from last_error
+
+
+# =========================
+# ENGINE
+# =========================
+async def backfill_schemes(
+    scheme_codes,
+    nav_col,
+    base_url=MFAPI_BASE_URL,
+    concurrency=CONCURRENCY,
+    rate_per_sec=RATE_PER_SEC,
+    checkpoint_path=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    monthly_col=None,
+    full_history=False,
+):
+    """
+    Backfills nav_history for `scheme_codes` from MFAPI.
+
+    - one pooled HTTP client, `concurrency` schemes in flight,
+      requests paced by a token bucket at `rate_per_sec`
+    - only dates after the latest stored NAV are requested / written,
+      unless the stored history is shorter than FULL_HISTORY_SPAN_DAYS
+      (or full_history=True): then the full MFAPI history is requested
+      and dates before the earliest stored NAV are written too
+    - writes go through unordered bulk upserts; month-ends of the
+      months written are refreshed in `monthly_col` (nav_monthly) per
+      scheme, before it is checkpointed
+    - a scheme with failed upserts is checkpointed "failed" and its
+      failed rows counted in stats["failed"]
+    - progress is checkpointed per scheme; an interrupted run resumes
+      from the checkpoint, a clean run removes it
+    """
+    scheme_codes = list(dict.fromkeys(scheme_codes))
+    checkpoint = Checkpoint(checkpoint_path)
+
+    pending = [c for c in scheme_codes if not checkpoint.is_done(c)]
+    resumed = len(scheme_codes) - len(pending)
+
+    stats = {
+        "schemes": len(scheme_codes),
+        "resumed_skip": resumed,
+        "up_to_date": 0,
+        "inserted": 0,
+        "updated": 0,
+        "failed": 0,
+    }
+
+    if not pending:
+        print("✔ Nothing to do (all schemes done in checkpoint)")
+        checkpoint.clear()
+        return stats
+
+    spans = await asyncio.to_thread(load_nav_span, nav_col, pending)
+
+    bucket = TokenBucket(rate_per_sec)
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    if monthly_col is not None:
+        stats["month_ends"] = 0
+
+    async def run_one(client, scheme_code):
+        async with semaphore:
+            first, after = spans.get(scheme_code, (None, None))
+            before = None
+            if first and (full_history or (
+                date.fromisoformat(after) - date.fromisoformat(first)
+            ).days < FULL_HISTORY_SPAN_DAYS):
+                before = first
+            try:
+                records = await fetch_history(client, bucket, scheme_code, after, before)
+                for r in records:
+                    r["scheme_code"] = scheme_code
+
+                if not records:
+                    stats["up_to_date"] += 1
+                    checkpoint.mark(scheme_code, "done", last_date=after)
+                    return
+
+                written = await asyncio.to_thread(
+                    bulk_upsert_nav, nav_col, records, "MFAPI", batch_size
+                )
+                stats["inserted"] += written["inserted"]
+                stats["updated"] += written["updated"]
+
+                if written["failed"]:
+                    # not "done": a resumed run re-fetches the scheme
+                    stats["failed"] += written["failed"]
+                    checkpoint.mark(scheme_code, "failed", last_date=after)
+                    print(f"❌ {scheme_code}: {written['failed']} NAV upserts failed")
+                    return
+
+                # month-ends go in before the scheme is checkpointed, so
+                # a resumed run never skips a scheme missing them
+                if monthly_col is not None:
+                    month_ends = MonthEndTracker("scheme_code")
+                    for r in records:
+                        month_ends.add(scheme_code, r["date"], r["nav"])
+                    stats["month_ends"] += await asyncio.to_thread(
+                        upsert_month_ends, monthly_col, "scheme_code", month_ends
+                    )
+
+                checkpoint.mark(
+                    scheme_code, "done",
+                    last_date=max([r["date"] for r in records] + ([after] if after else [])),
+                    points=len(records)
+                )
+            except Exception as e:
+                stats["failed"] += 1
+                checkpoint.mark(scheme_code, "failed", last_date=after)
+                print(f"❌ {scheme_code} failed: {e}")
+
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=TIMEOUT
+    ) as client:
+        await asyncio.gather(*(run_one(client, c) for c in pending))
+
+    if stats["failed"] == 0:
+        checkpoint.clear()
+
+    return stats
+
+
+def run_backfill(scheme_codes, nav_col, **kwargs):
+    return asyncio.run(backfill_schemes(scheme_codes, nav_col, **kwargs))
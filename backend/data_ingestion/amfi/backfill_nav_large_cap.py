@@ -1,20 +1,17 @@
-import time
-import requests
-from datetime import datetime
+import sys
 from pymongo import MongoClient, ASCENDING
 import os
 from dotenv import load_dotenv
 import certifi
 
+from backfill_engine import run_backfill, checkpoint_path_for, Checkpoint
+
 load_dotenv()
 
 # ---------- CONFIG ----------
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME", "mfscreener")
 
-MFAPI_URL = "https://api.mfapi.in/mf/{}"
-RATE_LIMIT_SECONDS = 0.3
-
 # ---------- DB ----------
 client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
 db = client[DB_NAME]
@@ -28,63 +25,45 @@ nav_col.create_index(
 )
 
 
-def backfill_nav_for_category(category):
+def backfill_nav_for_category(category, fresh=False, full_history=False):
+    """
+    Backfills MFAPI history for every scheme of `category`.
+    Interrupted runs resume from the category checkpoint unless fresh=True.
+    full_history=True re-requests every scheme's full history to fill
+    gaps before the earliest stored NAV.
+    """
     print(f"\n🔹 Starting NAV backfill for category: {category}")
 
-    schemes = list(
-        funds_col.find(
+    schemes = [
+        f["scheme_code"]
+        for f in funds_col.find(
             {"category": category},
             {"scheme_code": 1, "_id": 0}
         )
-    )
+    ]
 
     print(f"✔ Found {len(schemes)} schemes")
 
-    inserted = skipped = failed = 0
-
-    for fund in schemes:
-        scheme_code = fund["scheme_code"]
-        url = MFAPI_URL.format(scheme_code)
-
-        try:
-            resp = requests.get(url, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
-
-            nav_list = data.get("data", [])
-            if not nav_list:
-                continue
+    checkpoint_path = checkpoint_path_for(category)
+    if fresh:
+        Checkpoint(checkpoint_path).clear()
 
-            for item in nav_list:
-                try:
-                    nav = float(item["nav"])
-                    date = datetime.strptime(
-                        item["date"], "%d-%m-%Y"
-                    ).date().isoformat()
-                except Exception:
-                    continue
-
-                try:
-                    nav_col.insert_one({
-                        "scheme_code": scheme_code,
-                        "date": date,
-                        "nav": nav,
-                        "source": "MFAPI"
-                    })
-                    inserted += 1
-                except Exception:
-                    skipped += 1
-
-            time.sleep(RATE_LIMIT_SECONDS)
-
-        except Exception as e:
-            failed += 1
-            print(f"❌ {scheme_code} failed: {e}")
+    stats = run_backfill(
+        schemes, nav_col,
+        checkpoint_path=checkpoint_path,
+        monthly_col=db.nav_monthly,
+        full_history=full_history
+    )
 
     print(f"✅ {category} backfill complete")
-    print(f"Inserted: {inserted}")
-    print(f"Skipped: {skipped}")
-    print(f"Failed: {failed}")
+    print(f"Resumed (already done): {stats['resumed_skip']}")
+    print(f"Up to date: {stats['up_to_date']}")
+    print(f"Inserted: {stats['inserted']}")
+    print(f"Updated: {stats['updated']}")
+    print(f"Failed: {stats['failed']}")
+    print(f"Month-ends refreshed: {stats.get('month_ends', 0)}")
+    if stats["failed"]:
+        print(f"Checkpoint kept at {checkpoint_path} -- rerun to retry failures")
 
 EQUITY_CATEGORIES = [
    
@@ -92,7 +71,7 @@ EQUITY_CATEGORIES = [
 ]
 
 if __name__ == "__main__":
+    fresh = "--fresh" in sys.argv
+    full_history = "--full-history" in sys.argv
     for category in EQUITY_CATEGORIES:
-        backfill_nav_for_category(category)
-
-
+        backfill_nav_for_category(category, fresh=fresh, full_history=full_history)
@@ -1,11 +1,16 @@
 import os
 import re
+import sys
 from datetime import datetime
+from pathlib import Path
 from pymongo import MongoClient
-from fetch_nav import fetch_amfi_nav
+from fetch_nav import download_amfi_snapshot, read_snapshot_lines
 from dotenv import load_dotenv
 import certifi
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from publish import publish_collection
+
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
@@ -84,7 +89,8 @@ def parse_category_header(line: str):
 def build_fund_master():
     print("🔹 Building Fund Master from AMFI NAV data...")
 
-    lines = fetch_amfi_nav()
+    # Shares the day's snapshot with store_nav (no second download)
+    snapshot = download_amfi_snapshot()
 
     current_asset_class = None
     current_category = None
@@ -96,10 +102,10 @@ def build_fund_master():
     unknown_category = 0
     raw_scheme_lines = 0
 
-    # CLEAN REBUILD
-    db.fund_master.delete_many({})
+    # CLEAN REBUILD (staged, swapped in at the end; last row per code wins)
+    docs = {}
 
-    for raw in lines:
+    for raw in read_snapshot_lines(snapshot):
         line = raw.strip()
         if not line:
             continue
@@ -152,14 +158,15 @@ def build_fund_master():
             "updated_at": datetime.utcnow(),
         }
 
-        db.fund_master.update_one(
-            {"scheme_code": scheme_code},
-            {"$set": doc},
-            upsert=True
-        )
+        docs[scheme_code] = doc
 
         processed += 1
 
+    publish_collection(
+        db, "fund_master", docs.values(),
+        indexes=[("scheme_code", {"unique": True}), ("category", {})]
+    )
+
     print("✅ Fund Master Build Complete")
     print(f"✔ Raw scheme lines seen: {raw_scheme_lines}")
     print(f"✔ Schemes processed: {processed}")
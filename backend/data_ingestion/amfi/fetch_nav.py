@@ -1,23 +1,136 @@
+import gzip
+import json
+import os
 import requests
 import time
+from datetime import date, timedelta
 
 AMFI_URL = "https://portal.amfiindia.com/spages/NAVAll.txt"
 
-def fetch_amfi_nav(retries=3, timeout=30):
+# =========================
+# SNAPSHOT CACHE
+# =========================
+# One compressed NAVAll.txt per day, shared by every consumer of a
+# pipeline run (store_nav, build_fund_master, ...). A snapshot checked
+# within AMFI_SNAPSHOT_MAX_AGE seconds is reused as-is; after that a
+# conditional GET revalidates it, so a later same-day run still picks
+# up AMFI's evening publish.
+SNAPSHOT_DIR = os.getenv(
+    "AMFI_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
+)
+SNAPSHOT_KEEP_DAYS = int(os.getenv("AMFI_SNAPSHOT_KEEP_DAYS", "7"))
+SNAPSHOT_MAX_AGE = int(os.getenv("AMFI_SNAPSHOT_MAX_AGE", "600"))
+META_FILE = os.path.join(SNAPSHOT_DIR, "NAVAll.meta.json")
+
+
+def _snapshot_path(day):
+    return os.path.join(SNAPSHOT_DIR, f"NAVAll_{day.isoformat()}.txt.gz")
+
+
+def _load_meta():
+    try:
+        with open(META_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_meta(meta):
+    tmp = META_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, META_FILE)
+
+
+def _prune_snapshots(keep):
+    cutoff = (date.today() - timedelta(days=SNAPSHOT_KEEP_DAYS)).isoformat()
+    for name in os.listdir(SNAPSHOT_DIR):
+        path = os.path.join(SNAPSHOT_DIR, name)
+        if not name.startswith("NAVAll_") or path == keep:
+            continue
+        if name[len("NAVAll_"):len("NAVAll_") + 10] < cutoff:
+            os.remove(path)
+
+
+def _stream_to_snapshot(response, path):
     """
-    Fetches AMFI NAVAll.txt with retry & timeout protection.
-    Returns list of lines (same as original behavior).
+    Streams the response body line by line into a gzip file.
+    Written to a temp file first so a broken download never
+    replaces a good snapshot.
+    """
+    tmp = path + ".part"
+    response.encoding = response.encoding or "utf-8"
+
+    lines = 0
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        for line in response.iter_lines(decode_unicode=True):
+            f.write(line)
+            f.write("\n")
+            lines += 1
+
+    os.replace(tmp, path)
+    return lines
+
+
+def download_amfi_snapshot(retries=3, timeout=30, force=False):
+    """
+    Returns the path of today's compressed NAVAll.txt snapshot.
+
+    - checked < SNAPSHOT_MAX_AGE seconds ago -> cached snapshot, no network
+    - otherwise conditional GET (If-None-Match / If-Modified-Since)
+        304 -> previous snapshot is reused
+        200 -> body streamed into a new dated snapshot
     """
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+
+    meta = _load_meta()
+    cached = meta.get("snapshot")
+
+    if (
+        not force
+        and time.time() - meta.get("checked_at", 0) < SNAPSHOT_MAX_AGE
+        and cached and os.path.exists(cached)
+    ):
+        print(f"Using cached AMFI snapshot: {os.path.basename(cached)}")
+        return cached
+
+    headers = {}
+    if not force and cached and os.path.exists(cached):
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
 
     last_error = None
 
     for attempt in range(1, retries + 1):
         try:
             print(f"Attempt {attempt}: Fetching AMFI NAV data...")
-            response = requests.get(AMFI_URL, timeout=timeout)
-            response.raise_for_status()
+            with requests.get(
+                AMFI_URL, headers=headers, timeout=timeout, stream=True
+            ) as response:
+
+                if response.status_code == 304:
+                    print("AMFI NAV file not modified. Reusing previous snapshot.")
+                    meta["checked_at"] = time.time()
+                    _save_meta(meta)
+                    return cached
+
+                response.raise_for_status()
 
-            return response.text.splitlines()
+                path = _snapshot_path(date.today())
+                lines = _stream_to_snapshot(response, path)
+                print(f"Saved AMFI snapshot: {os.path.basename(path)} ({lines} lines)")
+
+                _save_meta({
+                    "snapshot": path,
+                    "checked_at": time.time(),
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                })
+                _prune_snapshots(keep=path)
+                return path
 
         except Exception as e:
             print(f"Attempt {attempt} failed: {e}")
@@ -26,3 +139,28 @@ def fetch_amfi_nav(retries=3, timeout=30):
 
     raise RuntimeError("AMFI NAV fetch failed after multiple retries") from last_error
 
+
+def read_snapshot_lines(path):
+    """
+    Generator over the lines of a snapshot (newline stripped).
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield line.rstrip("\r\n")
+
+
+def iter_amfi_nav_lines(retries=3, timeout=30):
+    """
+    Generator over today's NAVAll.txt lines (see download_amfi_snapshot).
+    """
+    path = download_amfi_snapshot(retries=retries, timeout=timeout)
+    yield from read_snapshot_lines(path)
+
+
+def fetch_amfi_nav(retries=3, timeout=30):
+    """
+    Fetches AMFI NAVAll.txt with retry & timeout protection.
+    Returns list of lines (same as original behavior).
+    """
+    path = download_amfi_snapshot(retries=retries, timeout=timeout)
+    return list(read_snapshot_lines(path))
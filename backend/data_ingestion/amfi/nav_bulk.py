@@ -0,0 +1,155 @@
+import os
+from datetime import date, datetime, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+# =========================
+# CONFIG
+# =========================
+DEFAULT_BATCH_SIZE = int(os.getenv("NAV_BULK_BATCH_SIZE", "1000"))
+
+# {_id: scheme_code, marked_at}: schemes with NAVs written older than the
+# NAV matrix's re-read tail (backfills, late corrections). The matrix
+# refresh (scoring/nav_matrix.py) re-reads their full history and
+# clears the marks; recent rows are picked up by its tail read anyway.
+DIRTY_COLLECTION = "nav_matrix_dirty"
+MATRIX_TAIL_DAYS = int(os.getenv("NAV_MATRIX_TAIL_DAYS", "10"))
+
+
+def mark_dirty(db, scheme_codes):
+    """
+    Flags schemes for a full re-read by the next NAV matrix refresh.
+    """
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne({"_id": code}, {"$set": {"marked_at": now}}, upsert=True)
+        for code in scheme_codes
+    ]
+    for i in range(0, len(ops), DEFAULT_BATCH_SIZE):
+        db[DIRTY_COLLECTION].bulk_write(ops[i:i + DEFAULT_BATCH_SIZE], ordered=False)
+    return len(ops)
+
+
+def load_latest_nav(collection, scheme_codes=None):
+    """
+    Returns the most recent stored NAV per scheme in ONE aggregation:
+    {
+        scheme_code: (date, nav)
+    }
+    Walks the (scheme_code, date) unique index backwards so the
+    $group picks the latest row without scanning full histories.
+    """
+    pipeline = []
+
+    if scheme_codes is not None:
+        pipeline.append({"$match": {"scheme_code": {"$in": list(scheme_codes)}}})
+
+    pipeline += [
+        {"$sort": {"scheme_code": -1, "date": -1}},
+        {"$group": {
+            "_id": "$scheme_code",
+            "date": {"$first": "$date"},
+            "nav": {"$first": "$nav"}
+        }}
+    ]
+
+    return {
+        row["_id"]: (row["date"], row["nav"])
+        for row in collection.aggregate(pipeline, allowDiskUse=True)
+    }
+
+
+def load_nav_span(collection, scheme_codes):
+    """
+    Returns the stored NAV range per scheme in ONE aggregation:
+    {
+        scheme_code: (first_date, last_date)
+    }
+    """
+    pipeline = [
+        {"$match": {"scheme_code": {"$in": list(scheme_codes)}}},
+        {"$group": {
+            "_id": "$scheme_code",
+            "first": {"$min": "$date"},
+            "last": {"$max": "$date"}
+        }}
+    ]
+
+    return {
+        row["_id"]: (row["first"], row["last"])
+        for row in collection.aggregate(pipeline, allowDiskUse=True)
+    }
+
+
+def select_new_or_changed(records, latest, stats):
+    """
+    Filters parsed NAV records against `latest` (see load_latest_nav).
+
+    Keeps a record when its date is after the last stored date, or when
+    it re-states the last stored date with a different NAV (AMFI revision).
+    Everything else is counted as unchanged in stats["unchanged"].
+    """
+    for record in records:
+        last = latest.get(record["scheme_code"])
+
+        if last is not None:
+            last_date, last_nav = last
+            if record["date"] < last_date:
+                stats["unchanged"] += 1
+                continue
+            if record["date"] == last_date and record["nav"] == last_nav:
+                stats["unchanged"] += 1
+                continue
+
+        yield record
+
+
+def bulk_upsert_nav(collection, records, source, batch_size=DEFAULT_BATCH_SIZE, stats=None):
+    """
+    Upserts NAV records keyed on (scheme_code, date) with unordered
+    bulk writes of `batch_size` operations.
+
+    Returns stats dict with inserted / updated / failed / batches counts.
+    `records` may be any iterable (generators are consumed lazily).
+    Schemes given rows older than the NAV matrix tail are marked dirty
+    (see DIRTY_COLLECTION).
+    """
+    if stats is None:
+        stats = {}
+    for k in ("inserted", "updated", "failed", "batches"):
+        stats.setdefault(k, 0)
+
+    ops = []
+    dirty = set()
+    dirty_before = (date.today() - timedelta(days=MATRIX_TAIL_DAYS)).isoformat()
+
+    def flush():
+        if not ops:
+            return
+        try:
+            res = collection.bulk_write(ops, ordered=False)
+            stats["inserted"] += res.upserted_count
+            stats["updated"] += res.modified_count
+        except BulkWriteError as e:
+            details = e.details
+            stats["inserted"] += details.get("nUpserted", 0)
+            stats["updated"] += details.get("nModified", 0)
+            stats["failed"] += len(details.get("writeErrors", []))
+        stats["batches"] += 1
+        ops.clear()
+
+    for record in records:
+        if record["date"] < dirty_before:
+            dirty.add(record["scheme_code"])
+        ops.append(UpdateOne(
+            {"scheme_code": record["scheme_code"], "date": record["date"]},
+            {"$set": {"nav": record["nav"], "source": source}},
+            upsert=True
+        ))
+        if len(ops) >= batch_size:
+            flush()
+
+    flush()
+    if dirty:
+        mark_dirty(collection.database, sorted(dirty))
+    return stats
@@ -8,9 +8,10 @@ def clean_scheme_code(raw_code: str):
     return re.sub(r"[^\d]", "", raw_code)
 
 
-def parse_amfi_nav(raw_lines):
+def iter_amfi_nav(raw_lines):
     """
-    Returns list of dicts:
+    Generator version of parse_amfi_nav.
+    Yields dicts:
     {
         scheme_code: str,
         nav: float,
@@ -18,7 +19,8 @@ def parse_amfi_nav(raw_lines):
     }
     """
 
-    records = []
+    # NAVAll.txt carries only a handful of distinct dates
+    date_cache = {}
 
     for line in raw_lines:
         line = line.strip()
@@ -44,14 +46,27 @@ def parse_amfi_nav(raw_lines):
 
         try:
             nav = float(nav)
-            date = datetime.strptime(date_str, "%d-%b-%Y").date().isoformat()
+            date = date_cache.get(date_str)
+            if date is None:
+                date = datetime.strptime(date_str, "%d-%b-%Y").date().isoformat()
+                date_cache[date_str] = date
         except ValueError:
             continue
 
-        records.append({
+        yield {
             "scheme_code": scheme_code,
             "nav": nav,
             "date": date
-        })
+        }
+
 
-    return records
+def parse_amfi_nav(raw_lines):
+    """
+    Returns list of dicts:
+    {
+        scheme_code: str,
+        nav: float,
+        date: YYYY-MM-DD
+    }
+    """
+    return list(iter_amfi_nav(raw_lines))
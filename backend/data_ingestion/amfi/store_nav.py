@@ -1,10 +1,18 @@
 from pymongo import MongoClient, ASCENDING
-from fetch_nav import fetch_amfi_nav
-from parse_nav import parse_amfi_nav
+from fetch_nav import download_amfi_snapshot, read_snapshot_lines
+from parse_nav import iter_amfi_nav
+from nav_bulk import (
+    DEFAULT_BATCH_SIZE, load_latest_nav, select_new_or_changed, bulk_upsert_nav
+)
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 import certifi
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from nav_monthly import MonthEndTracker, upsert_month_ends
+
 load_dotenv()
 
 # --- CONFIG ---
@@ -12,7 +20,14 @@ MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME", "mfscreener")
 
 
-def store_nav_records():
+def store_nav_records(incremental=True, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Loads today's AMFI NAVAll.txt into nav_history.
+
+    incremental=True  -> only rows newer than (or revising) the last stored
+                         NAV per scheme are written
+    incremental=False -> every parsed row is upserted (full resync)
+    """
     print("Connecting to MongoDB...")
     client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
     db = client[DB_NAME]
@@ -28,42 +43,53 @@ def store_nav_records():
 
     # SAFETY WRAPPER
     try:
-        raw_text = fetch_amfi_nav()
+        snapshot = download_amfi_snapshot()
     except Exception as e:
         print("AMFI NAV fetch failed. Skipping NAV ingestion for today.")
         print(e)
         return   # <--- prevents crash
 
-    print("Parsing NAV records...")
-    records = parse_amfi_nav(raw_text)
+    stats = {"parsed": 0, "unchanged": 0}
+
+    def counted(rows):
+        for row in rows:
+            stats["parsed"] += 1
+            yield row
 
-    if not records:
-        print(" No NAV records parsed. Skipping insert.")
-        return
+    print("Parsing NAV records (streaming)...")
+    records = counted(iter_amfi_nav(read_snapshot_lines(snapshot)))
 
-    print(f"Inserting {len(records)} NAV records...")
+    if incremental:
+        print("Loading last stored NAV per scheme...")
+        latest = load_latest_nav(collection)
+        print(f"Known schemes: {len(latest)}")
+        records = select_new_or_changed(records, latest, stats)
 
-    inserted = 0
-    skipped = 0
+    month_ends = MonthEndTracker("scheme_code")
+    records = month_ends.track(records)
 
-    for record in records:
-        doc = {
-            "scheme_code": record["scheme_code"],
-            "date": record["date"],
-            "nav": record["nav"],
-            "source": "AMFI"
-        }
+    print(f"Upserting NAV records (batch size {batch_size})...")
+    bulk_upsert_nav(collection, records, source="AMFI", batch_size=batch_size, stats=stats)
 
-        try:
-            collection.insert_one(doc)
-            inserted += 1
-        except Exception:
-            skipped += 1
+    # Only months touched by today's rows (normally just the current one)
+    stats["month_ends"] = upsert_month_ends(db.nav_monthly, "scheme_code", month_ends)
 
-    print(f"Inserted: {inserted}")
-    print(f"Skipped (duplicates): {skipped}")
+    if not stats["parsed"]:
+        print(" No NAV records parsed. Nothing written.")
+        return stats
+
+    print(f"Parsed: {stats['parsed']}")
+    print(f"Inserted: {stats['inserted']}")
+    print(f"Updated: {stats['updated']}")
+    print(f"Unchanged: {stats['unchanged']}")
+    if stats["failed"]:
+        print(f"Failed: {stats['failed']}")
+    print(f"Bulk batches: {stats['batches']}")
+    print(f"Month-ends refreshed: {stats['month_ends']}")
     print("NAV storage complete.")
 
+    return stats
+
 
 if __name__ == "__main__":
-    store_nav_records()
+    store_nav_records(incremental="--full" not in sys.argv)
@@ -1,9 +1,14 @@
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 import certifi
 from pymongo import MongoClient
 from datetime import datetime
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from publish import publish_collection
+
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
@@ -14,7 +19,7 @@ db = client["mfscreener"]
 map_col = db["scheme_benchmark_map"]   # CRISIL source
 fund_map_col = db["fund_benchmark_map"]
 
-fund_map_col.delete_many({})  # one-time rebuild (safe)
+docs = []  # staged, swapped in atomically below
 
 def normalize_fund_name(name: str) -> str:
     name = name.lower()
@@ -34,7 +39,7 @@ for row in map_col.find({}):
     if base_name in seen:
         continue
 
-    fund_map_col.insert_one({
+    docs.append({
         "fund_key": base_name,
         "benchmark": row["benchmark"],
         "category": row.get("category"),
@@ -44,5 +49,7 @@ for row in map_col.find({}):
 
     seen.add(base_name)
 
+publish_collection(db, fund_map_col.name, docs, indexes=[("fund_key", {})])
+
 print("✅ fund_benchmark_map built")
 print("Funds mapped:", fund_map_col.count_documents({}))
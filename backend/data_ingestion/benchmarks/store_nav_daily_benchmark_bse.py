@@ -1,6 +1,8 @@
 # BSE DAILY INDEX NAV — USES NSE TRADE DATE (NO SCRAPING)
 
 import os
+import sys
+from pathlib import Path
 import requests
 import pandas as pd
 from pymongo import MongoClient, ASCENDING
@@ -8,6 +10,9 @@ from datetime import timedelta
 from dotenv import load_dotenv
 import certifi
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from nav_monthly import MonthEndTracker, upsert_month_ends
+
 load_dotenv()
 
 MAX_BSE_LOOKBACK = 3 # days
@@ -19,6 +24,7 @@ MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = "mfscreener"
 
 BENCHMARK_COL = "benchmark_nav"
+MONTHLY_COL = "benchmark_monthly"
 META_COL = "meta_trade_dates"
 
 BASE_DIR = os.path.dirname(__file__)
@@ -52,6 +58,7 @@ def ingest_bse_csv(csv_path, trade_date):
     df.columns = [c.strip() for c in df.columns]
 
     inserted = skipped = 0
+    month_ends = MonthEndTracker("benchmark")
 
     for _, row in df.iterrows():
         index_id = str(row["IndexID"]).strip()
@@ -60,17 +67,19 @@ def ingest_bse_csv(csv_path, trade_date):
             continue
 
         try:
-            col.insert_one({
+            bench_col.insert_one({
                 "benchmark": BSE_INDEX_MAP[index_id],
                 "date": trade_date,
                 "nav": float(row["ClosePrice"]),
                 "source": "BSE_INDEX_SUMMARY"
             })
+            month_ends.add(BSE_INDEX_MAP[index_id], trade_date, float(row["ClosePrice"]))
             inserted += 1
         except:
             skipped += 1
 
-    print(f"BSE : Inserted: {inserted}, Skipped: {skipped}")
+    upsert_month_ends(db[MONTHLY_COL], "benchmark", month_ends)
+    print(f"BSE : Inserted: {inserted}, Skipped: {skipped}, Month-ends: {len(month_ends)}")
 
 def main():
     meta = meta_col.find_one({"source": "NSE"})
@@ -2,6 +2,8 @@
 # Stores benchmark NAVs + locks NSE trade date for downstream use
 
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 import certifi
 import io
@@ -10,6 +12,9 @@ import pandas as pd
 from datetime import date, timedelta
 from pymongo import MongoClient, ASCENDING
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from nav_monthly import MonthEndTracker, upsert_month_ends
+
 load_dotenv()
 
 # =========================
@@ -19,6 +24,7 @@ MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = "mfscreener"
 
 BENCHMARK_COL = "benchmark_nav"
+MONTHLY_COL = "benchmark_monthly"
 META_COL = "meta_trade_dates"
 
 URL_TPL = "https://www.niftyindices.com/Daily_Snapshot/ind_close_all_{ddmmyyyy}.csv"
@@ -115,6 +121,7 @@ def ingest_nse(df):
     ).dt.normalize()
 
     inserted = skipped = 0
+    month_ends = MonthEndTracker("benchmark")
 
     for _, r in df.iterrows():
         name = str(r["index_name"]).strip().upper()
@@ -135,11 +142,13 @@ def ingest_nse(df):
                 "nav": float(r["closing_index_value"]),
                 "source": "NSE_EOD"
             })
+            month_ends.add(matched, r["index_date"], float(r["closing_index_value"]))
             inserted += 1
         except:
             skipped += 1
 
-    print(f"NSE : Inserted: {inserted}, Skipped: {skipped}")
+    upsert_month_ends(db[MONTHLY_COL], "benchmark", month_ends)
+    print(f"NSE : Inserted: {inserted}, Skipped: {skipped}, Month-ends: {len(month_ends)}")
 
 # =========================
 # MAIN
@@ -0,0 +1,184 @@
+import os
+import sys
+from datetime import datetime
+
+import pandas as pd
+from pymongo import ASCENDING, UpdateOne
+
+# =========================
+# CONFIG
+# =========================
+# Month-end companions of the daily collections, one doc per
+# (code, month) holding the last NAV of that calendar month:
+#   nav_monthly       {scheme_code, month: "YYYY-MM", date, nav, updated_at}
+#   benchmark_monthly {benchmark,   month: "YYYY-MM", date, nav, updated_at}
+MONTHLY_COLLECTIONS = {
+    "nav_history": ("nav_monthly", "scheme_code"),
+    "benchmark_nav": ("benchmark_monthly", "benchmark"),
+}
+
+BATCH_SIZE = 1000
+
+# {_id: monthly collection, rebuilt_at}: written once a full rebuild has
+# completed. Readers (scoring/nav_loader.py) only trust a monthly
+# collection that has one; the ingesters' incremental upserts alone
+# would leave it holding just the months since deploy.
+REBUILD_MARKERS = "monthly_rebuilds"
+
+
+def month_of(value):
+    """
+    "YYYY-MM" for an ISO date string or a datetime.
+    """
+    if isinstance(value, str):
+        return value[:7]
+    return pd.Timestamp(value).strftime("%Y-%m")
+
+
+def ensure_monthly_index(monthly_col, key):
+    monthly_col.create_index(
+        [(key, ASCENDING), ("month", ASCENDING)],
+        unique=True
+    )
+
+
+class MonthEndTracker:
+    """
+    Remembers the latest (date, nav) per (code, month) among rows
+    passing through it, so a writer can refresh only the months it
+    touched. Wrap the record stream with track().
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.latest = {}
+
+    def track(self, records):
+        for r in records:
+            self.add(r[self.key], r["date"], r["nav"])
+            yield r
+
+    def add(self, code, date, nav):
+        k = (code, month_of(date))
+        cur = self.latest.get(k)
+        if cur is None or date >= cur[0]:
+            self.latest[k] = (date, nav)
+
+    def __len__(self):
+        return len(self.latest)
+
+
+def upsert_month_ends(monthly_col, key, tracker):
+    """
+    Applies tracked month-ends. A stored month-end is only replaced by a
+    row on the same or a later date, so replays and late backfills of
+    older days never move it backwards.
+    """
+    if not len(tracker):
+        return 0
+
+    ensure_monthly_index(monthly_col, key)
+
+    ops = []
+    written = 0
+
+    for (code, month), (date, nav) in tracker.latest.items():
+        newer = {"$gte": [{"$literal": date}, {"$ifNull": ["$date", {"$literal": date}]}]}
+        ops.append(UpdateOne(
+            {key: code, "month": month},
+            [{"$set": {
+                "date": {"$cond": [newer, {"$literal": date}, "$date"]},
+                "nav": {"$cond": [newer, {"$literal": nav}, "$nav"]},
+                "updated_at": "$$NOW"
+            }}],
+            upsert=True
+        ))
+        if len(ops) >= BATCH_SIZE:
+            monthly_col.bulk_write(ops, ordered=False)
+            written += len(ops)
+            ops = []
+
+    if ops:
+        monthly_col.bulk_write(ops, ordered=False)
+        written += len(ops)
+
+    return written
+
+
+def rebuild_monthly(db, daily_name):
+    """
+    One-off full rebuild of a monthly collection from its daily source,
+    done server-side with $group + $merge.
+    """
+    monthly_name, key = MONTHLY_COLLECTIONS[daily_name]
+    ensure_monthly_index(db[monthly_name], key)
+
+    # nav_history dates are ISO strings, benchmark_nav dates are datetimes
+    month_expr = (
+        {"$substrCP": ["$date", 0, 7]}
+        if daily_name == "nav_history"
+        else {"$dateToString": {"format": "%Y-%m", "date": "$date"}}
+    )
+
+    db[daily_name].aggregate([
+        {"$match": {"nav": {"$ne": None}}},
+        {"$sort": {key: 1, "date": 1}},
+        {"$group": {
+            "_id": {"code": f"${key}", "month": month_expr},
+            "date": {"$last": "$date"},
+            "nav": {"$last": "$nav"}
+        }},
+        {"$project": {
+            "_id": 0,
+            key: "$_id.code",
+            "month": "$_id.month",
+            "date": 1,
+            "nav": 1,
+            "updated_at": "$$NOW"
+        }},
+        {"$merge": {
+            "into": monthly_name,
+            "on": [key, "month"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert"
+        }}
+    ], allowDiskUse=True)
+
+    db[REBUILD_MARKERS].update_one(
+        {"_id": monthly_name},
+        {"$set": {"source": daily_name, "rebuilt_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+    print(f"✅ {monthly_name} rebuilt: {db[monthly_name].count_documents({})} month-ends")
+
+
+def is_rebuilt(db, daily_name):
+    monthly_name, _ = MONTHLY_COLLECTIONS[daily_name]
+    return db[REBUILD_MARKERS].find_one({"_id": monthly_name}) is not None
+
+
+# =========================
+# ENTRY (one-off rebuild)
+# =========================
+# python nav_monthly.py [daily collection ...] [--if-missing]
+# --if-missing skips collections already rebuilt (used by the daily
+# pipeline so a fresh deploy gets its first full rebuild).
+if __name__ == "__main__":
+    import certifi
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+
+    client = MongoClient(os.getenv("MONGO_URI"), tlsCAFile=certifi.where())
+    db = client[os.getenv("DB_NAME", "mfscreener")]
+
+    if_missing = "--if-missing" in sys.argv
+    targets = [a for a in sys.argv[1:] if not a.startswith("--")] or list(MONTHLY_COLLECTIONS)
+    for name in targets:
+        if if_missing and is_rebuilt(db, name):
+            print(f"✔ {MONTHLY_COLLECTIONS[name][0]} already rebuilt, skipping")
+            continue
+        print(f"Rebuilding month-ends from {name}...")
+        rebuild_monthly(db, name)
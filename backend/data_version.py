@@ -0,0 +1,61 @@
+import os
+from datetime import datetime, timezone
+
+# =========================
+# DATA VERSION
+# =========================
+# One document in pipeline_meta holding a token that changes whenever
+# the data behind the read API changes: the daily pipeline bumps it when
+# it finishes, the admin recompute job when it has written its scores.
+# The API's response cache (response_cache.py) keys and ETags on it, so
+# a bump invalidates every cached response at once.
+#
+# Manual bump (after a one-off script):
+#   python data_version.py
+META_COLLECTION = "pipeline_meta"
+VERSION_ID = "data_version"
+INITIAL_VERSION = "0"
+
+
+def new_version():
+    # sortable and readable: 20260118T063000123456Z
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+
+
+def version_update(source):
+    """
+    (filter, update) pair for an upsert bumping the version.
+    """
+    return (
+        {"_id": VERSION_ID},
+        {"$set": {
+            "version": new_version(),
+            "source": source,
+            "updated_at": datetime.now(timezone.utc)
+        }}
+    )
+
+
+def bump_data_version(db, source):
+    """
+    Bumps the version with a synchronous (pymongo) db; returns it.
+    """
+    query, update = version_update(source)
+    db[META_COLLECTION].update_one(query, update, upsert=True)
+    return update["$set"]["version"]
+
+
+# =========================
+# ENTRY (manual bump)
+# =========================
+if __name__ == "__main__":
+    import certifi
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+
+    client = MongoClient(os.getenv("MONGO_URI"), tlsCAFile=certifi.where())
+    db = client[os.getenv("DB_NAME", "mfscreener")]
+
+    print(f"✅ Data version bumped to {bump_data_version(db, 'manual')}")
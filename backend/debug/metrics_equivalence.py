@@ -0,0 +1,235 @@
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+import metrics
+import scoring
+
+# =========================
+# METRICS EQUIVALENCE CHECK
+# =========================
+# Compares metrics.py (through the scoring.py wrappers and in batched
+# 2-D form) against the original list-loop implementations kept below,
+# on random NAV / return series. No database needed:
+#
+#   python debug/metrics_equivalence.py
+RF = 0.07
+SERIES = 200
+TOL = 1e-9
+
+rng = np.random.default_rng(7)
+
+
+# -------------------------
+# ORIGINAL LOOP VERSIONS
+# -------------------------
+def ref_percentile_rank(value, arr):
+    if not arr or value is None:
+        return 50.0
+    count_le = sum(1 for v in arr if v is not None and v <= value)
+    return (count_le / len(arr)) * 100
+
+
+def ref_daily_returns(nav_series):
+    if len(nav_series) < 2:
+        return []
+    returns = []
+    for i in range(1, len(nav_series)):
+        if nav_series[i-1] > 0:
+            returns.append((nav_series[i] / nav_series[i-1]) - 1)
+        else:
+            returns.append(0.0)
+    return returns
+
+
+def ref_std_dev(daily_returns, periods=252):
+    if not daily_returns or len(daily_returns) < 2:
+        return 0.0
+    return np.std(daily_returns) * np.sqrt(periods)
+
+
+def ref_max_drawdown(nav_series):
+    if not nav_series or len(nav_series) < 2:
+        return 0.0
+    peak = nav_series[0]
+    max_dd = 0.0
+    for nav in nav_series:
+        if nav > peak:
+            peak = nav
+        drawdown = (nav - peak) / peak if peak > 0 else 0.0
+        if drawdown < max_dd:
+            max_dd = drawdown
+    return max_dd
+
+
+def ref_sharpe(daily_returns, risk_free_rate=RF):
+    if not daily_returns or len(daily_returns) < 2:
+        return 0.0
+    excess_returns = [r - (risk_free_rate / 252) for r in daily_returns]
+    mean_excess = np.mean(excess_returns)
+    std_excess = np.std(excess_returns)
+    if std_excess == 0:
+        return 0.0
+    return (mean_excess / std_excess) * np.sqrt(252)
+
+
+def ref_sortino(daily_returns, risk_free_rate=RF):
+    if not daily_returns or len(daily_returns) < 2:
+        return 0.0
+    excess_returns = [r - (risk_free_rate / 252) for r in daily_returns]
+    downside_returns = [r for r in excess_returns if r < 0]
+    if not downside_returns:
+        return 0.0
+    downside_deviation = np.sqrt(np.mean([r**2 for r in downside_returns])) * np.sqrt(252)
+    mean_excess = np.mean(excess_returns)
+    if downside_deviation == 0:
+        return 0.0
+    return mean_excess * np.sqrt(252) / downside_deviation
+
+
+def ref_beta(fund_returns, benchmark_returns):
+    if not fund_returns or not benchmark_returns or len(fund_returns) != len(benchmark_returns):
+        return 1.0
+    if len(fund_returns) < 2:
+        return 1.0
+    covariance = np.cov(fund_returns, benchmark_returns)[0][1]
+    variance = np.var(benchmark_returns)
+    if variance == 0:
+        return 1.0
+    return covariance / variance
+
+
+def ref_information_ratio(fund_annual_return, benchmark_annual_return, fund_returns, benchmark_returns):
+    if not fund_returns or not benchmark_returns or len(fund_returns) != len(benchmark_returns):
+        return 0.0
+    active_return = fund_annual_return - benchmark_annual_return
+    tracking_diff = [f - b for f, b in zip(fund_returns, benchmark_returns)]
+    tracking_error = np.std(tracking_diff) * np.sqrt(252)
+    if tracking_error == 0:
+        return 0.0
+    return active_return / tracking_error
+
+
+def ref_treynor(fund_annual_return, beta, risk_free_rate=RF):
+    if beta == 0:
+        return 0.0
+    return (fund_annual_return - risk_free_rate) / beta
+
+
+# -------------------------
+# FIXTURES
+# -------------------------
+def random_navs(days):
+    steps = rng.normal(0.0004, 0.011, days)
+    return list(100 * np.exp(np.cumsum(steps)))
+
+
+def edge_cases():
+    return [
+        [],
+        [100.0],
+        [100.0, 100.0],
+        [100.0] * 30,                       # flat: zero deviation
+        list(np.linspace(100, 130, 300)),   # never falls, no downside
+        [100.0, 0.0, 50.0, 60.0],           # zero NAV
+    ]
+
+
+# -------------------------
+# CHECKS
+# -------------------------
+failures = []
+
+
+def check(name, ref, new):
+    ref = np.asarray(ref, dtype=np.float64)
+    new = np.asarray(new, dtype=np.float64)
+    same_shape = ref.shape == new.shape
+    ok = same_shape and np.allclose(ref, new, rtol=TOL, atol=1e-12, equal_nan=True)
+    if not ok:
+        failures.append(name)
+        print(f"  FAIL {name}: ref={ref if ref.size < 6 else ref[:6]} new={new if new.size < 6 else new[:6]}")
+
+
+def check_scalar_wrappers(series):
+    bench = random_navs(len(series))
+    r = ref_daily_returns(series)
+    rb = ref_daily_returns(bench)
+
+    check("daily_returns", r, scoring.calculate_daily_returns(series))
+    check("std_dev", ref_std_dev(r), scoring.calculate_std_dev(r))
+    check("max_drawdown", ref_max_drawdown(series), scoring.calculate_max_drawdown(series))
+    check("sharpe", ref_sharpe(r), scoring.calculate_sharpe(r))
+    check("sortino", ref_sortino(r), scoring.calculate_sortino(r))
+    check("beta", ref_beta(r, rb), scoring.calculate_beta(r, rb))
+    check(
+        "information_ratio",
+        ref_information_ratio(0.12, 0.1, r, rb),
+        scoring.calculate_information_ratio(0.12, 0.1, r, rb)
+    )
+    b = ref_beta(r, rb)
+    check("treynor", ref_treynor(0.12, b), scoring.calculate_treynor(0.12, b))
+
+
+def check_batched(lengths):
+    # ragged histories padded with leading NaN into one block
+    navs = [random_navs(n) for n in lengths]
+    width = max(lengths)
+    block = np.full((len(navs), width), np.nan)
+    for i, s in enumerate(navs):
+        block[i, width - len(s):] = s
+
+    returns = metrics.simple_returns(block)
+    ref_returns = [ref_daily_returns(s) for s in navs]
+
+    check("batched max_drawdown", [ref_max_drawdown(s) for s in navs], metrics.max_drawdown(block))
+    check("batched volatility", [ref_std_dev(r) for r in ref_returns], metrics.volatility(returns))
+    check("batched sharpe", [ref_sharpe(r) for r in ref_returns], metrics.sharpe(returns, RF / 252))
+    check("batched sortino", [ref_sortino(r) for r in ref_returns], metrics.sortino(returns, RF / 252, periods=1))
+
+
+def check_percentiles():
+    values = list(rng.normal(0, 1, 500)) + [None] * 5 + [0.25, 0.25]
+    clean = [v for v in values if v is not None]
+
+    started = time.time()
+    ref = [ref_percentile_rank(v, values) for v in clean]
+    loop = time.time() - started
+
+    started = time.time()
+    new = metrics.percentile_of(clean, clean, total=len(values))
+    vector = time.time() - started
+
+    check("percentile_rank batch", ref, new)
+    check("percentile_rank wrapper", [ref_percentile_rank(v, values) for v in clean[:20]],
+          [scoring.percentile_rank(v, values) for v in clean[:20]])
+    check("percentile_rank empty", ref_percentile_rank(1.0, []), scoring.percentile_rank(1.0, []))
+    print(f"  percentiles: loop {loop * 1000:.1f}ms, sort+searchsorted {vector * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    print("Scalar wrappers vs original loops...")
+    for days in rng.integers(2, 1500, SERIES):
+        check_scalar_wrappers(random_navs(int(days)))
+    for series in edge_cases():
+        r = ref_daily_returns(series)
+        check("edge max_drawdown", ref_max_drawdown(series), scoring.calculate_max_drawdown(series))
+        check("edge daily_returns", r, scoring.calculate_daily_returns(series))
+        check("edge std_dev", ref_std_dev(r), scoring.calculate_std_dev(r))
+        check("edge sharpe", ref_sharpe(r), scoring.calculate_sharpe(r))
+        check("edge sortino", ref_sortino(r), scoring.calculate_sortino(r))
+        check("edge beta", ref_beta(r, r), scoring.calculate_beta(r, r))
+
+    print("Batched 2-D vs original loops...")
+    check_batched([int(n) for n in rng.integers(30, 1500, SERIES)])
+
+    print("Percentile ranks...")
+    check_percentiles()
+
+    if failures:
+        print(f"❌ {len(failures)} mismatches")
+        sys.exit(1)
+    print("✅ metrics.py matches the original implementations")
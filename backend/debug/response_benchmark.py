@@ -0,0 +1,114 @@
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+import api_response
+from api_response import dumps_json, dumps_msgpack, compress
+
+# =========================
+# RESPONSE ENCODING BENCHMARK
+# =========================
+# Serialize time and bytes for fund-detail sized payloads:
+#   default  jsonable_encoder + JSONResponse (FastAPI's default path)
+#   orjson   api_response.dumps_json
+#   msgpack  api_response.dumps_msgpack (if installed)
+# plus gzip / brotli size and time on the orjson body.
+#
+#   python debug/response_benchmark.py                # fund_card + NAVs from Mongo
+#   python debug/response_benchmark.py <fund_key>
+#   python debug/response_benchmark.py --synthetic    # no database
+ROUNDS = 50
+NAV_POINTS = 1825
+
+
+def synthetic_payload():
+    rng = random.Random(7)
+    start = datetime(2019, 1, 1)
+    nav = 10.0
+    nav_history = []
+    for i in range(NAV_POINTS):
+        nav *= 1 + rng.gauss(0.0004, 0.01)
+        nav_history.append({"date": start + timedelta(days=i), "nav": round(nav, 4)})
+
+    holdings = [
+        {
+            "name": f"Company {i} Ltd", "isin": f"INE{i:06d}01", "sector": rng.choice(["banks", "it", "fmcg", "auto"]),
+            "section": "Equity & Equity related", "weight": round(rng.uniform(0.1, 8), 2),
+            "quantity": rng.randint(1000, 10 ** 6), "market_value_cr": round(rng.uniform(1, 500), 2),
+            "as_of": datetime(2025, 3, 31)
+        }
+        for i in range(80)
+    ]
+    return {
+        "fund": {"fund_id": "SYN", "name": "Synthetic Fund", "inception_date": start},
+        "nav_history": nav_history,
+        "portfolio": {"holdings": holdings, "as_of_date": datetime(2025, 3, 31)},
+    }
+
+
+def mongo_payload(fund_key=None):
+    import certifi
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+    db = MongoClient(os.getenv("MONGO_URI"), tlsCAFile=certifi.where())[os.getenv("DB_NAME", "mfscreener")]
+
+    query = {"fund_key": fund_key} if fund_key else {"portfolio.holdings.20": {"$exists": True}}
+    card = db.fund_card.find_one(query, {"_id": 0})
+    if not card:
+        sys.exit(f"No fund_card found for {query}")
+
+    nav_history = list(
+        db.nav_history
+        .find({"scheme_code": card["scheme_code"]}, {"_id": 0, "date": 1, "nav": 1})
+        .sort("date", -1)
+        .limit(NAV_POINTS)
+    )
+    print(f"Payload: fund_card {card['fund_key']} + {len(nav_history)} NAV points")
+    return {**card, "nav_history": nav_history}
+
+
+def timed(fn, rounds=ROUNDS):
+    fn()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        out = fn()
+    return out, (time.perf_counter() - started) / rounds * 1000
+
+
+def main():
+    args = sys.argv[1:]
+    payload = synthetic_payload() if "--synthetic" in args else mongo_payload(next(iter(args), None))
+
+    encoders = {
+        "default": lambda: JSONResponse(jsonable_encoder(payload)).body,
+        "orjson": lambda: dumps_json(payload),
+    }
+    if api_response.msgpack is not None:
+        encoders["msgpack"] = lambda: dumps_msgpack(payload)
+
+    print(f"\n{'encoder':<10}{'ms':>10}{'bytes':>12}")
+    bodies = {}
+    for name, fn in encoders.items():
+        body, ms = timed(fn)
+        bodies[name] = body
+        print(f"{name:<10}{ms:>10.3f}{len(body):>12,}")
+
+    encodings = ["gzip"] + (["br"] if api_response.brotli is not None else [])
+    print(f"\n{'body':<10}{'encoding':<10}{'ms':>10}{'bytes':>12}")
+    for name, body in bodies.items():
+        for encoding in encodings:
+            packed, ms = timed(lambda: compress(body, encoding), rounds=10)
+            print(f"{name:<10}{encoding:<10}{ms:>10.3f}{len(packed):>12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+# =========================
+# SERIES DOWNSAMPLING
+# =========================
+# Chart-sized NAV series. Every function returns the INDICES of the
+# points to keep (sorted, first and last always included), so a fund
+# series and anything aligned to it (benchmark) can be cut identically.
+METHODS = ("lttb", "weekly", "monthly")
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: keeps the point of each bucket that
+    spans the largest triangle with the previously kept point and the
+    next bucket's average, preserving peaks and troughs.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        nlo, nhi = hi, edges[b + 2] if b + 2 < len(edges) else n
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        keep[b + 1] = a
+
+    return keep
+
+
+def period_last(dates, freq):
+    """
+    Index of the last point of every calendar week ("W") / month ("M").
+    """
+    periods = pd.DatetimeIndex(dates).to_period(freq).asi8
+    if not len(periods):
+        return np.arange(0)
+    last = np.flatnonzero(np.r_[periods[1:] != periods[:-1], True])
+    return np.unique(np.r_[0, last])
+
+
+def downsample(dates, values, max_points=None, method="lttb"):
+    """
+    Indices to keep from a date-sorted series: calendar resampling for
+    "weekly" / "monthly" (then capped), LTTB otherwise.
+    """
+    n = len(values)
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+
+    idx = np.arange(n)
+    if method != "lttb":
+        idx = period_last(dates, "W" if method == "weekly" else "M")
+
+    if max_points and len(idx) > max_points:
+        x = pd.DatetimeIndex(dates[idx]).asi8.astype(np.float64)
+        idx = idx[lttb(x, np.asarray(values)[idx], max_points)]
+
+    return idx
+
+
+def align_as_of(dates, other_dates, other_values):
+    """
+    other series sampled at `dates`: last value on or before each date,
+    NaN before it starts.
+    """
+    pos = np.searchsorted(other_dates, dates, side="right") - 1
+    out = np.full(len(dates), np.nan)
+    ok = pos >= 0
+    out[ok] = np.asarray(other_values, dtype=np.float64)[pos[ok]]
+    return out
+
+
+def rebase(values, base=100.0):
+    """
+    Series scaled so its first valid point equals `base`.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(values))
+    if not len(valid) or values[valid[0]] == 0:
+        return values
+    return values / values[valid[0]] * base
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+import numpy as np
+
+# =========================
+# CONCURRENT SUB-QUERIES
+# =========================
+# Runs a route's independent Mongo reads at once (asyncio.gather) with
+# a timeout per read, so latency is the slowest read instead of the sum.
+# A read that times out or fails is reported by name; the route decides
+# whether it can answer without it (partial response) or not.
+#
+# Every read's latency, and the fan-out's total, is kept in a
+# LatencyRecorder (last LATENCY_SAMPLES per name) to see which
+# collection dominates.
+LATENCY_SAMPLES = 1000
+
+TIMEOUT = "timeout"
+ERROR = "error"
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyRecorder:
+
+    def __init__(self, samples=LATENCY_SAMPLES):
+        self.samples = samples
+        self.latencies = {}
+        self.timeouts = {}
+        self.errors = {}
+
+    def record(self, name, ms, failure=None):
+        self.latencies.setdefault(name, deque(maxlen=self.samples)).append(ms)
+        if failure == TIMEOUT:
+            self.timeouts[name] = self.timeouts.get(name, 0) + 1
+        elif failure == ERROR:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def stats(self):
+        out = {}
+        for name, values in sorted(self.latencies.items()):
+            ms = np.fromiter(values, dtype=np.float64)
+            p50, p95 = np.percentile(ms, [50, 95])
+            out[name] = {
+                "samples": len(ms),
+                "p50_ms": round(float(p50), 2),
+                "p95_ms": round(float(p95), 2),
+                "max_ms": round(float(ms.max()), 2),
+                "timeouts": self.timeouts.get(name, 0),
+                "errors": self.errors.get(name, 0),
+            }
+        return out
+
+
+async def _timed(name, awaitable, timeout):
+    """
+    (result, failure, ms) for one read; failure is None, TIMEOUT or ERROR.
+    """
+    started = time.perf_counter()
+    result, failure = None, None
+    try:
+        result = await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        failure = TIMEOUT
+    except Exception as exc:
+        logger.error("Sub-query %s failed: %r", name, exc)
+        failure = ERROR
+    return result, failure, round((time.perf_counter() - started) * 1000, 2)
+
+
+async def fan_out(queries, timeouts, recorder=None):
+    """
+    Awaits {name: awaitable} concurrently, each bounded by timeouts[name]
+    seconds. Returns (results, failures, timings_ms): a failed read's
+    result is None and failures[name] is TIMEOUT or ERROR.
+    """
+    names = list(queries)
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*[_timed(n, queries[n], timeouts[n]) for n in names])
+
+    results, failures, timings = {}, {}, {}
+    for name, (result, failure, ms) in zip(names, outcomes):
+        results[name] = result
+        timings[name] = ms
+        if failure:
+            failures[name] = failure
+        if recorder is not None:
+            recorder.record(name, ms, failure)
+
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+    if recorder is not None:
+        recorder.record("total", timings["total"])
+    return results, failures, timings
@@ -0,0 +1,65 @@
+import os
+
+from pymongo import ASCENDING
+
+# =========================
+# FUNDS LISTING KEYS
+# =========================
+# GET /api/funds filters on category_key, a normalised copy of category
+# (spaces removed, lower case: "Large & Mid Cap" -> "large&midcap"), and
+# pages on fund_id. Both are indexed, so a category page is an index
+# range scan instead of a case-insensitive $regex over every fund.
+#
+# The server backfills missing or stale keys at startup (writers that
+# set category should set category_key with it: with_category_key);
+# for a manual run:
+#   python fund_index.py
+FUND_INDEXES = [
+    [("category_key", ASCENDING), ("fund_id", ASCENDING)],
+    [("fund_id", ASCENDING)],
+]
+
+# Same normalisation as category_key(), server-side
+CATEGORY_KEY_EXPR = {
+    "$toLower": {"$replaceAll": {"input": "$category", "find": " ", "replacement": ""}}
+}
+
+# Funds whose category_key is missing or no longer matches category
+# (category edited in place)
+STALE_KEY = {"$expr": {"$and": [
+    {"$eq": [{"$type": "$category"}, "string"]},
+    {"$ne": ["$category_key", CATEGORY_KEY_EXPR]},
+]}}
+
+
+def category_key(category):
+    return category.replace(" ", "").lower()
+
+
+def with_category_key(fund):
+    """
+    Fund document with category_key set from its category.
+    """
+    if isinstance(fund.get("category"), str):
+        return {**fund, "category_key": category_key(fund["category"])}
+    return fund
+
+
+# =========================
+# ENTRY (manual backfill)
+# =========================
+if __name__ == "__main__":
+    import certifi
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+
+    client = MongoClient(os.getenv("MONGO_URI"), tlsCAFile=certifi.where())
+    db = client[os.getenv("DB_NAME", "mfscreener")]
+
+    for keys in FUND_INDEXES:
+        db.funds.create_index(keys)
+
+    result = db.funds.update_many(STALE_KEY, [{"$set": {"category_key": CATEGORY_KEY_EXPR}}])
+    print(f"✅ category_key set on {result.modified_count} funds")
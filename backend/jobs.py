@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timezone
+
+# =========================
+# BACKGROUND JOBS
+# =========================
+# Long admin tasks (recompute) run as asyncio tasks next to the API
+# instead of inside the request: the endpoint enqueues, returns a job id
+# and clients poll GET /api/admin/jobs/{id}.
+#
+# Job state lives in a local in-process store, so the runner needs no
+# external queue and can be exercised without one. A job function is an
+# async callable taking a JobProgress first; CPU-heavy parts should go
+# through asyncio.to_thread to keep the event loop free.
+MAX_FINISHED_JOBS = 50
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class JobStore:
+    """
+    Thread-safe in-memory job registry. Keeps every live job and the
+    last MAX_FINISHED_JOBS finished ones.
+    """
+
+    def __init__(self, max_finished=MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, kind, params):
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "params": dict(params),
+            "status": QUEUED,
+            "stage": None,
+            "progress": {"done": 0, "total": 0, "percent": 0.0},
+            "timings": {},
+            "result": None,
+            "error": None,
+            "created_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._jobs[job["job_id"]] = job
+            self._prune()
+        return dict(job)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {
+                **job,
+                "progress": dict(job["progress"]),
+                "timings": dict(job["timings"]),
+            }
+
+    def active(self, kind):
+        with self._lock:
+            for job in self._jobs.values():
+                if job["kind"] == kind and job["status"] in (QUEUED, RUNNING):
+                    return dict(job)
+        return None
+
+    def _prune(self):
+        finished = [
+            j for j in self._jobs.values() if j["status"] in (SUCCEEDED, FAILED)
+        ]
+        finished.sort(key=lambda j: j["finished_at"])
+        for job in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job["job_id"]]
+
+
+class JobProgress:
+    """
+    Handed to a running job to report its stage and progress. Each
+    stage's wall time is recorded under timings[stage] (seconds).
+    """
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+        self._stage = None
+        self._started = None
+        self._done = 0
+        self._total = 0
+
+    def stage(self, name, total=0):
+        self._close_stage()
+        self._stage = name
+        self._started = time.perf_counter()
+        self._done = 0
+        self._total = total
+        self.store.update(self.job_id, stage=name, progress=self._progress())
+
+    def advance(self, n=1):
+        self._done += n
+        self.store.update(self.job_id, progress=self._progress())
+
+    def _progress(self):
+        percent = round(self._done / self._total * 100, 1) if self._total else 0.0
+        return {"done": self._done, "total": self._total, "percent": percent}
+
+    def _close_stage(self):
+        if self._stage is None:
+            return
+        job = self.store.get(self.job_id)
+        timings = job["timings"] if job else {}
+        timings[self._stage] = round(time.perf_counter() - self._started, 3)
+        self.store.update(self.job_id, timings=timings)
+        self._stage = None
+
+    def finish(self):
+        self._close_stage()
+
+
+class JobRunner:
+    """
+    Schedules job functions as asyncio tasks on the running loop and
+    records their outcome in the store. At most one job per kind runs
+    at a time: submitting while one is queued or running returns it.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or JobStore()
+        self._tasks = {}
+
+    def submit(self, kind, fn, **params):
+        running = self.store.active(kind)
+        if running is not None:
+            return running, False
+
+        job = self.store.create(kind, params)
+        task = asyncio.create_task(self._run(job["job_id"], fn, params))
+        self._tasks[job["job_id"]] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job["job_id"], None))
+        return job, True
+
+    async def _run(self, job_id, fn, params):
+        progress = JobProgress(self.store, job_id)
+        started = time.perf_counter()
+        self.store.update(job_id, status=RUNNING, started_at=_now())
+
+        try:
+            result = await fn(progress, **params)
+        except Exception as exc:
+            progress.finish()
+            logger.error("Job %s failed:\n%s", job_id, traceback.format_exc())
+            self.store.update(
+                job_id, status=FAILED, error=str(exc), finished_at=_now()
+            )
+            return
+
+        progress.finish()
+        timings = self.store.get(job_id)["timings"]
+        timings["total"] = round(time.perf_counter() - started, 3)
+        self.store.update(
+            job_id,
+            status=SUCCEEDED,
+            stage="done",
+            result=result,
+            timings=timings,
+            finished_at=_now()
+        )
+
+    async def wait(self, job_id):
+        """
+        Awaits a submitted job (for scripts and tests).
+        """
+        task = self._tasks.get(job_id)
+        if task is not None:
+            await task
+        return self.store.get(job_id)
+
+    async def shutdown(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
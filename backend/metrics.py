@@ -0,0 +1,226 @@
+import numpy as np
+
+# =========================
+# NUMPY METRICS
+# =========================
+# Array versions of the fund metrics, shared by server.py (directly and
+# through the scoring.py wrappers) and the scoring phases.
+#
+# Every function takes one series (1-D) or a batch of series (2-D, one
+# row per fund, time along the last axis) and returns a float or an
+# array of one value per row. NaN marks a missing observation and is
+# left out of every statistic, so ragged histories can share one padded
+# block. Undefined results (too few points, zero deviation) are NaN;
+# callers decide what to report instead.
+TRADING_DAYS = 252
+RISK_FREE_RATE = 0.07
+
+
+def _rows(x):
+    a = np.asarray(x, dtype=np.float64)
+    if a.ndim == 1:
+        return a[None, :], True
+    return a, False
+
+
+def _result(values, single):
+    return float(values[0]) if single else values
+
+
+def _count(x):
+    return (~np.isnan(x)).sum(axis=1)
+
+
+def _mean(x, n):
+    # nansum / count: NaN (not a warning) for empty rows
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.nansum(x, axis=1) / n
+
+
+def _cov(x, y, n, ddof):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dx = x - _mean(x, n)[:, None]
+        dy = y - _mean(y, n)[:, None]
+        return np.nansum(dx * dy, axis=1) / (n - ddof)
+
+
+def _paired(fund, bench):
+    f, single = _rows(fund)
+    b, _ = _rows(bench)
+    both = ~np.isnan(f) & ~np.isnan(b)
+    return np.where(both, f, np.nan), np.where(both, b, np.nan), both.sum(axis=1), single
+
+
+# =========================
+# RETURNS
+# =========================
+def simple_returns(navs):
+    """
+    Period-over-period returns along the last axis (one fewer column).
+    A non-positive previous NAV gives 0.0; a missing one gives NaN.
+    """
+    x = np.asarray(navs, dtype=np.float64)
+    prev, cur = x[..., :-1], x[..., 1:]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = cur / prev - 1
+    return np.where(prev > 0, ratio, np.where(np.isnan(prev), np.nan, 0.0))
+
+
+def cagr(nav_end, nav_start, years):
+    """
+    Annualised return between two NAVs, NaN unless both are positive.
+    """
+    end = np.asarray(nav_end, dtype=np.float64)
+    start = np.asarray(nav_start, dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.where((start > 0) & (end > 0), (end / start) ** (1 / years) - 1, np.nan)
+    return float(out) if out.ndim == 0 else out
+
+
+# =========================
+# RISK
+# =========================
+def volatility(returns, periods=TRADING_DAYS, ddof=0):
+    """
+    Annualised standard deviation of returns. NaN below 2 points.
+    """
+    x, single = _rows(returns)
+    n = _count(x)
+    std = np.sqrt(_cov(x, x, n, ddof))
+    std[n < 2] = np.nan
+    return _result(std * np.sqrt(periods), single)
+
+
+def max_drawdown(navs):
+    """
+    Deepest peak-to-trough fall as a (negative) fraction, 0.0 when the
+    series never falls. NaN for an empty row.
+    """
+    x, single = _rows(navs)
+    peak = np.fmax.accumulate(x, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        drawdown = np.where(peak > 0, (x - peak) / peak, 0.0)
+    drawdown[np.isnan(x)] = np.nan
+
+    out = np.full(len(x), np.nan)
+    has = _count(x) > 0
+    out[has] = np.minimum(np.nanmin(drawdown[has], axis=1), 0.0)
+    return _result(out, single)
+
+
+def downside_deviation(returns, rf=0.0, full_period=False):
+    """
+    Root mean square of the shortfall below `rf` (per period, not
+    annualised). full_period=True averages over every observation,
+    otherwise over the periods with a shortfall only.
+    """
+    x, single = _rows(returns)
+    short = np.minimum(x - rf, 0.0)
+    n = _count(x) if full_period else (short < 0).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.sqrt(np.nansum(short ** 2, axis=1) / n)
+    return _result(out, single)
+
+
+def beta(fund, bench):
+    """
+    cov(fund, bench) (ddof=1) over the population variance of bench,
+    over the periods both have. NaN when bench variance is 0.
+    """
+    f, b, n, single = _paired(fund, bench)
+    var = _cov(b, b, n, ddof=0)
+    cov = _cov(f, b, n, ddof=1)
+    out = np.full(len(n), np.nan)
+    ok = (var != 0) & (n >= 2)
+    out[ok] = cov[ok] / var[ok]
+    return _result(out, single)
+
+
+def tracking_error(fund, bench, periods=TRADING_DAYS, ddof=0):
+    """
+    Annualised standard deviation of fund - bench.
+    """
+    f, b, n, single = _paired(fund, bench)
+    active = f - b
+    return _result(np.sqrt(_cov(active, active, n, ddof)) * np.sqrt(periods), single)
+
+
+# =========================
+# RISK-ADJUSTED
+# =========================
+def sharpe(returns, rf=0.0, periods=TRADING_DAYS, ddof=0):
+    """
+    Annualised mean excess return over its standard deviation.
+    rf is the risk-free rate per period.
+    """
+    x, single = _rows(returns)
+    excess = x - rf
+    n = _count(excess)
+    mean = _mean(excess, n)
+    std = np.sqrt(_cov(excess, excess, n, ddof))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.where((std == 0) | (n < 2), np.nan, mean / std * np.sqrt(periods))
+    return _result(out, single)
+
+
+def sortino(returns, rf=0.0, periods=TRADING_DAYS, full_period=False):
+    """
+    Annualised mean excess return over the downside deviation
+    (see downside_deviation). NaN without any shortfall.
+    """
+    x, single = _rows(returns)
+    excess = x - rf
+    mean = _mean(excess, _count(excess))
+    dd = downside_deviation(excess, 0.0, full_period)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.where((dd == 0) | np.isnan(dd), np.nan, mean / dd * np.sqrt(periods))
+    return _result(out, single)
+
+
+def information_ratio(fund, bench, periods=TRADING_DAYS, ddof=0, active_return=None):
+    """
+    Annualised active return over tracking error. active_return defaults
+    to the annualised mean of fund - bench.
+    """
+    f, b, n, single = _paired(fund, bench)
+    active = f - b
+    te = np.sqrt(_cov(active, active, n, ddof)) * np.sqrt(periods)
+    if active_return is None:
+        active_return = _mean(active, n) * periods
+    active_return = np.broadcast_to(np.asarray(active_return, dtype=np.float64), te.shape)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.where(te == 0, np.nan, active_return / te)
+    return _result(out, single)
+
+
+def treynor(annual_return, beta_value, rf=RISK_FREE_RATE):
+    """
+    Excess annual return per unit of beta, NaN for a zero beta.
+    """
+    r = np.asarray(annual_return, dtype=np.float64)
+    b = np.asarray(beta_value, dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.where(b == 0, np.nan, (r - rf) / b)
+    return float(out) if out.ndim == 0 else out
+
+
+# =========================
+# RANKING
+# =========================
+def percentile_of(values, population, total=None):
+    """
+    Share of `population` <= each value, in percent: one sort plus a
+    binary search per value instead of a scan. NaN values (and NaN
+    population members) are ignored; `total` overrides the denominator
+    (default: non-NaN population size).
+    """
+    pop = np.asarray(population, dtype=np.float64)
+    pop = np.sort(pop[~np.isnan(pop)])
+    v = np.asarray(values, dtype=np.float64)
+    total = len(pop) if total is None else total
+
+    out = np.full(v.shape, np.nan)
+    if total:
+        has = ~np.isnan(v)
+        out[has] = np.searchsorted(pop, v[has], side="right") / total * 100
+    return float(out) if out.ndim == 0 else out
@@ -2,10 +2,15 @@ import pandas as pd
 import re
 from datetime import datetime
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 import certifi
 from pymongo import MongoClient
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from publish import publish_collection
+
 # =========================
 # DB CONNECTION
 # =========================
@@ -119,7 +124,7 @@ ELIGIBLE_CATEGORIES = {
 # =========================
 # BUILD fund_master_v2
 # =========================
-fund_master_v2.delete_many({})
+docs = []
 
 mapped = 0
 unmapped = []
@@ -153,7 +158,7 @@ for doc in schemes:
 
     fund_key = f"{amc_key}_{category.replace(' ', '_').upper()}"
 
-    fund_master_v2.insert_one({
+    docs.append({
         "scheme_code": scheme_code,
         "scheme_name": scheme_name,
         "amc": amc_name,
@@ -164,6 +169,11 @@ for doc in schemes:
 
     mapped += 1
 
+publish_collection(
+    db, fund_master_v2.name, docs,
+    indexes=[("scheme_code", {}), ("fund_key", {})]
+)
+
 # =========================
 # SUMMARY
 # =========================
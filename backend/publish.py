@@ -0,0 +1,137 @@
+import os
+import sys
+from datetime import datetime
+
+from pymongo import ASCENDING
+
+from data_version import bump_data_version
+
+# =========================
+# ATOMIC COLLECTION PUBLISH
+# =========================
+# Rebuilt collections are written to <name>__staging, indexed there and
+# swapped in with renameCollection, so readers see either the old or the
+# new data, never a half-built collection. The outgoing version is
+# renamed (not copied) to <name>__previous for rollback, so between the
+# two renames a reader briefly finds no collection at all:
+#
+#   python publish.py rollback normalized_large_cap_scores
+#
+# Publishes and rollbacks are both recorded in publish_log (action
+# "publish" / "rollback"), which RankingStore follows. A rollback also
+# bumps the data version; publishes do not: the daily pipeline bumps it
+# once when every stage has run (a standalone run: python data_version.py).
+STAGING_SUFFIX = "__staging"
+PREVIOUS_SUFFIX = "__previous"
+BATCH_SIZE = 1000
+
+_INDEX_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def _index_specs(collection, indexes):
+    """
+    Index definitions for the staging copy: everything the live
+    collection has, plus / overridden by `indexes`:
+    [(keys, {options})], keys being a field name or create_index keys.
+    """
+    specs = {}
+
+    for name, info in collection.index_information().items():
+        if name == "_id_":
+            continue
+        options = {k: info[k] for k in _INDEX_OPTIONS if k in info}
+        specs[tuple(tuple(k) for k in info["key"])] = (info["key"], dict(options, name=name))
+
+    for keys, options in indexes:
+        if isinstance(keys, str):
+            keys = [(keys, ASCENDING)]
+        specs[tuple(tuple(k) for k in keys)] = (list(keys), dict(options))
+
+    return list(specs.values())
+
+
+def _record(db, name, action, documents):
+    db["publish_log"].insert_one({
+        "collection": name,
+        "action": action,
+        "documents": documents,
+        "published_at": datetime.utcnow()
+    })
+
+
+def publish_collection(db, name, docs, indexes=(), keep_previous=True, batch_size=BATCH_SIZE):
+    """
+    Replaces collection `name` with `docs` in one swap.
+
+    - docs are bulk inserted into <name>__staging (any iterable)
+    - live + requested indexes are built on the staging copy
+    - the live collection is renamed to <name>__previous
+      (or dropped with keep_previous=False, by the rename over it)
+    - staging is renamed to the live name
+
+    An empty rebuild is not published: the live collection is left
+    untouched. Returns the number of documents published.
+    """
+    staging = db[name + STAGING_SUFFIX]
+    staging.drop()
+
+    written = 0
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            staging.insert_many(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        staging.insert_many(batch, ordered=False)
+        written += len(batch)
+
+    if not written:
+        print(f"⚠ {name}: nothing to publish, keeping the live collection")
+        staging.drop()
+        return 0
+
+    for keys, options in _index_specs(db[name], indexes):
+        staging.create_index(keys, **options)
+
+    if keep_previous and name in db.list_collection_names():
+        db[name].rename(name + PREVIOUS_SUFFIX, dropTarget=True)
+    staging.rename(name, dropTarget=True)
+
+    _record(db, name, "publish", written)
+
+    print(f"✅ Published {name}: {written} docs")
+    return written
+
+
+def rollback_collection(db, name):
+    """
+    Swaps <name>__previous back in as `name`.
+    """
+    previous = name + PREVIOUS_SUFFIX
+    if previous not in db.list_collection_names():
+        raise ValueError(f"No previous version of {name} to roll back to")
+
+    db[previous].rename(name, dropTarget=True)
+    _record(db, name, "rollback", db[name].estimated_document_count())
+    bump_data_version(db, f"rollback:{name}")
+    print(f"↩ Rolled back {name}")
+
+
+# =========================
+# ENTRY (manual rollback)
+# =========================
+if __name__ == "__main__":
+    import certifi
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+
+    if len(sys.argv) != 3 or sys.argv[1] != "rollback":
+        print("usage: python publish.py rollback <collection>")
+        sys.exit(1)
+
+    client = MongoClient(os.getenv("MONGO_URI"), tlsCAFile=certifi.where())
+    rollback_collection(client[os.getenv("DB_NAME", "mfscreener")], sys.argv[2])
@@ -0,0 +1,343 @@
+import asyncio
+import logging
+import os
+import time
+
+import numpy as np
+
+# =========================
+# CATEGORY RANKINGS
+# =========================
+# In-memory copy of every normalized_<category>_scores collection, kept
+# as one sub-score matrix per category (funds x SUB_SCORES, NaN where
+# missing). Bucket scores use fixed sub-weights, so they are computed
+# once per load; ranking for any weight vector is then a single
+# (funds x 5) @ (5,) product plus a sort.
+#
+# Same maths as frontend-next/lib/scoreCalculator.ts: a bucket with any
+# missing sub-score is null, and an overall score with any null bucket
+# is null (strict weightedAverage).
+#
+# Collections are reloaded when publish_log records a newer publish
+# (checked every RANKINGS_REFRESH_SECONDS).
+RANKINGS_REFRESH_SECONDS = float(os.getenv("RANKINGS_REFRESH_SECONDS", "60"))
+
+BUCKETS = ["consistency", "recent_performance", "risk", "valuation", "portfolio_quality"]
+
+# bucket -> [(group, sub-score, weight)] into normalized_sub_scores
+SUB_WEIGHTS = {
+    "consistency": [
+        ("consistency", "alpha_3y", 25),
+        ("consistency", "alpha_5y", 25),
+        ("consistency", "confidence", 30),
+        ("consistency", "alpha_iqr_3y", 10),
+        ("consistency", "alpha_iqr_5y", 10),
+    ],
+    "recent_performance": [
+        ("returns", "cagr_3y", 30),
+        ("returns", "cagr_5y", 25),
+        ("returns", "cagr_1y", 20),
+        ("returns", "return_6m", 15),
+        ("returns", "return_3m", 10),
+    ],
+    "risk": [
+        ("risk", "volatility", 20),
+        ("risk", "max_dd", 15),
+        ("risk_adjusted", "sharpe", 15),
+        ("risk_adjusted", "sortino", 15),
+        ("risk_adjusted", "ir", 15),
+        ("risk", "up_beta", 10),
+        ("risk", "down_beta", 10),
+    ],
+    "valuation": [
+        ("valuation", "roe", 50),
+        ("valuation", "pe", 40),
+        ("valuation", "pb", 10),
+    ],
+    "portfolio_quality": [
+        ("portfolio_quality", "manager_experience", 20),
+        ("portfolio_quality", "turnover", 20),
+        ("portfolio_quality", "aum", 10),
+        ("portfolio_quality", "sector_hhi", 10),
+        ("portfolio_quality", "ter", 10),
+        ("portfolio_quality", "stock_count", 10),
+        ("portfolio_quality", "top10", 10),
+        ("portfolio_quality", "top3_sector", 10),
+    ],
+}
+
+SUB_SCORES = [(g, k) for b in BUCKETS for g, k, _ in SUB_WEIGHTS[b]]
+
+WEIGHT_PRESETS = {
+    "balanced": {
+        "consistency": 25, "recent_performance": 20, "risk": 20,
+        "valuation": 15, "portfolio_quality": 20,
+    },
+    "aggressive": {
+        "consistency": 15, "recent_performance": 35, "risk": 10,
+        "valuation": 15, "portfolio_quality": 25,
+    },
+    "conservative": {
+        "consistency": 35, "recent_performance": 10, "risk": 25,
+        "valuation": 20, "portfolio_quality": 10,
+    },
+}
+
+# Bucket names used by lib/weights.ts (and so by some saved weightsets)
+WEIGHT_ALIASES = {
+    "performance": "recent_performance",
+    "portfolio": "portfolio_quality",
+}
+
+# URL slug -> category label (as written by normalise_sub_scores.py)
+CATEGORIES = {
+    "large-cap": "Large Cap",
+    "mid-cap": "Mid Cap",
+    "small-cap": "Small Cap",
+    "large-mid-cap": "Large & Mid Cap",
+    "large-and-mid-cap": "Large & Mid Cap",
+    "flexi-cap": "Flexi Cap",
+    "multi-cap": "Multi Cap",
+    "value": "Value",
+    "elss": "ELSS",
+    "contra": "Contra",
+    "focused": "Focused",
+    "banking-financial-services": "Banking & Financial Services",
+    "healthcare": "Healthcare",
+    "infrastructure": "Infrastructure",
+    "consumption": "Consumption",
+    "business-cycle": "Business Cycle",
+    "esg": "ESG",
+    "technology": "Technology",
+    "quant": "Quant",
+}
+
+logger = logging.getLogger(__name__)
+
+
+def normalized_collection(category):
+    return f"normalized_{category.lower().replace(' ', '_')}_scores"
+
+
+def _sub_weight_matrix():
+    """
+    (SUB_SCORES x BUCKETS) matrix of sub-weights, each column summing to
+    its bucket's total weight.
+    """
+    w = np.zeros((len(SUB_SCORES), len(BUCKETS)))
+    i = 0
+    for j, bucket in enumerate(BUCKETS):
+        for _, _, weight in SUB_WEIGHTS[bucket]:
+            w[i, j] = weight
+            i += 1
+    return w
+
+
+SUB_WEIGHT_MATRIX = _sub_weight_matrix()
+
+
+def _number(value):
+    if value is None or isinstance(value, bool):
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def sub_score_matrix(docs):
+    """
+    (funds x SUB_SCORES) float matrix from normalized score documents.
+    """
+    out = np.full((len(docs), len(SUB_SCORES)), np.nan)
+    for i, doc in enumerate(docs):
+        ns = doc.get("normalized_sub_scores") or {}
+        for j, (group, key) in enumerate(SUB_SCORES):
+            block = ns.get(group) or {}
+            out[i, j] = _number(block.get(key))
+    return out
+
+
+def bucket_scores(subs):
+    """
+    (funds x BUCKETS) weighted bucket averages; NaN where any of the
+    bucket's sub-scores is missing.
+    """
+    missing = np.isnan(subs)
+    scores = np.where(missing, 0.0, subs) @ SUB_WEIGHT_MATRIX / SUB_WEIGHT_MATRIX.sum(axis=0)
+    scores[(missing.astype(np.float64) @ SUB_WEIGHT_MATRIX) > 0] = np.nan
+    return scores
+
+
+def weight_vector(weights):
+    """
+    Bucket weight vector (BUCKETS order) from a {bucket: weight} dict.
+    Missing buckets weigh 0; lib/weights.ts names are accepted.
+    """
+    w = np.zeros(len(BUCKETS))
+    for name, value in (weights or {}).items():
+        name = WEIGHT_ALIASES.get(name, name)
+        if name not in BUCKETS:
+            raise ValueError(f"Unknown weight {name!r}, expected one of {BUCKETS}")
+        value = _number(value)
+        if not np.isfinite(value) or value < 0:
+            raise ValueError(f"Weight {name!r} must be a non-negative number")
+        w[BUCKETS.index(name)] = value
+    if w.sum() <= 0:
+        raise ValueError("At least one weight must be positive")
+    return w
+
+
+def overall_scores(buckets, w):
+    """
+    Overall score per fund for bucket weight vector w, rounded half-up
+    to one decimal like Math.round(x * 10) / 10. Weights are scaled to
+    sum to 100, so the presets give exactly scoreCalculator's numbers.
+    NaN where any bucket is missing, even one weighted 0.
+    """
+    missing = np.isnan(buckets).any(axis=1)
+    scores = np.where(missing[:, None], 0.0, buckets) @ w / w.sum()
+    scores = np.floor(scores * 10 + 0.5) / 10
+    scores[missing] = np.nan
+    return scores
+
+
+def _or_none(value):
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+class CategoryRanking:
+    """
+    One category's funds, sub-score matrix and precomputed bucket scores.
+    """
+
+    def __init__(self, category, docs, names=None, published_at=None):
+        names = names or {}
+        self.category = category
+        self.published_at = published_at
+        self.loaded_at = time.time()
+        self.scheme_codes = [d.get("scheme_code") for d in docs]
+        self.fund_keys = [d.get("fund_key") for d in docs]
+        self.names = [names.get(k, {}) for k in self.fund_keys]
+        self.meta = [d.get("meta") or {} for d in docs]
+        self.subs = sub_score_matrix(docs)
+        self.buckets = bucket_scores(self.subs)
+        self.tiebreak = self.subs[:, SUB_SCORES.index(("returns", "cagr_3y"))]
+
+    def __len__(self):
+        return len(self.scheme_codes)
+
+    def rank(self, w, offset=0, limit=50):
+        """
+        (scores, order) for weight vector w: order sorts by overall score
+        descending, nulls last, 3Y CAGR score as the tiebreaker.
+        """
+        scores = overall_scores(self.buckets, w)
+        order = np.lexsort((
+            -np.nan_to_num(self.tiebreak, nan=-np.inf),
+            -np.nan_to_num(scores, nan=-np.inf),
+        ))
+        return scores, order[offset:offset + limit]
+
+    def row(self, i, score, rank):
+        name = self.names[i]
+        return {
+            "rank": rank,
+            "scheme_code": self.scheme_codes[i],
+            "fund_key": self.fund_keys[i],
+            "scheme_name": name.get("scheme_name") or "Unknown Fund",
+            "amc": name.get("amc") or "Unknown AMC",
+            "overall_score": None if np.isnan(score) else float(score),
+            "bucket_scores": {b: _or_none(v) for b, v in zip(BUCKETS, self.buckets[i])},
+            "universe_size": self.meta[i].get("universe_size"),
+        }
+
+
+class RankingStore:
+    """
+    CategoryRanking per category label, refreshed from publish_log.
+    """
+
+    def __init__(self, refresh_seconds=RANKINGS_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.categories = {}
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    def get(self, category):
+        return self.categories.get(category)
+
+    async def load_category(self, db, category, published_at=None):
+        docs = await db[normalized_collection(category)].find(
+            {},
+            {"_id": 0, "scheme_code": 1, "fund_key": 1, "normalized_sub_scores": 1, "meta": 1}
+        ).to_list(length=None)
+
+        keys = sorted({d["fund_key"] for d in docs if d.get("fund_key")})
+        names = {}
+        if keys:
+            async for f in db.fund_master_v2.find(
+                {"fund_key": {"$in": keys}},
+                {"_id": 0, "fund_key": 1, "scheme_name": 1, "amc": 1}
+            ):
+                names[f["fund_key"]] = f
+
+        ranking = await asyncio.to_thread(CategoryRanking, category, docs, names, published_at)
+        self.categories[category] = ranking
+        return ranking
+
+    async def _published(self, db):
+        """
+        {collection: latest published_at} for the normalized collections.
+        """
+        rows = await db.publish_log.aggregate([
+            {"$match": {"collection": {"$in": [normalized_collection(c) for c in set(CATEGORIES.values())]}}},
+            {"$group": {"_id": "$collection", "published_at": {"$max": "$published_at"}}}
+        ]).to_list(length=None)
+        return {r["_id"]: r["published_at"] for r in rows}
+
+    async def refresh(self, db, force=False):
+        """
+        Loads every category that is new or was republished since its
+        last load. Returns the labels (re)loaded.
+        """
+        async with self._lock:
+            published = await self._published(db)
+            loaded = []
+            for category in sorted(set(CATEGORIES.values())):
+                stamp = published.get(normalized_collection(category))
+                current = self.categories.get(category)
+                if not force and current is not None and current.published_at == stamp:
+                    continue
+                ranking = await self.load_category(db, category, stamp)
+                if len(ranking):
+                    loaded.append(category)
+                else:
+                    del self.categories[category]
+            return loaded
+
+    async def _watch(self, db):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                loaded = await self.refresh(db)
+                if loaded:
+                    logger.info("Rankings reloaded: %s", ", ".join(loaded))
+            except Exception:
+                logger.exception("Rankings refresh failed")
+
+    def start(self, db):
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch(db))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self):
+        return {
+            c: {"funds": len(r), "published_at": r.published_at, "loaded_at": r.loaded_at}
+            for c, r in sorted(self.categories.items())
+        }
@@ -0,0 +1,233 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+import numpy as np
+from pymongo import UpdateOne
+
+from models import MetricsRaw
+from scoring import (
+    calculate_daily_returns, calculate_std_dev, calculate_max_drawdown,
+    calculate_sharpe, calculate_sortino, calculate_beta,
+    calculate_information_ratio, calculate_treynor, calculate_rolling_return,
+    calculate_final_score
+)
+from metrics import percentile_of
+from data_version import META_COLLECTION, version_update
+
+# =========================
+# ADMIN RECOMPUTE JOB
+# =========================
+# Body of POST /api/admin/recompute, run by the job runner (jobs.py):
+#   load_funds -> load_benchmarks -> compute_metrics -> percentiles -> scores
+# NAVs are read NAV_BATCH funds per $in query, every benchmark series is
+# read once and shared by all its funds, the number crunching runs in a
+# worker thread, and every stage writes with unordered bulk_write.
+NAV_BATCH = 200
+WRITE_BATCH = 1000
+MAX_ELIGIBLE = 1000
+
+METRIC_NAMES = [
+    'return_1y', 'return_3y', 'return_5y', 'rolling_3y_vs_category',
+    'rolling_5y_vs_category', 'hit_ratio_3y', 'std_dev_1y', 'max_drawdown',
+    'beta', 'sharpe', 'sortino', 'information_ratio', 'treynor', 'vol_skew'
+]
+INVERTED_METRICS = {'std_dev_1y', 'max_drawdown'}
+
+
+async def _bulk(collection, ops):
+    for i in range(0, len(ops), WRITE_BATCH):
+        await collection.bulk_write(ops[i:i + WRITE_BATCH], ordered=False)
+    return len(ops)
+
+
+def fund_metrics(nav_values, benchmark_returns):
+    """
+    Raw metrics for one fund from its NAVs (oldest first) and its
+    benchmark's daily returns.
+    """
+    daily_returns = calculate_daily_returns(nav_values)
+
+    last_year_returns = daily_returns[-252:] if len(daily_returns) >= 252 else daily_returns
+
+    return_1y = calculate_rolling_return(nav_values[-1], nav_values[-252], 1) if len(nav_values) >= 252 else 0
+    return_3y = calculate_rolling_return(nav_values[-1], nav_values[-756], 3) if len(nav_values) >= 756 else 0
+    return_5y = calculate_rolling_return(nav_values[-1], nav_values[-1260], 5) if len(nav_values) >= 1260 else 0
+
+    min_len = min(len(daily_returns), len(benchmark_returns))
+    fund_returns_aligned = daily_returns[-min_len:]
+    bench_returns_aligned = benchmark_returns[-min_len:]
+
+    beta = calculate_beta(fund_returns_aligned, bench_returns_aligned)
+
+    return MetricsRaw(
+        return_1y=return_1y,
+        return_3y=return_3y,
+        return_5y=return_5y,
+        rolling_3y_vs_category=return_3y,
+        rolling_5y_vs_category=return_5y,
+        hit_ratio_3y=50.0,
+        std_dev_1y=calculate_std_dev(last_year_returns),
+        max_drawdown=calculate_max_drawdown(nav_values[-252:]),
+        beta=beta,
+        sharpe=calculate_sharpe(last_year_returns),
+        sortino=calculate_sortino(last_year_returns),
+        information_ratio=calculate_information_ratio(return_1y, 0.1, fund_returns_aligned, bench_returns_aligned),
+        treynor=calculate_treynor(return_1y, beta),
+        vol_skew=1.0
+    ).model_dump()
+
+
+def _compute_batch(funds, navs, bench_returns, min_points):
+    out = []
+    for fund in funds:
+        nav_values = navs.get(fund["fund_id"], [])
+        if len(nav_values) < min_points:
+            continue
+        out.append((fund["fund_id"], fund_metrics(nav_values, bench_returns.get(fund.get("benchmark"), []))))
+    return out
+
+
+def category_percentiles(metrics_docs):
+    """
+    {fund_id: {metric: percentile}} within one category: one sort +
+    binary search per metric. Lower-is-better metrics are inverted.
+    """
+    out = {m["fund_id"]: {} for m in metrics_docs}
+
+    for metric_name in METRIC_NAMES:
+        raw = [m.get("raw", {}).get(metric_name) for m in metrics_docs]
+        values = [v for v in raw if v is not None]
+        if not values:
+            continue
+
+        pct = percentile_of([np.nan if v is None else v for v in raw], values)
+        if metric_name in INVERTED_METRICS:
+            pct = 100 - pct
+
+        for m, v, p in zip(metrics_docs, raw, pct):
+            if v is not None:
+                out[m["fund_id"]][metric_name] = float(p)
+
+    return out
+
+
+async def run_recompute(db, progress, min_history_years=3):
+    # -------------------------
+    # ELIGIBLE FUNDS
+    # -------------------------
+    progress.stage("load_funds")
+    min_date = datetime.now(timezone.utc) - timedelta(days=min_history_years * 365)
+    eligible_funds = await db.funds.find(
+        {"inception_date": {"$lte": min_date.isoformat()}},
+        {"_id": 0, "fund_id": 1, "category": 1, "benchmark": 1}
+    ).to_list(length=MAX_ELIGIBLE)
+
+    # -------------------------
+    # BENCHMARKS (one read, shared per index)
+    # -------------------------
+    indices = sorted({f.get("benchmark") for f in eligible_funds if f.get("benchmark")})
+    progress.stage("load_benchmarks", total=len(indices))
+
+    series = {}
+    cursor = db.benchmark_history.find(
+        {"index": {"$in": indices}},
+        {"_id": 0, "index": 1, "value": 1}
+    ).sort([("index", 1), ("date", 1)])
+    async for b in cursor:
+        series.setdefault(b["index"], []).append(b["value"])
+
+    bench_returns = {}
+    for index in indices:
+        bench_returns[index] = calculate_daily_returns(series.get(index, []))
+        progress.advance()
+
+    # -------------------------
+    # METRICS (batched NAV reads, compute off the event loop)
+    # -------------------------
+    progress.stage("compute_metrics", total=len(eligible_funds))
+    min_points = min_history_years * 252
+    now = datetime.now(timezone.utc).isoformat()
+    computed = 0
+
+    for i in range(0, len(eligible_funds), NAV_BATCH):
+        batch = eligible_funds[i:i + NAV_BATCH]
+
+        navs = {}
+        cursor = db.nav_history.find(
+            {"fund_id": {"$in": [f["fund_id"] for f in batch]}},
+            {"_id": 0, "fund_id": 1, "nav": 1}
+        ).sort([("fund_id", 1), ("date", 1)])
+        async for n in cursor:
+            navs.setdefault(n["fund_id"], []).append(n["nav"])
+
+        results = await asyncio.to_thread(_compute_batch, batch, navs, bench_returns, min_points)
+
+        computed += await _bulk(db.metrics, [
+            UpdateOne(
+                {"fund_id": fund_id},
+                {"$set": {
+                    "fund_id": fund_id,
+                    "date": now,
+                    "raw": raw,
+                    "percentiles": {},
+                    "eligible_for_ranking": True
+                }},
+                upsert=True
+            )
+            for fund_id, raw in results
+        ])
+        progress.advance(len(batch))
+
+    # -------------------------
+    # PERCENTILES (per category)
+    # -------------------------
+    by_category = {}
+    for fund in eligible_funds:
+        by_category.setdefault(fund["category"], []).append(fund["fund_id"])
+
+    progress.stage("percentiles", total=len(by_category))
+    percentiles = {}
+
+    for category, fund_ids in by_category.items():
+        metrics_docs = await db.metrics.find(
+            {"fund_id": {"$in": fund_ids}},
+            {"_id": 0, "fund_id": 1, "raw": 1}
+        ).to_list(length=len(fund_ids))
+        percentiles.update(await asyncio.to_thread(category_percentiles, metrics_docs))
+        progress.advance()
+
+    await _bulk(db.metrics, [
+        UpdateOne({"fund_id": fund_id}, {"$set": {"percentiles": p}})
+        for fund_id, p in percentiles.items()
+    ])
+
+    # -------------------------
+    # DEFAULT SCORES
+    # -------------------------
+    progress.stage("scores", total=len(percentiles))
+    now = datetime.now(timezone.utc).isoformat()
+    ops = []
+
+    for fund_id, p in percentiles.items():
+        score_result = calculate_final_score(p, {})
+        ops.append(UpdateOne(
+            {"fund_id": fund_id},
+            {"$set": {
+                "fund_id": fund_id,
+                "date": now,
+                "final_score_default": score_result["final_score"],
+                "bucket_scores": score_result["bucket_scores"]
+            }},
+            upsert=True
+        ))
+    scored = await _bulk(db.score_cache, ops)
+    progress.advance(scored)
+
+    # metrics / scores changed: invalidate cached API responses
+    await db[META_COLLECTION].update_one(*version_update("recompute"), upsert=True)
+
+    return {
+        "computed_funds": computed,
+        "total_eligible": len(eligible_funds),
+        "scored_funds": scored
+    }
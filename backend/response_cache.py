@@ -0,0 +1,173 @@
+import hashlib
+import inspect
+import os
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from fastapi import HTTPException, Request, Response
+
+from api_response import render as render_body, response_format
+from data_version import META_COLLECTION, VERSION_ID, INITIAL_VERSION
+from single_flight import SingleFlight, SingleFlightFull
+
+# =========================
+# RESPONSE CACHE
+# =========================
+# Rendered bodies of read-only routes, keyed by path + query string +
+# response format (JSON / MessagePack) + data version (data_version.py). Nothing expires by time: when the
+# version changes every entry is dropped. The version document itself
+# is re-read at most every DATA_VERSION_CHECK_SECONDS.
+#
+# The ETag is derived from version + key alone, so If-None-Match is
+# answered with a 304 before the route runs, even on a cold cache. It is
+# weak (W/): the same entity goes out as identity, gzip or brotli
+# (api_response.CompressionMiddleware), with Vary: Accept,
+# Accept-Encoding. "*" is not honoured, since the route has not run to
+# show that a representation exists.
+# Error responses (HTTPException) and results wrapped in Uncached (e.g.
+# partial responses) are never cached.
+#
+# Misses go through a SingleFlight keyed like the cache, so concurrent
+# identical requests on a cold cache run the route once; callers past
+# the per-key queue bound get a 503.
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2000"))
+RESPONSE_CACHE_MAX_AGE = int(os.getenv("RESPONSE_CACHE_MAX_AGE", "300"))
+DATA_VERSION_CHECK_SECONDS = float(os.getenv("DATA_VERSION_CHECK_SECONDS", "10"))
+
+
+def _etag(version, key):
+    digest = hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest()
+    return f'"{version}-{digest}"'
+
+
+def _etag_matches(header, etag):
+    """
+    Weak comparison of If-None-Match against `etag` (opaque tag, no W/).
+    """
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return etag in [t[2:] if t.startswith("W/") else t for t in tags]
+
+
+class Uncached(dict):
+    """
+    Route result to send as-is but not cache or ETag.
+    """
+
+
+class ResponseCache:
+
+    def __init__(self, max_size=RESPONSE_CACHE_SIZE, max_age=RESPONSE_CACHE_MAX_AGE,
+                 check_seconds=DATA_VERSION_CHECK_SECONDS, flights=None):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.check_seconds = check_seconds
+        self.flights = flights or SingleFlight()
+        self.entries = OrderedDict()
+        self.version = None
+        self._checked_until = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    async def current_version(self, db):
+        if self.version is not None and self._checked_until > time.monotonic():
+            return self.version
+
+        doc = await db[META_COLLECTION].find_one({"_id": VERSION_ID}, {"version": 1})
+        version = doc["version"] if doc else INITIAL_VERSION
+        if version != self.version:
+            if self.version is not None:
+                self.invalidations += 1
+            self.entries.clear()
+            self.version = version
+        self._checked_until = time.monotonic() + self.check_seconds
+        return version
+
+    def expire(self):
+        """
+        Forces a version re-read on the next request (after a bump in
+        this process).
+        """
+        self._checked_until = 0.0
+
+    def headers(self, etag):
+        return {
+            "ETag": f"W/{etag}",
+            "Cache-Control": f"public, max-age={self.max_age}",
+            "Vary": "Accept, Accept-Encoding",
+        }
+
+    def route(self, get_db):
+        """
+        Decorator for a read-only endpoint returning JSON-able data.
+        get_db() returns the (motor) database holding the version.
+        """
+        def decorate(fn):
+            signature = inspect.signature(fn)
+
+            @wraps(fn)
+            async def wrapper(request: Request, **kwargs):
+                version = await self.current_version(get_db())
+                media_type = response_format()
+                key = (request.url.path, tuple(sorted(request.query_params.multi_items())), media_type)
+                etag = _etag(version, key)
+                headers = self.headers(etag)
+
+                if _etag_matches(request.headers.get("if-none-match"), etag):
+                    self.not_modified += 1
+                    return Response(status_code=304, headers=headers)
+
+                body = self.entries.get(key)
+                if body is not None:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                else:
+                    self.misses += 1
+
+                    async def render():
+                        result = await fn(**kwargs)
+                        body, _ = render_body(result)
+                        if isinstance(result, Uncached):
+                            return body, False
+                        # a bump while fn ran would make body older than `version`
+                        if version == self.version:
+                            self.entries[key] = body
+                            while len(self.entries) > self.max_size:
+                                self.entries.popitem(last=False)
+                        return body, True
+
+                    try:
+                        body, cacheable = await self.flights.do((version, key), render)
+                    except SingleFlightFull:
+                        raise HTTPException(status_code=503, detail="Too many pending requests", headers={"Retry-After": "1"})
+                    if not cacheable:
+                        headers = {"Cache-Control": "no-store", "Vary": "Accept, Accept-Encoding"}
+
+                return Response(body, media_type=media_type, headers=headers)
+
+            # FastAPI reads the endpoint's parameters from the signature
+            wrapper.__signature__ = signature.replace(parameters=[
+                inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+                *[p.replace(kind=inspect.Parameter.KEYWORD_ONLY) for p in signature.parameters.values()],
+            ])
+            return wrapper
+
+        return decorate
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "version": self.version,
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "bytes": sum(len(b) for b in self.entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups * 100, 1) if lookups else 0.0,
+        }
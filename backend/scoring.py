@@ -1,11 +1,20 @@
-import numpy as np
 from scipy import stats
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import math
 
-# Risk-free rate (10-year G-sec annualized, configurable)
-RISK_FREE_RATE = 0.07
+from metrics import (
+    RISK_FREE_RATE, TRADING_DAYS, simple_returns, volatility, max_drawdown,
+    sharpe, sortino, beta, information_ratio, treynor, percentile_of
+)
+
+# Scalar wrappers over metrics.py, keeping the historical fallbacks
+# (0.0 / 1.0 / 50.0) for undefined results.
+
+
+def _or(value, default):
+    return default if value is None or math.isnan(value) else value
+
 
 def percentile_rank(value: float, arr: List[float]) -> float:
     """
@@ -13,8 +22,7 @@ def percentile_rank(value: float, arr: List[float]) -> float:
     """
     if not arr or value is None:
         return 50.0
-    count_le = sum(1 for v in arr if v is not None and v <= value)
-    return (count_le / len(arr)) * 100
+    return percentile_of(value, [v for v in arr if v is not None], total=len(arr))
 
 def calculate_rolling_return(nav_current: float, nav_past: float, years: int) -> float:
     """
@@ -30,21 +38,15 @@ def calculate_daily_returns(nav_series: List[float]) -> List[float]:
     """
     if len(nav_series) < 2:
         return []
-    returns = []
-    for i in range(1, len(nav_series)):
-        if nav_series[i-1] > 0:
-            returns.append((nav_series[i] / nav_series[i-1]) - 1)
-        else:
-            returns.append(0.0)
-    return returns
+    return simple_returns(nav_series).tolist()
 
-def calculate_std_dev(daily_returns: List[float], periods: int = 252) -> float:
+def calculate_std_dev(daily_returns: List[float], periods: int = TRADING_DAYS) -> float:
     """
     Calculate standard deviation (annualized)
     """
     if not daily_returns or len(daily_returns) < 2:
         return 0.0
-    return np.std(daily_returns) * np.sqrt(periods)
+    return volatility(daily_returns, periods)
 
 def calculate_max_drawdown(nav_series: List[float]) -> float:
     """
@@ -52,18 +54,7 @@ def calculate_max_drawdown(nav_series: List[float]) -> float:
     """
     if not nav_series or len(nav_series) < 2:
         return 0.0
-    
-    peak = nav_series[0]
-    max_dd = 0.0
-    
-    for nav in nav_series:
-        if nav > peak:
-            peak = nav
-        drawdown = (nav - peak) / peak if peak > 0 else 0.0
-        if drawdown < max_dd:
-            max_dd = drawdown
-    
-    return max_dd
+    return max_drawdown(nav_series)
 
 def calculate_sharpe(daily_returns: List[float], risk_free_rate: float = RISK_FREE_RATE) -> float:
     """
@@ -71,15 +62,7 @@ def calculate_sharpe(daily_returns: List[float], risk_free_rate: float = RISK_FR
     """
     if not daily_returns or len(daily_returns) < 2:
         return 0.0
-    
-    excess_returns = [r - (risk_free_rate / 252) for r in daily_returns]
-    mean_excess = np.mean(excess_returns)
-    std_excess = np.std(excess_returns)
-    
-    if std_excess == 0:
-        return 0.0
-    
-    return (mean_excess / std_excess) * np.sqrt(252)
+    return _or(sharpe(daily_returns, risk_free_rate / TRADING_DAYS), 0.0)
 
 def calculate_sortino(daily_returns: List[float], risk_free_rate: float = RISK_FREE_RATE) -> float:
     """
@@ -87,20 +70,9 @@ def calculate_sortino(daily_returns: List[float], risk_free_rate: float = RISK_F
     """
     if not daily_returns or len(daily_returns) < 2:
         return 0.0
-    
-    excess_returns = [r - (risk_free_rate / 252) for r in daily_returns]
-    downside_returns = [r for r in excess_returns if r < 0]
-    
-    if not downside_returns:
-        return 0.0
-    
-    downside_deviation = np.sqrt(np.mean([r**2 for r in downside_returns])) * np.sqrt(252)
-    mean_excess = np.mean(excess_returns)
-    
-    if downside_deviation == 0:
-        return 0.0
-    
-    return mean_excess * np.sqrt(252) / downside_deviation
+    # the annualisation factors cancel in the original formula
+    # (mean * sqrt(252) / (dd * sqrt(252))), hence periods=1
+    return _or(sortino(daily_returns, risk_free_rate / TRADING_DAYS, periods=1), 0.0)
 
 def calculate_beta(fund_returns: List[float], benchmark_returns: List[float]) -> float:
     """
@@ -112,13 +84,7 @@ def calculate_beta(fund_returns: List[float], benchmark_returns: List[float]) ->
     if len(fund_returns) < 2:
         return 1.0
     
-    covariance = np.cov(fund_returns, benchmark_returns)[0][1]
-    variance = np.var(benchmark_returns)
-    
-    if variance == 0:
-        return 1.0
-    
-    return covariance / variance
+    return _or(beta(fund_returns, benchmark_returns), 1.0)
 
 def calculate_information_ratio(
     fund_annual_return: float,
@@ -132,14 +98,10 @@ def calculate_information_ratio(
     if not fund_returns or not benchmark_returns or len(fund_returns) != len(benchmark_returns):
         return 0.0
     
-    active_return = fund_annual_return - benchmark_annual_return
-    tracking_diff = [f - b for f, b in zip(fund_returns, benchmark_returns)]
-    tracking_error = np.std(tracking_diff) * np.sqrt(252)
-    
-    if tracking_error == 0:
-        return 0.0
-    
-    return active_return / tracking_error
+    return _or(information_ratio(
+        fund_returns, benchmark_returns,
+        active_return=fund_annual_return - benchmark_annual_return
+    ), 0.0)
 
 def calculate_treynor(
     fund_annual_return: float,
@@ -149,10 +111,7 @@ def calculate_treynor(
     """
     Calculate Treynor ratio
     """
-    if beta == 0:
-        return 0.0
-    
-    return (fund_annual_return - risk_free_rate) / beta
+    return _or(treynor(fund_annual_return, beta, risk_free_rate), 0.0)
 
 def calculate_hit_ratio(
     fund_nav_history: List[Dict[str, Any]],
@@ -0,0 +1,196 @@
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import certifi
+import numpy as np
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from publish import publish_collection
+from rankings import (
+    BUCKETS, CATEGORIES, WEIGHT_PRESETS, normalized_collection,
+    sub_score_matrix, bucket_scores, overall_scores, weight_vector
+)
+
+# =========================
+# FUND CARD
+# =========================
+# One denormalized document per fund_key with everything the fund
+# detail page shows: master info, latest holdings summary, sector
+# concentration, qualitative attributes, normalized sub-scores, bucket
+# scores and the fund's rank in its category under each weight preset.
+#
+# Runs after normalise_sub_scores.py. Every source is read with one
+# query, and the result is published atomically (publish.py), indexed
+# on fund_key and scheme_code, so the detail page costs a single
+# indexed read (GET /api/fund-card/{fund_key}).
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI")
+
+client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
+db = client["mfscreener"]
+
+FUND_CARD = "fund_card"
+
+HOLDINGS_FIELDS = {
+    "_id": 0, "fund_key": 1, "as_of": 1, "as_of_date": 1, "holdings": 1,
+    "top_10_weight": 1, "equity_stock_count": 1,
+    "metrics.equity_stock_count": 1, "portfolio_valuation": 1
+}
+ATTRIBUTE_FIELDS = [
+    "fund_manager", "monthly_avg_aum_cr", "portfolio_turnover", "ter_direct_pct",
+    "ter_regular_pct", "exit_load", "min_sip_amount", "min_lumpsum_amount"
+]
+
+
+# =========================
+# Loaders (one query per source)
+# =========================
+def latest_holdings():
+    """
+    {fund_key: latest portfolio_holdings_v2 doc} (highest as_of).
+    Picked server-side: the (fund_key, as_of) index feeds the sort and
+    only one document per fund comes back.
+    """
+    db.portfolio_holdings_v2.create_index([("fund_key", 1), ("as_of", -1)])
+    rows = db.portfolio_holdings_v2.aggregate([
+        {"$sort": {"fund_key": 1, "as_of": -1}},
+        {"$group": {"_id": "$fund_key", "doc": {"$first": "$$ROOT"}}},
+        {"$replaceRoot": {"newRoot": "$doc"}},
+        {"$project": HOLDINGS_FIELDS},
+    ], allowDiskUse=True)
+    return {doc.get("fund_key"): doc for doc in rows}
+
+
+def keyed(coll, projection=None):
+    return {d["fund_key"]: d for d in db[coll].find({}, projection) if d.get("fund_key")}
+
+
+def category_scores():
+    """
+    {fund_key: normalized score block} across every normalized_*_scores
+    collection, with bucket scores and preset ranks within the category.
+    """
+    out = {}
+    presets = {name: weight_vector(w) for name, w in WEIGHT_PRESETS.items()}
+
+    for category in sorted(set(CATEGORIES.values())):
+        docs = list(db[normalized_collection(category)].find({}, {"_id": 0}))
+        if not docs:
+            continue
+
+        buckets = bucket_scores(sub_score_matrix(docs))
+        ranks = {}
+        for name, w in presets.items():
+            scores = overall_scores(buckets, w)
+            scored = ~np.isnan(scores)
+            # competition ranking: 1 + number of strictly higher scores
+            ordered = np.sort(scores[scored])
+            rank = np.full(len(docs), np.nan)
+            rank[scored] = 1 + len(ordered) - np.searchsorted(ordered, scores[scored], side="right")
+            ranks[name] = (scores, rank, int(scored.sum()))
+
+        for i, d in enumerate(docs):
+            if not d.get("fund_key"):
+                continue
+            out[d["fund_key"]] = {
+                "category": d.get("category", category),
+                "sub_scores": d.get("normalized_sub_scores"),
+                "bucket_scores": {
+                    b: None if np.isnan(v) else round(float(v), 2)
+                    for b, v in zip(BUCKETS, buckets[i])
+                },
+                "ranks": {
+                    name: {
+                        "score": None if np.isnan(scores[i]) else float(scores[i]),
+                        "rank": None if np.isnan(rank[i]) else int(rank[i]),
+                        "of": of,
+                    }
+                    for name, (scores, rank, of) in ranks.items()
+                },
+                "meta": d.get("meta"),
+            }
+
+    return out
+
+
+# =========================
+# Card
+# =========================
+def build_card(fm, ph, qs, qa, ns, built_at):
+    sc = (qs or {}).get("sector_concentration") or {}
+
+    return {
+        "fund_key": fm["fund_key"],
+        "scheme_code": fm.get("scheme_code"),
+
+        "fund_info": {
+            k: fm.get(k) for k in [
+                "scheme_code", "fund_key", "scheme_name", "amc", "category",
+                "sub_category", "asset_class", "benchmark"
+            ]
+        },
+
+        "normalized_scores": ns,
+
+        "portfolio": {
+            "holdings": ph.get("holdings") or [],
+            "top_10_weight": ph.get("top_10_weight"),
+            "equity_stock_count": ph.get("equity_stock_count") or ph.get("metrics", {}).get("equity_stock_count"),
+            "portfolio_valuation": ph.get("portfolio_valuation") or {},
+            "as_of_date": ph.get("as_of_date") or ph.get("as_of"),
+        } if ph else None,
+
+        "sector_concentration": {
+            "sector_weights": sc.get("sector_weights") or {},
+            "top_sector_pct": sc.get("top_sector_pct"),
+            "top_3_sector_pct": sc.get("top_3_sector_pct"),
+            "hhi": sc.get("hhi"),
+        } if qs else None,
+
+        "qualitative_attributes": {
+            **{k: qa.get(k) for k in ATTRIBUTE_FIELDS},
+            "fund_manager": qa.get("fund_manager") or [],
+        } if qa else None,
+
+        "built_at": built_at,
+    }
+
+
+def build_fund_cards():
+    print("\n[*] Building fund cards")
+    started = time.time()
+    built_at = datetime.utcnow()
+
+    # several schemes can share a fund_key: the lowest scheme_code wins
+    master = list(db.fund_master_v2.find({}, {"_id": 0}).sort([("fund_key", 1), ("scheme_code", 1)]))
+    holdings = latest_holdings()
+    sectors = keyed("qual_sector_concentration", {"_id": 0, "fund_key": 1, "sector_concentration": 1})
+    attributes = keyed("qualitative_fund_attributes", {"_id": 0, "fund_key": 1, **{k: 1 for k in ATTRIBUTE_FIELDS}})
+    scores = category_scores()
+
+    cards = {}
+    for fm in master:
+        key = fm.get("fund_key")
+        if not key or key in cards:
+            continue
+        cards[key] = build_card(
+            fm, holdings.get(key), sectors.get(key), attributes.get(key), scores.get(key), built_at
+        )
+
+    print(f"[i] {len(cards)} cards ({sum(c['normalized_scores'] is not None for c in cards.values())} scored) "
+          f"in {time.time() - started:.2f}s")
+
+    publish_collection(
+        db, FUND_CARD, cards.values(),
+        indexes=[("fund_key", {"unique": True}), ("scheme_code", {})]
+    )
+
+
+if __name__ == "__main__":
+    build_fund_cards()
@@ -5,6 +5,12 @@ import os
 from dotenv import load_dotenv
 import certifi
 from pymongo import MongoClient
+from nav_loader import load_fund_nav, load_fund_block, split_by, loader_summary
+from nav_kernels import (
+    fixed_calendar_returns, monthly_log_volatility, first_valid_index,
+    last_valid_index, max_drawdown as nav_max_drawdown
+)
+from score_writer import ScoreWriter, write_summary
 
 # =========================
 # DB CONNECTION
@@ -130,21 +136,18 @@ MIN_DAILY_POINTS = 250
 # =========================
 # HELPERS
 # =========================
+def to_daily_frame(df):
+    if df is None or df.empty:
+        return None
+    return df.set_index("date")
+
+
 def fetch_daily_nav(scheme_code):
-    df = pd.DataFrame(
-        list(nav_col.find(
-            {"scheme_code": scheme_code},
-            {"date": 1, "nav": 1, "_id": 0}
-        ))
+    return to_daily_frame(
+        split_by(load_fund_nav(nav_col, [scheme_code]), "scheme_code").get(scheme_code)
     )
 
-    if df.empty:
-        return None
 
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    df = df.dropna(subset=["date", "nav"])
-    df = df.sort_values("date").set_index("date")
-    return df
 def build_keyword_query(cfg):
     q = {"$and": []}
 
@@ -217,6 +220,52 @@ def max_drawdown(series):
     return (drawdown.min())*100
 
 
+def compute_phase3a_metrics(dates, values):
+    """
+    Phase-3A metrics for every row of an aligned NAV block at once
+    (see nav_kernels). Same numbers as the per-fund helpers above:
+    fixed-calendar CAGR / short returns from the last NAV, monthly
+    log-return volatility and daily max drawdown.
+
+    Returns one dict per row:
+    {"performance": {...}, "risk": {...}, "nav_stats": {...}}
+    """
+    if not len(values):
+        return []
+
+    cagr, short = fixed_calendar_returns(values, dates)
+    volatility = monthly_log_volatility(values, dates)
+    drawdown = nav_max_drawdown(values)
+
+    valid = ~np.isnan(values)
+    first = first_valid_index(valid)
+    last = last_valid_index(valid)
+    points = valid.sum(axis=1)
+    stamps = pd.DatetimeIndex(dates)
+
+    out = []
+    for i in range(len(values)):
+        perf = {}
+        for name, arr in list(cagr.items()) + list(short.items()):
+            if not np.isnan(arr[i]):
+                perf[name] = float(arr[i])
+
+        out.append({
+            "performance": perf,
+            "risk": {
+                "volatility": float(volatility[i]),
+                "max_drawdown": float(drawdown[i])
+            },
+            "nav_stats": {
+                "first_date": stamps[first[i]],
+                "last_date": stamps[last[i]],
+                "points": int(points[i])
+            }
+        })
+
+    return out
+
+
 # =========================
 # PHASE-3A RUNNER (FINAL)
 # =========================
@@ -304,93 +353,78 @@ def run_phase_3a_for_category(category):
             "category": category
         })
 
-    schemes = fund_col.find(query)
+    schemes = list(fund_col.find(query, {"scheme_code": 1, "scheme_name": 1}))
+
+    # one aligned NAV block for the whole category universe
+    codes, dates, values = load_fund_block(nav_col, [f["scheme_code"] for f in schemes])
+    row_of = {c: i for i, c in enumerate(codes)}
 
+    points = (~np.isnan(values)).sum(axis=1)
+    rows = np.flatnonzero(points >= MIN_DAILY_POINTS)
+    metrics = compute_phase3a_metrics(dates, values[rows])
+    metric_of = {codes[r]: m for r, m in zip(rows, metrics)}
+
+    now = datetime.utcnow()
+    writer = ScoreWriter(score_col, "3a", upsert=True)
     eligible = excluded = 0
 
     for fund in schemes:
         scheme_code = fund["scheme_code"]
         scheme_name = fund["scheme_name"]
 
-        df_daily = fetch_daily_nav(scheme_code)
-
         # -------------------------
         # ELIGIBILITY
         # -------------------------
-        if df_daily is None or len(df_daily) < MIN_DAILY_POINTS:
-            score_col.update_one(
-                {"scheme_code": scheme_code},
-                {"$set": {
+        if scheme_code not in metric_of:
+            row = row_of.get(scheme_code)
+            writer.set(
+                scheme_code,
+                {
                     "scheme_name": scheme_name,
                     "category": category,
                     "phase3a_status": "excluded",
                     "exclusion_reason": "INSUFFICIENT_NAV_HISTORY",
-                    "nav_stats": {"points": 0 if df_daily is None else len(df_daily)},
-                    "meta": {"last_updated": datetime.utcnow()}
-                }},
-                upsert=True
+                    "nav_stats": {"points": 0 if row is None else int(points[row])}
+                },
+                stamp={"meta": {"last_updated": now}}
             )
             excluded += 1
             continue
 
-        # -------------------------
-        # PERFORMANCE
-        # -------------------------
-        perf = {}
-        for y in [1, 3, 5]:
-            val = get_cagr_fixed_year_daily(df_daily, y)
-            if val is not None:
-                perf[f"cagr_{y}y"] = val
-
-        for m in [3, 6]:
-            target_date = df_daily.index.max() - pd.DateOffset(months=m)
-            df_start = df_daily[df_daily.index <= target_date]
-            if not df_start.empty:
-                perf[f"return_{m}m"] = (
-                    df_daily.iloc[-1]["nav"] / df_start.iloc[-1]["nav"] - 1
-                )*100
-
-        # -------------------------
-        # RISK
-        # -------------------------
-        df_monthly = df_daily.resample("ME").last()
-        log_returns = (np.log(df_monthly["nav"] / df_monthly["nav"].shift(1)).dropna())*100
-
-        risk = {
-            "volatility": (log_returns.std() * np.sqrt(12)),
-            "max_drawdown": max_drawdown(df_daily["nav"])
-        }
+        m = metric_of[scheme_code]
 
         # -------------------------
         # WRITE
         # -------------------------
-        score_col.update_one(
-            {"scheme_code": scheme_code},
-            {"$set": {
+        # dotted paths: metrics.risk_adjusted / composite belong to 3C / 3D
+        writer.set(
+            scheme_code,
+            {
                 "scheme_name": scheme_name,
                 "category": category,
-                "metrics": {"performance": perf, "risk": risk},
-                "nav_stats": {
-                    "first_date": df_daily.index.min(),
-                    "last_date": df_daily.index.max(),
-                    "points": len(df_daily)
-                },
+                "metrics.performance": m["performance"],
+                "metrics.risk": m["risk"],
+                "nav_stats": m["nav_stats"],
                 "phase3a_status": "eligible",
-                "exclusion_reason": None,
-                "meta": {
-                    "cagr_method": "daily_fixed_calendar",
-                    "risk_method": "monthly_log_from_daily",
-                    "last_updated": datetime.utcnow()
-                }
-            }},
-            upsert=True
+                "exclusion_reason": None
+            },
+            stamp={"meta": {
+                "cagr_method": "daily_fixed_calendar",
+                "risk_method": "monthly_log_from_daily",
+                "last_updated": now
+            }}
         )
 
         eligible += 1
 
+    stats = writer.flush()
+
     print(f"Phase-3A complete for {category}")
     print("Eligible:", eligible)
     print("Excluded:", excluded)
+    print(write_summary(stats))
+    print(loader_summary())
+    return stats
 
 
 # =========================
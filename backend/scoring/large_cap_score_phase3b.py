@@ -1,10 +1,15 @@
 import numpy as np
-import pandas as pd
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 import certifi
 from pymongo import MongoClient
+from nav_loader import load_fund_monthly, load_benchmark_monthly, loader_summary
+from nav_kernels import (
+    month_span, month_grid, compact_rows, rolling_cagr_block,
+    rolling_alpha_block, rolling_summary
+)
+from score_writer import ScoreWriter, write_summary
 
 # =========================
 # CONFIG
@@ -31,6 +36,8 @@ db = client["mfscreener"]
 
 nav_col = db["nav_history"]
 benchmark_col = db["benchmark_nav"]
+nav_monthly_col = db["nav_monthly"]
+benchmark_monthly_col = db["benchmark_monthly"]
 
 # =========================
 # CATEGORY CONFIG
@@ -98,167 +105,179 @@ CATEGORY_CONFIG = {
 # =========================
 # HELPERS
 # =========================
-def fetch_monthly_nav(collection, key, value):
-    df = pd.DataFrame(
-        list(collection.find({key: value}, {"date": 1, "nav": 1, "_id": 0}))
-    )
-    if df.empty:
-        return None
-
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    df = df.dropna(subset=["date"]).sort_values("date")
-    df["month"] = df["date"].dt.to_period("M")
-    return df.groupby("month").last().reset_index()
-
-
-def rolling_cagr(series, window):
-    values = []
-    years = window / 12
-
-    for i in range(window, len(series)):
-        s = series.iloc[i - window]
-        e = series.iloc[i]
-        if s > 0 and e > 0:
-            values.append((e / s) ** (1 / years) - 1)
-
-    return values
-
-
-def rolling_alpha(fund_nav, bench_nav, window):
-    values = []
-    years = window / 12
-
-    merged = pd.DataFrame({"f": fund_nav, "b": bench_nav}).dropna()
+def fetch_monthly_navs(scheme_codes, benchmarks):
+    """
+    Month-end NAVs for a whole batch in a few batched reads, as long
+    frames: (scheme_code | month | date | nav, benchmark | month | date | nav)
+    """
+    funds = load_fund_monthly(nav_col, nav_monthly_col, scheme_codes)
+    benches = load_benchmark_monthly(benchmark_col, benchmark_monthly_col, benchmarks)
+    return funds, benches
+
+
+def compute_consistency(pairs, fund_long, bench_long):
+    """
+    Rolling 3Y/5Y CAGR and alpha distributions for many
+    (scheme_code, benchmark_code) pairs in one pass over month-end
+    blocks (see nav_kernels). Windows are positional over the fund's
+    month-ends, and over the months both fund and benchmark have for
+    alpha.
+
+    Returns {pair: consistency dict}.
+    """
+    codes = list(dict.fromkeys(c for c, _ in pairs))
+    benches = list(dict.fromkeys(b for _, b in pairs if b))
+    span = month_span(fund_long, bench_long)
+
+    fund_grid = month_grid(fund_long, "scheme_code", codes, span)
+    bench_grid = month_grid(bench_long, "benchmark", benches, span)
+    has_fund = ~np.isnan(fund_grid)
+
+    # ---------- ABSOLUTE ROLLING ----------
+    fund_rows = compact_rows(fund_grid, has_fund)
+    absolute = {
+        label: rolling_summary(rolling_cagr_block(fund_rows, window), MIN_POINTS[label])
+        for label, window in ROLLING_WINDOWS.items()
+    }
 
-    for i in range(window, len(merged)):
-        fs, fe = merged["f"].iloc[i - window], merged["f"].iloc[i]
-        bs, be = merged["b"].iloc[i - window], merged["b"].iloc[i]
+    # ---------- ALPHA (fund/benchmark months in common) ----------
+    code_row = {c: i for i, c in enumerate(codes)}
+    bench_row = {b: i for i, b in enumerate(benches)}
+    alpha_pairs = [(c, b) for c, b in dict.fromkeys(pairs) if b and b in bench_row]
+
+    alpha = {}
+    if alpha_pairs:
+        f = fund_grid[[code_row[c] for c, _ in alpha_pairs]]
+        b = bench_grid[[bench_row[b] for _, b in alpha_pairs]]
+        joint = ~np.isnan(f) & ~np.isnan(b)
+        f_rows, b_rows = compact_rows(f, joint), compact_rows(b, joint)
+        alpha = {
+            label: rolling_summary(
+                rolling_alpha_block(f_rows, b_rows, window), MIN_POINTS[label]
+            )
+            for label, window in ROLLING_WINDOWS.items()
+        }
+    alpha_row = {p: i for i, p in enumerate(alpha_pairs)}
+
+    out = {}
+    for pair in dict.fromkeys(pairs):
+        code = pair[0]
+        consistency = {}
+        if code in code_row and has_fund[code_row[code]].any():
+            for label in ROLLING_WINDOWS:
+                summary = absolute[label][code_row[code]]
+                if summary is not None:
+                    consistency[f"rolling_{label}"] = summary
 
-        if fs > 0 and fe > 0 and bs > 0 and be > 0:
-            fund_cagr = (fe / fs) ** (1 / years) - 1
-            bench_cagr = (be / bs) ** (1 / years) - 1
-            values.append(fund_cagr - bench_cagr)
+            if pair in alpha_row:
+                for label in ROLLING_WINDOWS:
+                    summary = alpha[label][alpha_row[pair]]
+                    if summary is not None:
+                        consistency[f"rolling_alpha_{label}"] = summary
+        out[pair] = consistency
 
-    return values
+    return out
 
 
 # =========================
 # PHASE-3B RUNNER
 # =========================
-def run_phase_3b_for_category(category):
-    print(f"\n Phase-3B: {category}")
-
-    cfg = CATEGORY_CONFIG[category]
-    score_main_col = db[cfg["score_main"]]
-    score_consistency_col = db[cfg["score_consistency"]]
-
-    # 🔑 counters MUST be local
-    updated = 0
-    skipped = 0
-    alpha_any = 0
-    alpha_full = 0
-
-    schemes = score_main_col.find(
-        {"phase3a_status": "eligible"},
-        {"scheme_code": 1, "benchmark.code": 1}
+def run_phase_3b(categories):
+    """
+    Phase-3B for many categories in a single batched pass: one NAV read
+    and one kernel pass over every eligible fund, then one bulk write
+    per category.
+    """
+    universe = {}
+    for category in categories:
+        cfg = CATEGORY_CONFIG[category]
+        universe[category] = [
+            (s["scheme_code"], s.get("benchmark", {}).get("code"))
+            for s in db[cfg["score_main"]].find(
+                {"phase3a_status": "eligible"},
+                {"scheme_code": 1, "benchmark.code": 1}
+            )
+        ]
+
+    pairs = [p for rows in universe.values() for p in rows]
+    fund_long, bench_long = fetch_monthly_navs(
+        [c for c, _ in pairs], [b for _, b in pairs]
     )
+    results = compute_consistency(pairs, fund_long, bench_long)
+
+    now = datetime.utcnow()
+    write_stats = {}
+
+    for category, rows in universe.items():
+        print(f"\n Phase-3B: {category}")
+        score_consistency_col = db[CATEGORY_CONFIG[category]["score_consistency"]]
+
+        # 🔑 counters MUST be local
+        updated = 0
+        skipped = 0
+        alpha_any = 0
+        alpha_full = 0
+        writer = ScoreWriter(score_consistency_col, "3b", upsert=True)
+
+        for scheme_code, benchmark_code in rows:
+            consistency = results[(scheme_code, benchmark_code)]
+
+            # ---------- ELIGIBILITY ----------
+            has_absolute = any(
+                k.startswith("rolling_") and not k.startswith("rolling_alpha")
+                for k in consistency
+            )
+
+            if not has_absolute:
+                skipped += 1
+                continue
+
+            # ---------- WRITE ----------
+            writer.set(
+                scheme_code,
+                {
+                    "scheme_code": scheme_code,
+                    "category": category,
+                    "consistency": consistency
+                },
+                stamp={"meta": {
+                    "frequency": "monthly",
+                    "last_updated": now
+                }}
+            )
 
-    for s in schemes:
-        scheme_code = s["scheme_code"]
+            # ---------- ALPHA STATS ----------
+            has_alpha_3y = "rolling_alpha_3y" in consistency
+            has_alpha_5y = "rolling_alpha_5y" in consistency
 
-        fund_df = fetch_monthly_nav(nav_col, "scheme_code", scheme_code)
-        if fund_df is None:
-            skipped += 1
-            continue
+            if has_alpha_3y or has_alpha_5y:
+                alpha_any += 1
+            if has_alpha_3y and has_alpha_5y:
+                alpha_full += 1
 
-        nav_series = fund_df["nav"]
-        consistency = {}
+            updated += 1
 
-        # ---------- ABSOLUTE ROLLING ----------
-        for label, window in ROLLING_WINDOWS.items():
-            vals = rolling_cagr(nav_series, window)
-            if len(vals) >= MIN_POINTS[label]:
-                consistency[f"rolling_{label}"] = {
-                    "median": float(np.median(vals)) * 100,
-                    "p25": float(np.percentile(vals, 25)) * 100,
-                    "p75": float(np.percentile(vals, 75)) * 100,
-                    "observations": len(vals)
-                }
-
-        # ---------- OPTIONAL ALPHA ----------
-        benchmark_code = s.get("benchmark", {}).get("code")
-        if benchmark_code:
-            bench_df = fetch_monthly_nav(benchmark_col, "benchmark", benchmark_code)
-
-            if bench_df is not None:
-                merged = fund_df.merge(
-                    bench_df,
-                    on="month",
-                    suffixes=("_fund", "_bench")
-                ).dropna()
-
-                for label, window in ROLLING_WINDOWS.items():
-                    alpha_vals = rolling_alpha(
-                        merged["nav_fund"],
-                        merged["nav_bench"],
-                        window
-                    )
-
-                    if len(alpha_vals) >= MIN_POINTS[label]:
-                        consistency[f"rolling_alpha_{label}"] = {
-                            "median": float(np.median(alpha_vals)) * 100,
-                            "p25": float(np.percentile(alpha_vals, 25)) * 100,
-                            "p75": float(np.percentile(alpha_vals, 75)) * 100,
-                            "observations": len(alpha_vals)
-                        }
-
-        # ---------- ELIGIBILITY ----------
-        has_absolute = any(
-            k.startswith("rolling_") and not k.startswith("rolling_alpha")
-            for k in consistency
-        )
+        stats = writer.flush()
 
-        if not has_absolute:
-            skipped += 1
-            continue
-
-        # ---------- WRITE ----------
-        score_consistency_col.update_one(
-            {"scheme_code": scheme_code},
-            {"$set": {
-                "scheme_code": scheme_code,
-                "category": category,
-                "consistency": consistency,
-                "meta": {
-                    "frequency": "monthly",
-                    "last_updated": datetime.utcnow()
-                }
-            }},
-            upsert=True
+        print(
+            f"  Updated: {updated} | "
+            f"  Skipped: {skipped} | "
+            f"  Alpha(any): {alpha_any} | "
+            f"  Alpha(3Y+5Y): {alpha_full}"
         )
+        print(f"  {write_summary(stats)}")
+        write_stats[stats["collection"]] = stats
 
-        # ---------- ALPHA STATS ----------
-        has_alpha_3y = "rolling_alpha_3y" in consistency
-        has_alpha_5y = "rolling_alpha_5y" in consistency
-
-        if has_alpha_3y or has_alpha_5y:
-            alpha_any += 1
-        if has_alpha_3y and has_alpha_5y:
-            alpha_full += 1
+    print(f"\n  {loader_summary()}")
+    return write_stats
 
-        updated += 1
 
-    print(
-        f"  Updated: {updated} | "
-        f"  Skipped: {skipped} | "
-        f"  Alpha(any): {alpha_any} | "
-        f"  Alpha(3Y+5Y): {alpha_full}"
-    )
+def run_phase_3b_for_category(category):
+    return run_phase_3b([category])
 
 
 # =========================
 # ENTRY
 # =========================
 if __name__ == "__main__":
-    for cat in CATEGORY_CONFIG:
-        run_phase_3b_for_category(cat)
+    run_phase_3b(list(CATEGORY_CONFIG))
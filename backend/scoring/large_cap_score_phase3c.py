@@ -6,6 +6,11 @@ import os
 from dotenv import load_dotenv
 import certifi
 from pymongo import MongoClient
+from nav_loader import (
+    load_fund_monthly, load_benchmark_monthly, split_by, loader_summary
+)
+from nav_kernels import tail_mask, risk_adjusted_block
+from score_writer import ScoreWriter, write_summary
 MANUAL_BENCHMARK_OVERRIDE = {# =========================
     # FLEXI CAP — MANUAL OVERRIDES (FIXED)
     # =========================
@@ -187,6 +192,10 @@ MANUAL_BENCHMARK_OVERRIDE = {# =========================
 # =========================
 LOOKBACK_MONTHS = 36
 MIN_MONTHS = 30
+# months of NAV loaded per fund/benchmark: None = full history. Any cap
+# can change the aligned LOOKBACK_MONTHS tail (or drop a fund below
+# MIN_MONTHS) when either series has missing months.
+NAV_HISTORY_MONTHS = None
 # =========================
 # CATEGORY DEFAULT BENCHMARKS (PHASE-3C ONLY)
 # =========================
@@ -235,12 +244,21 @@ db = client["mfscreener"]
 
 nav_col       = db["nav_history"]
 benchmark_col = db["benchmark_nav"]
+nav_monthly_col = db["nav_monthly"]
+benchmark_monthly_col = db["benchmark_monthly"]
 fund_map_col  = db["fund_benchmark_map"]
 
 # =========================
 # CANONICAL NORMALIZATION
 # (PHASE-3C ONLY – SAFE)
 # =========================
+_CANON_TOKENS = (
+    "direct", "regular", "growth", "idcw", "dividend",
+    "plan", "option", "fund", "mf", "erstwhile"
+)
+_CANON_JUNK = re.compile(r"[^a-z0-9 ]+")
+
+
 def canon(name: str) -> str:
     """
     Canonicalize fund / scheme name defensively.
@@ -248,14 +266,11 @@ def canon(name: str) -> str:
     """
     name = name.lower()
 
-    for t in [
-        "direct", "regular", "growth", "idcw", "dividend",
-        "plan", "option", "fund","mf","erstwhile"
-    ]:
+    for t in _CANON_TOKENS:
         name = name.replace(t, "")
 
     # remove punctuation / hyphens / junk
-    name = re.sub(r"[^a-z0-9 ]+", " ", name)
+    name = _CANON_JUNK.sub(" ", name)
 
     # collapse spaces
     return " ".join(name.split())
@@ -263,107 +278,177 @@ def canon(name: str) -> str:
 # =========================
 # NAV HELPERS
 # =========================
-def fetch_monthly_nav(collection, key, value):
-    df = pd.DataFrame(
-        list(collection.find({key: value}, {"date": 1, "nav": 1, "_id": 0}))
+def fetch_monthly_returns(scheme_codes):
+    """
+    Monthly simple returns for a batch of funds (all month-ends, see
+    NAV_HISTORY_MONTHS), as a long frame sorted by fund and month:
+        scheme_code | month | ret
+    Same values as log_returns() on each fund's month-end frame.
+    """
+    long = load_fund_monthly(
+        nav_col, nav_monthly_col, scheme_codes, months=NAV_HISTORY_MONTHS
     )
-    if df.empty:
-        return None
+    codes = long["scheme_code"].to_numpy()
+    nav = long["nav"].to_numpy(dtype=np.float64)
 
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.sort_values("date")
+    ret = np.full(len(nav), np.nan)
+    if len(nav) > 1:
+        same_fund = codes[1:] == codes[:-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ret[1:] = np.where(same_fund, nav[1:] / nav[:-1] - 1, np.nan)
 
-    df["month"] = df["date"].dt.to_period("M")
-    return df.groupby("month").last().reset_index()
+    out = pd.DataFrame({"scheme_code": codes, "month": long["month"], "ret": ret})
+    return out.dropna().reset_index(drop=True)
 
 def log_returns(df):
     """Switching to simple returns for industry standard alignment"""
     df["ret"] = df["nav"].pct_change()
     return df.dropna()
 
+def clean(v):
+    return None if v is None or np.isnan(v) else round(v, 4)
+
 # =========================
-# METRICS
+# BENCHMARK RESOLUTION (IN-MEMORY)
 # =========================
-def sharpe(r):
-    s = r.std()
-    return None if s == 0 else ((r.mean() - RF_MONTHLY) / s) * np.sqrt(12)
-
-def sortino(r):
-    # 1. Calculate the 'Underperformance' for every month
-    # If return > RF, underperformance is 0. If return < RF, it's the difference.
-    diffs = r - RF_MONTHLY
-    downside_sq = np.minimum(0, diffs)**2
-    
-    # 2. Average across ALL months (N=36), not just the bad ones
-    ds = np.sqrt(downside_sq.mean())
-    
-    excess_return = r.mean() - RF_MONTHLY
-    
-    if ds == 0:
-        return 99.0 if excess_return > 0 else 0.0
-        
-    # 3. Annualize the result
-    return (excess_return / ds) * np.sqrt(12)
-
-def beta(rs, rb):
-    vb = np.var(rb)
-    return None if vb == 0 else np.cov(rs, rb)[0][1] / vb
-def upside_beta(rs, rb, min_points=6):
+class BenchmarkResolver:
     """
-    Sensitivity during positive benchmark months
-    Higher is better
+    scheme_name -> (benchmark, source) in O(1):
+    1. manual override, keyed by the space-less canonical name
+    2. CRISIL fund map, keyed by the canonical fund_key (first one wins)
+    Resolved names are memoised for the whole run.
     """
-    mask = rb > 0
-    if mask.sum() < min_points:
-        return None
 
-    rs_up = rs[mask]
-    rb_up = rb[mask]
+    def __init__(self, fund_map_rows):
+        self.override = dict(MANUAL_BENCHMARK_OVERRIDE)
+        self.fund_map = {}
+        for row in fund_map_rows:
+            # first one wins (CRISIL authoritative)
+            self.fund_map.setdefault(canon(row["fund_key"]), row["benchmark"])
+
+        self.resolved = {}
+        self.hits = self.misses = 0
 
-    vb = np.var(rb_up)
-    if vb == 0:
-        return None
+    def resolve(self, scheme_name):
+        if scheme_name in self.resolved:
+            self.hits += 1
+            return self.resolved[scheme_name]
+        self.misses += 1
 
-    return np.cov(rs_up, rb_up)[0][1] / vb
+        lookup_key = canon(scheme_name)
+        result = (None, None)
 
+        benchmark = self.override.get(lookup_key.replace(" ", ""))
+        if benchmark:
+            result = (benchmark, "manual_override")
+        else:
+            benchmark = self.fund_map.get(lookup_key)
+            if benchmark:
+                result = (benchmark, "fund_map")
 
-def downside_beta(rs, rb, min_points=6):
+        self.resolved[scheme_name] = result
+        return result
+
+
+class BenchmarkReturnCache:
     """
-    Sensitivity during negative benchmark months
-    Lower is better
+    Monthly return series per benchmark, read from Mongo once per run:
+    prefetch() loads only benchmarks not seen yet, get() is a dict hit.
     """
-    mask = rb < 0
-    if mask.sum() < min_points:
-        return None
 
-    rs_down = rs[mask]
-    rb_down = rb[mask]
+    def __init__(self):
+        self.series = {}
+        self.loads = 0
 
-    vb = np.var(rb_down)
-    if vb == 0:
-        return None
+    def prefetch(self, benchmarks):
+        missing = [b for b in dict.fromkeys(benchmarks) if b and b not in self.series]
+        if not missing:
+            return
 
-    return np.cov(rs_down, rb_down)[0][1] / vb
+        navs = split_by(
+            load_benchmark_monthly(
+                benchmark_col, benchmark_monthly_col, missing, months=NAV_HISTORY_MONTHS
+            ),
+            "benchmark"
+        )
+        for b in missing:
+            nav = navs.get(b)
+            self.series[b] = None if nav is None else log_returns(nav)
+        self.loads += 1
 
+    def get(self, benchmark):
+        if benchmark not in self.series:
+            self.prefetch([benchmark])
+        return self.series.get(benchmark)
 
-def information_ratio(rs, rb):
-    a = rs - rb
-    s = a.std()
-    return None if s == 0 else (a.mean() / s) * np.sqrt(12)
 
-def clean(v):
-    return None if v is None or np.isnan(v) else round(v, 4)
+def hit_rate(hits, misses):
+    total = hits + misses
+    return f"{hits}/{total} ({(100 * hits / total) if total else 0:.1f}%)"
 
 # =========================
-# BUILD CANONICAL BENCHMARK MAP (IN-MEMORY)
+# BATCHED ENGINE
 # =========================
-canonical_benchmark = {}
+def compute_risk_adjusted(pairs, fund_returns, bench_cache):
+    """
+    Risk-adjusted metrics for many (scheme_code, benchmark) pairs, one
+    masked NumPy pass per benchmark group (see nav_kernels).
+
+    Each fund's returns are aligned on its benchmark's months, the last
+    LOOKBACK_MONTHS common months are kept and funds with fewer than
+    MIN_MONTHS are left out.
+
+    Returns {pair: {metric: value or None}} for the funds with enough
+    history.
+    """
+    rows_of = fund_returns.groupby("scheme_code", sort=False).indices
+    ordinals = fund_returns["month"].array.asi8
+    rets = fund_returns["ret"].to_numpy(dtype=np.float64)
+
+    groups = {}
+    for code, benchmark in dict.fromkeys(pairs):
+        groups.setdefault(benchmark, []).append(code)
+
+    out = {}
+    for benchmark, codes in groups.items():
+        bench = bench_cache.get(benchmark)
+        codes = [c for c in codes if c in rows_of]
+        if bench is None or bench.empty or not codes:
+            continue
+
+        months = bench["month"].array.asi8
+        rb = bench["ret"].to_numpy(dtype=np.float64)
+
+        idx = np.concatenate([rows_of[c] for c in codes])
+        row = np.repeat(np.arange(len(codes)), [len(rows_of[c]) for c in codes])
+        col = np.searchsorted(months, ordinals[idx])
+        hit = col < len(months)
+        hit[hit] = months[col[hit]] == ordinals[idx][hit]
+
+        rs = np.full((len(codes), len(months)), np.nan)
+        rs[row[hit], col[hit]] = rets[idx][hit]
+
+        mask = tail_mask(~np.isnan(rs), LOOKBACK_MONTHS)
+        enough = mask.sum(axis=1) >= MIN_MONTHS
+        if not enough.any():
+            continue
+
+        stats = risk_adjusted_block(
+            rs[enough], rb[None, :], mask[enough], RF_MONTHLY
+        )
+
+        for j, code in enumerate(c for c, ok in zip(codes, enough) if ok):
+            out[(code, benchmark)] = {
+                "sharpe_3y": stats["sharpe"][j],
+                "sortino_3y": stats["sortino"][j],
+                "information_ratio_3y": stats["information_ratio"][j],
+                "beta_3y": stats["beta"][j],
+                "upside_beta_3y": stats["upside_beta"][j],
+                "downside_beta_3y": stats["downside_beta"][j],
+            }
+
+    return out
 
-for row in fund_map_col.find({}):
-    key = canon(row["fund_key"])
-    # first one wins (CRISIL authoritative)
-    if key not in canonical_benchmark:
-        canonical_benchmark[key] = row["benchmark"]
 
 # =========================
 # MAIN RUNNER
@@ -371,100 +456,88 @@ for row in fund_map_col.find({}):
 def run_phase_3c():
     total_updated = 0
 
+    resolver = BenchmarkResolver(fund_map_col.find({}, {"fund_key": 1, "benchmark": 1}))
+    bench_cache = BenchmarkReturnCache()
+    existing = set(db.list_collection_names())
+
+    # -------------------------
+    # RESOLVE (every collection)
+    # -------------------------
+    work = {}
     for col_name in SCORE_COLLECTIONS:
-        if col_name not in db.list_collection_names():
+        if col_name not in existing:
             continue
 
-        score_col = db[col_name]
-        updated = skipped = 0
-
-        cursor = score_col.find({
-            "metrics.performance": {"$exists": True},
-            "metrics.risk": {"$exists": True}
-        })
+        cursor = db[col_name].find(
+            {
+                "metrics.performance": {"$exists": True},
+                "metrics.risk": {"$exists": True}
+            },
+            {"scheme_code": 1, "scheme_name": 1}
+        )
 
+        resolved, unresolved = [], 0
         for fund in cursor:
-            scheme_code = fund["scheme_code"]
-            scheme_name = fund["scheme_name"]
+            benchmark, benchmark_source = resolver.resolve(fund["scheme_name"])
 
-            lookup_key = canon(scheme_name)
-            benchmark = None
-            benchmark_source = None
-            
-
-          # 1️⃣ Manual override FIRST (authoritative)
-            for k, v in MANUAL_BENCHMARK_OVERRIDE.items():
-                 if lookup_key.replace(" ", "") == k:
-
-                   benchmark = v
-                   benchmark_source = "manual_override"
-                   break
-
-         # 2️⃣ CRISIL / fund map next
             if not benchmark:
-              bm = canonical_benchmark.get(lookup_key)
-              if bm:
-                 benchmark = bm
-                 benchmark_source = "fund_map"
-
-          
+                unresolved += 1
+                continue
 
-         # 4️⃣ Final skip
-            if not benchmark:
-              skipped += 1
-              continue
+            resolved.append((fund["scheme_code"], benchmark, benchmark_source))
 
+        work[col_name] = (resolved, unresolved)
 
-            scheme_nav = fetch_monthly_nav(nav_col, "scheme_code", scheme_code)
-            bench_nav  = fetch_monthly_nav(benchmark_col, "benchmark", benchmark)
+    # -------------------------
+    # COMPUTE (one pass per benchmark)
+    # -------------------------
+    pairs = [(r[0], r[1]) for resolved, _ in work.values() for r in resolved]
+    fund_returns = fetch_monthly_returns([c for c, _ in pairs])
+    bench_cache.prefetch(b for _, b in pairs)
+    results = compute_risk_adjusted(pairs, fund_returns, bench_cache)
 
-            if scheme_nav is None or bench_nav is None:
-                skipped += 1
-                continue
+    # -------------------------
+    # WRITE (one bulk per collection)
+    # -------------------------
+    now = datetime.utcnow()
 
-            rs = log_returns(scheme_nav)
-            rb = log_returns(bench_nav)
+    write_stats = {}
 
-            merged = rs.merge(rb, on="month", suffixes=("_s", "_b")).dropna()
-            merged = merged.tail(LOOKBACK_MONTHS)
+    for col_name, (resolved, skipped) in work.items():
+        writer = ScoreWriter(db[col_name], "3c")
 
-            if len(merged) < MIN_MONTHS:
+        for scheme_code, benchmark, benchmark_source in resolved:
+            metrics = results.get((scheme_code, benchmark))
+            if metrics is None:
                 skipped += 1
                 continue
 
-            metrics = {
-                "sharpe_3y": sharpe(merged["ret_s"]),
-                "sortino_3y": sortino(merged["ret_s"]),
-                "information_ratio_3y": information_ratio(
-                    merged["ret_s"], merged["ret_b"]),
-                "beta_3y": beta(
-                    merged["ret_s"], merged["ret_b"]),
-                "upside_beta_3y": upside_beta(
-                    merged["ret_s"], merged["ret_b"] ),
-                "downside_beta_3y": downside_beta(
-                    merged["ret_s"], merged["ret_b"]),
-            }
-
-            score_col.update_one(
-                {"scheme_code": scheme_code},
-                {"$set": {
+            writer.set(
+                scheme_code,
+                {
                     "metrics.risk_adjusted": {
                         k: clean(v) for k, v in metrics.items()
                     },
                     "benchmark.code": benchmark,
-                    "benchmark.source": benchmark_source,
-                    "meta.phase_3c_updated": datetime.utcnow()
-                }}
+                    "benchmark.source": benchmark_source
+                },
+                stamp={"meta.phase_3c_updated": now}
             )
 
-            updated += 1
+        stats = writer.flush()
+        write_stats[col_name] = stats
 
         print(f"Phase-3C complete  - {col_name}")
-        print("Updated:", updated, "Skipped:", skipped)
+        print("Updated:", stats["queued"], "Skipped:", skipped)
+        print(write_summary(stats))
 
-        total_updated += updated
+        total_updated += stats["queued"]
 
     print("\n TOTAL UPDATED:", total_updated)
+    print(loader_summary())
+    print("Benchmark resolution cache hits:", hit_rate(resolver.hits, resolver.misses))
+    print(f"Benchmark series: {len(bench_cache.series)} loaded in {bench_cache.loads} batched reads")
+    return write_stats
 
 # =========================
 # ENTRY
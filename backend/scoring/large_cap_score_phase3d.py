@@ -4,6 +4,7 @@ import os
 from dotenv import load_dotenv
 import certifi
 from pymongo import MongoClient
+from score_writer import ScoreWriter, write_summary
 
 # =========================
 # CATEGORY REGISTRY
@@ -102,6 +103,7 @@ def is_direct_growth(scheme_name: str) -> bool:
 # MAIN RUNNER
 # =========================
 def run_phase_3d():
+    write_stats = {}
 
     for category, cfg in CATEGORIES.items():
         print(f"\n▶ Running Phase-3D for {category}")
@@ -216,24 +218,28 @@ def run_phase_3d():
         # =========================
         # WRITE BACK TO MONGO
         # =========================
-        for _, row in df.iterrows():
-            score_col.update_one(
-                {"scheme_code": row["scheme_code"]},
-                {"$set": {
-                    "metrics.composite.quant_score": (
-                        round(row["quant_score"], 2)
-                        if pd.notna(row["quant_score"]) else None
-                    ),
-                    f"rank.{rank_field}": (
-                        int(row["rank"]) if pd.notna(row["rank"]) else None
-                    ),
-                    "rank.universe_size": universe
-                }}
-            )
+        writer = ScoreWriter(score_col, "3d")
+
+        for scheme_code, quant_score, rank in zip(df["scheme_code"], df["quant_score"], df["rank"]):
+            writer.set(scheme_code, {
+                "metrics.composite.quant_score": (
+                    round(float(quant_score), 2) if pd.notna(quant_score) else None
+                ),
+                f"rank.{rank_field}": (
+                    int(rank) if pd.notna(rank) else None
+                ),
+                "rank.universe_size": universe
+            })
+
+        stats = writer.flush()
+        write_stats[cfg["score_col"]] = stats
 
         print(f"✅ Phase-3D complete — {category}")
         print("Ranked funds:", universe)
         print("Unranked (insufficient data):", len(df) - universe)
+        print(write_summary(stats))
+
+    return write_stats
 
 # =========================
 # ENTRY POINT
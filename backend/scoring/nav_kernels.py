@@ -0,0 +1,338 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+import metrics
+
+# =========================
+# VECTORIZED NAV KERNELS
+# =========================
+# Whole-universe versions of the per-fund pandas metrics used by the
+# scoring phases. Inputs are aligned NAV blocks:
+#   values  float64 [schemes, days], NaN where a scheme has no NAV
+#   dates   datetime64 [days], sorted ascending
+# Every kernel reproduces the per-fund formula it replaces; a column of
+# NaN (a day on which none of the schemes has a NAV) never changes a result.
+
+
+def valid_mask(values):
+    return ~np.isnan(values)
+
+
+def ffill_index(valid):
+    """
+    Column index of the last valid value at or before each position
+    (0 where a row has not started yet).
+    """
+    idx = np.where(valid, np.arange(valid.shape[1]), 0)
+    return np.maximum.accumulate(idx, axis=1)
+
+
+def last_valid_index(valid):
+    """
+    Column index of each row's last NAV (-1 for empty rows).
+    """
+    n = valid.shape[1]
+    rev = np.argmax(valid[:, ::-1], axis=1)
+    return np.where(valid.any(axis=1), n - 1 - rev, -1)
+
+
+def first_valid_index(valid):
+    return np.where(valid.any(axis=1), np.argmax(valid, axis=1), -1)
+
+
+def shift_dates(dates, **offset):
+    """
+    dates - DateOffset(**offset), evaluated once per distinct date.
+    """
+    idx = pd.DatetimeIndex(dates)
+    uniq, inverse = np.unique(idx.values, return_inverse=True)
+    shifted = pd.DatetimeIndex(uniq) - pd.DateOffset(**offset)
+    return shifted.values[inverse]
+
+
+def nav_as_of(values, valid, dates, targets):
+    """
+    Per row: last NAV on or before targets[row] (NaN if none), i.e. the
+    vectorized form of df[df.index <= target].iloc[-1]["nav"].
+    """
+    rows = np.arange(values.shape[0])
+    col = np.searchsorted(dates, targets, side="right") - 1
+    ff = ffill_index(valid)
+
+    safe = np.clip(col, 0, None)
+    pos = ff[rows, safe]
+    out = values[rows, pos]
+    out[(col < 0) | ~valid[rows, pos]] = np.nan
+    return out
+
+
+def fixed_calendar_returns(values, dates, years=(1, 3, 5), months=(3, 6)):
+    """
+    Point-to-point returns from each row's last NAV back to a fixed
+    calendar offset (get_cagr_fixed_year_daily / Phase-3A short returns).
+
+    Returns ({"cagr_1y": arr, ...}, {"return_3m": arr, ...}) in percent,
+    NaN where the per-fund method returns None / skips the metric.
+    """
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+    valid = valid_mask(values)
+    last = last_valid_index(valid)
+    has = last >= 0
+
+    rows = np.arange(values.shape[0])
+    end_nav = np.full(values.shape[0], np.nan)
+    end_nav[has] = values[rows[has], last[has]]
+    end_date = dates[np.clip(last, 0, None)]
+
+    cagr = {}
+    for y in years:
+        start = nav_as_of(values, valid, dates, shift_dates(end_date, years=y))
+        ok = has & ~np.isnan(start) & (start > 0) & (end_nav > 0)
+        out = np.full(values.shape[0], np.nan)
+        # scalar pow per fund: the vectorized ufunc may round differently
+        growth = [r ** (1 / y) for r in end_nav[ok] / start[ok]]
+        out[ok] = (np.asarray(growth, dtype=np.float64) - 1) * 100
+        cagr[f"cagr_{y}y"] = out
+
+    short = {}
+    for m in months:
+        start = nav_as_of(values, valid, dates, shift_dates(end_date, months=m))
+        ok = has & ~np.isnan(start)
+        out = np.full(values.shape[0], np.nan)
+        out[ok] = (end_nav[ok] / start[ok] - 1) * 100
+        short[f"return_{m}m"] = out
+
+    return cagr, short
+
+
+def month_end_block(values, dates):
+    """
+    Calendar month-end NAVs per row, the block form of
+    df.resample("ME").last(): one column per month from the first to the
+    last month of `dates`, NaN for months without a NAV.
+
+    Returns (month_values [schemes, months], PeriodIndex of months).
+    """
+    periods = pd.DatetimeIndex(np.asarray(dates, dtype="datetime64[ns]")).to_period("M")
+    months = pd.period_range(periods.min(), periods.max(), freq="M")
+
+    out = np.full((values.shape[0], len(months)), np.nan)
+    if not len(periods):
+        return out, months
+
+    valid = valid_mask(values)
+    codes = periods.asi8
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(codes)] - 1
+
+    ff = ffill_index(valid)
+    rows = np.arange(values.shape[0])[:, None]
+    last_pos = ff[:, ends]
+    month_vals = values[rows, last_pos]
+    any_in_month = np.add.reduceat(valid, starts, axis=1) > 0
+    month_vals[~any_in_month] = np.nan
+
+    out[:, (codes[starts] - months[0].ordinal)] = month_vals
+    return out, months
+
+
+def nan_std(x, ddof=1):
+    """
+    Row-wise sample std ignoring NaN, pandas Series.std semantics
+    (NaN when fewer than ddof + 1 values).
+
+    Each row is compacted before summing so the float summation order --
+    and therefore the result, bit for bit -- matches Series.std on the
+    dropna()'d series. Rows here are monthly, so the loop is cheap.
+    """
+    out = np.full(x.shape[0], np.nan)
+    for i, row in enumerate(x):
+        v = row[~np.isnan(row)]
+        n = len(v)
+        if n <= ddof:
+            continue
+        avg = v.sum() / n
+        out[i] = np.sqrt(((avg - v) ** 2).sum() / (n - ddof))
+    return out
+
+
+def monthly_log_volatility(values, dates):
+    """
+    Annualised std of monthly log returns in percent, per row:
+    std(log(nav_m / nav_m-1) * 100) * sqrt(12).
+    """
+    monthly, _ = month_end_block(values, dates)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        log_ret = np.log(monthly[:, 1:] / monthly[:, :-1]) * 100
+    return nan_std(log_ret) * np.sqrt(12)
+
+
+def max_drawdown(values):
+    """
+    Deepest peak-to-trough fall per row in percent (negative).
+    """
+    return metrics.max_drawdown(values) * 100
+
+
+# =========================
+# ROLLING WINDOWS (Phase-3B)
+# =========================
+def month_span(*longs):
+    """
+    (first ordinal, number of months) covering every month-end frame.
+    """
+    ordinals = [l["month"].array.asi8 for l in longs if not l.empty]
+    if not ordinals:
+        return 0, 0
+    first = min(int(o.min()) for o in ordinals)
+    last = max(int(o.max()) for o in ordinals)
+    return first, last - first + 1
+
+
+def month_grid(long, key, codes, span):
+    """
+    Month-end long frame (key | month | date | nav) -> values
+    [codes, months] on the calendar-month axis `span` (see month_span),
+    NaN where a code has no month-end.
+    """
+    first, width = span
+    out = np.full((len(codes), width), np.nan)
+    if long.empty:
+        return out
+
+    ordinals = long["month"].array.asi8
+
+    pos = {c: i for i, c in enumerate(codes)}
+    rows = long[key].map(pos)
+    keep = rows.notna().to_numpy()
+    out[rows[keep].astype(int).to_numpy(), ordinals[keep] - first] = long["nav"].to_numpy()[keep]
+    return out
+
+
+def compact_rows(values, keep):
+    """
+    Left-aligns the kept values of each row, order preserved, NaN-padded
+    to the longest row. Rolling windows then run over observations, not
+    calendar months -- the same positional windows as .iloc on a
+    dropna()'d series.
+    """
+    order = np.argsort(~keep, axis=1, kind="stable")
+    out = np.take_along_axis(np.where(keep, values, np.nan), order, axis=1)
+    width = int(keep.sum(axis=1).max()) if len(keep) else 0
+    return out[:, :width]
+
+
+def rolling_cagr_block(values, window):
+    """
+    All `window`-observation CAGRs per row (fractions), aligned on the
+    window end; NaN where either end is missing or not positive.
+    """
+    years = window / 12
+    start, end = values[:, :-window], values[:, window:]
+
+    with np.errstate(invalid="ignore"):
+        ok = (start > 0) & (end > 0)
+    out = np.full(start.shape, np.nan)
+    out[ok] = (end[ok] / start[ok]) ** (1 / years) - 1
+    return out
+
+
+def rolling_alpha_block(fund, bench, window):
+    """
+    Rolling fund CAGR minus benchmark CAGR over the same observations.
+    `fund` and `bench` must be row-aligned (see compact_rows).
+    """
+    return rolling_cagr_block(fund, window) - rolling_cagr_block(bench, window)
+
+
+def rolling_summary(block, min_points):
+    """
+    Per row: {"median", "p25", "p75" (percent), "observations"} over the
+    non-NaN windows, or None with fewer than `min_points` windows.
+    """
+    n = (~np.isnan(block)).sum(axis=1) if block.size else np.zeros(len(block), dtype=int)
+    out = [None] * len(block)
+
+    rows = np.flatnonzero(n >= max(min_points, 1))
+    if not len(rows):
+        return out
+
+    sub = block[rows]
+    median = np.nanmedian(sub, axis=1)
+    p25, p75 = np.nanpercentile(sub, [25, 75], axis=1)
+
+    for j, i in enumerate(rows):
+        out[i] = {
+            "median": float(median[j]) * 100,
+            "p25": float(p25[j]) * 100,
+            "p75": float(p75[j]) * 100,
+            "observations": int(n[i])
+        }
+    return out
+
+
+# =========================
+# RISK-ADJUSTED (Phase-3C)
+# =========================
+def tail_mask(valid, n):
+    """
+    Keeps only the last `n` valid positions of each row
+    (the block form of .dropna().tail(n)).
+    """
+    from_right = np.cumsum(valid[:, ::-1], axis=1)[:, ::-1]
+    return valid & (from_right <= n)
+
+
+def risk_adjusted_block(rs, rb, mask, rf_monthly, min_points=6):
+    """
+    Sharpe, Sortino, information ratio, beta and up/down-market beta for
+    every row of aligned monthly fund (rs) and benchmark (rb) returns,
+    over the months flagged in `mask`. Same formulas as the per-fund
+    Phase-3C helpers, on top of metrics.py:
+
+    - sharpe / IR: mean over sample std (ddof=1), annualised by sqrt(12)
+    - sortino: downside deviation over ALL months, 99.0 cap when there
+      is no downside and excess return is positive, else 0.0
+    - betas: cov (ddof=1) / var (ddof=0); up/down use benchmark months
+      > 0 / < 0 and need `min_points` of them
+
+    Returns {name: array}, NaN where the per-fund helper returns None.
+    """
+    fund = np.where(mask, rs, np.nan)
+    bench = np.where(mask, rb, np.nan)
+
+    sharpe = metrics.sharpe(fund, rf_monthly, periods=12, ddof=1)
+
+    n = mask.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        excess = np.nansum(fund, axis=1) / n - rf_monthly
+        ds = metrics.downside_deviation(fund, rf_monthly, full_period=True)
+        sortino = np.where(
+            ds == 0,
+            np.where(excess > 0, 99.0, 0.0),
+            (excess / ds) * np.sqrt(12)
+        )
+
+    ir = metrics.information_ratio(fund, bench, periods=12, ddof=1)
+    beta = metrics.beta(fund, bench)
+
+    up = mask & (rb > 0)
+    upside = metrics.beta(np.where(up, rs, np.nan), np.where(up, rb, np.nan))
+    upside[up.sum(axis=1) < min_points] = np.nan
+
+    down = mask & (rb < 0)
+    downside = metrics.beta(np.where(down, rs, np.nan), np.where(down, rb, np.nan))
+    downside[down.sum(axis=1) < min_points] = np.nan
+
+    return {
+        "sharpe": sharpe,
+        "sortino": sortino,
+        "information_ratio": ir,
+        "beta": beta,
+        "upside_beta": upside,
+        "downside_beta": downside,
+    }
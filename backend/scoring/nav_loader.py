@@ -0,0 +1,387 @@
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from nav_matrix import load_nav_matrix
+
+# =========================
+# CONFIG
+# =========================
+# Single data-access path for NAVs in the scoring package.
+# Fund NAVs come from the local mmap matrix when it is built, otherwise
+# (and for schemes missing from it) from batched $in queries on
+# nav_history. Benchmarks always come from benchmark_nav.
+#
+# Month-end readers (load_fund_monthly / load_benchmark_monthly) read the
+# nav_monthly / benchmark_monthly collections maintained by the ingesters
+# (data_ingestion/nav_monthly.py) first, and resample daily rows (matrix,
+# then nav_history / benchmark_nav) only for the rest.
+#
+# A monthly collection is only read once nav_monthly.rebuild_monthly has
+# completed on it (marker in REBUILD_MARKERS); until then every code is
+# resampled from daily rows. After that, a fund's month-end docs are
+# only used when they cover every month the matrix has NAVs for, so a
+# scheme whose month-ends were missed by a writer falls back to the
+# matrix instead of silently losing months.
+IN_CHUNK = 500          # codes per $in query
+CURSOR_BATCH = 10000    # documents per cursor round trip
+
+REBUILD_MARKERS = "monthly_rebuilds"    # same as data_ingestion/nav_monthly.py
+
+_MATRIX = None
+_MATRIX_LOADED = False
+
+# Running counters, printed by the phases
+LOADER_STATS = {"queries": 0, "docs": 0, "matrix_rows": 0, "seconds": 0.0}
+
+
+def _matrix():
+    global _MATRIX, _MATRIX_LOADED
+    if not _MATRIX_LOADED:
+        _MATRIX = load_nav_matrix()
+        _MATRIX_LOADED = True
+    return _MATRIX
+
+
+def months_cutoff(months, as_of=None):
+    """
+    First day of the month `months` months before `as_of` (default today),
+    i.e. `months` full months plus the current one.
+    """
+    as_of = pd.Timestamp(as_of or datetime.utcnow()).normalize()
+    return (as_of.to_period("M") - months).to_timestamp()
+
+
+def _empty(key):
+    return pd.DataFrame({
+        key: pd.Series(dtype=object),
+        "date": pd.Series(dtype="datetime64[ns]"),
+        "nav": pd.Series(dtype=float),
+    })
+
+
+def _query_long(collection, key, codes, date_filter):
+    keys, dates, navs = [], [], []
+
+    for i in range(0, len(codes), IN_CHUNK):
+        query = {key: {"$in": codes[i:i + IN_CHUNK]}}
+        if date_filter is not None:
+            query["date"] = date_filter
+
+        cursor = collection.find(
+            query,
+            {key: 1, "date": 1, "nav": 1, "_id": 0},
+            batch_size=CURSOR_BATCH
+        )
+        LOADER_STATS["queries"] += 1
+
+        for d in cursor:
+            keys.append(d.get(key))
+            dates.append(d.get("date"))
+            navs.append(d.get("nav"))
+
+    LOADER_STATS["docs"] += len(keys)
+    if not keys:
+        return _empty(key)
+
+    return pd.DataFrame({key: keys, "date": dates, "nav": navs})
+
+
+def _finish(df, key):
+    if df.empty:
+        return _empty(key)
+
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    df["nav"] = pd.to_numeric(df["nav"], errors="coerce")
+    df = df.dropna(subset=["date", "nav"])
+    return df.sort_values([key, "date"], kind="stable").reset_index(drop=True)
+
+
+def load_fund_nav(nav_col, scheme_codes, months=None, as_of=None):
+    """
+    Daily NAVs for many schemes as a long frame:
+        scheme_code | date (datetime64) | nav
+    sorted by (scheme_code, date).
+
+    months=N keeps only rows from months_cutoff(N, as_of) onwards.
+    """
+    started = time.time()
+    codes = list(dict.fromkeys(scheme_codes))
+    cutoff = months_cutoff(months, as_of) if months else None
+
+    frames = []
+    missing = codes
+
+    matrix = _matrix()
+    if matrix is not None:
+        present, block = matrix.block(codes)
+        missing = [c for c in codes if c not in matrix]
+
+        if present:
+            dates = pd.DatetimeIndex(matrix.dates.astype("datetime64[ns]"))
+            start = 0 if cutoff is None else dates.searchsorted(cutoff)
+            sub = block[:, start:]
+            rows, cols = np.nonzero(~np.isnan(sub))    # row-major -> sorted
+            long = pd.DataFrame({
+                "scheme_code": np.asarray(present, dtype=object)[rows],
+                "date": dates[start:][cols],
+                "nav": sub[rows, cols],
+            })
+            frames.append(long)
+            LOADER_STATS["matrix_rows"] += len(long)
+
+    if missing:
+        # nav_history stores ISO date strings
+        date_filter = None if cutoff is None else {"$gte": cutoff.date().isoformat()}
+        frames.append(_query_long(nav_col, "scheme_code", missing, date_filter))
+
+    df = pd.concat(frames, ignore_index=True) if frames else _empty("scheme_code")
+    df = _finish(df, "scheme_code")
+
+    LOADER_STATS["seconds"] += time.time() - started
+    return df
+
+
+def load_benchmark_nav(benchmark_col, benchmarks, months=None, as_of=None):
+    """
+    Benchmark closes for many indices as a long frame:
+        benchmark | date (datetime64) | nav
+    """
+    started = time.time()
+    codes = [b for b in dict.fromkeys(benchmarks) if b]
+    cutoff = months_cutoff(months, as_of) if months else None
+
+    # benchmark_nav stores native datetimes
+    date_filter = None if cutoff is None else {"$gte": cutoff.to_pydatetime()}
+    df = _finish(_query_long(benchmark_col, "benchmark", codes, date_filter), "benchmark")
+
+    LOADER_STATS["seconds"] += time.time() - started
+    return df
+
+
+def load_fund_block(nav_col, scheme_codes, months=None, as_of=None):
+    """
+    Daily NAVs for many schemes as one aligned block:
+        (codes, dates datetime64[ns] [days], values float64 [codes, days])
+    NaN where a scheme has no NAV. Codes without any NAV are dropped.
+    Rows come straight from the matrix when it is built; schemes missing
+    from it are read from nav_history and scattered onto the same axis.
+    """
+    codes = list(dict.fromkeys(scheme_codes))
+    cutoff = months_cutoff(months, as_of) if months else None
+
+    matrix = _matrix()
+    in_matrix = [c for c in codes if matrix is not None and c in matrix]
+    rest = [c for c in codes if matrix is None or c not in matrix]
+
+    long = load_fund_nav(nav_col, rest, months, as_of) if rest else _empty("scheme_code")
+    extra = list(dict.fromkeys(long["scheme_code"]))
+
+    if in_matrix:
+        started = time.time()
+        base = matrix.dates.astype("datetime64[ns]")
+        start = 0 if cutoff is None else np.searchsorted(base, cutoff.to_datetime64())
+        base = base[start:]
+        _, block = matrix.block(in_matrix)
+        block = np.asarray(block[:, start:])
+        LOADER_STATS["matrix_rows"] += int((~np.isnan(block)).sum())
+        LOADER_STATS["seconds"] += time.time() - started
+    else:
+        base = np.array([], dtype="datetime64[ns]")
+        block = np.empty((0, 0))
+
+    long_dates = long["date"].to_numpy(dtype="datetime64[ns]")
+    dates = np.union1d(base, long_dates) if len(long_dates) else base
+
+    values = np.full((len(in_matrix) + len(extra), len(dates)), np.nan)
+    if in_matrix:
+        if len(dates) == len(base):
+            values[:len(in_matrix)] = block
+        else:
+            values[:len(in_matrix), np.searchsorted(dates, base)] = block
+    if extra:
+        pos = {c: len(in_matrix) + i for i, c in enumerate(extra)}
+        values[
+            long["scheme_code"].map(pos).to_numpy(),
+            np.searchsorted(dates, long_dates)
+        ] = long["nav"].to_numpy(dtype=np.float64)
+
+    present = in_matrix + extra
+    keep = ~np.isnan(values).all(axis=1)
+    return [c for c, k in zip(present, keep) if k], dates, values[keep]
+
+
+_REBUILT = {}
+
+
+def _monthly_rebuilt(monthly_col):
+    name = monthly_col.name
+    if name not in _REBUILT:
+        marker = monthly_col.database[REBUILD_MARKERS].find_one({"_id": name})
+        _REBUILT[name] = marker is not None
+        if marker is None:
+            print(f"⚠ {name} has no completed rebuild, resampling daily NAVs instead "
+                  f"(python data_ingestion/nav_monthly.py)")
+    return _REBUILT[name]
+
+
+def _query_monthly(monthly_col, key, codes, cutoff):
+    keys, months, dates, navs = [], [], [], []
+
+    for i in range(0, len(codes), IN_CHUNK):
+        query = {key: {"$in": codes[i:i + IN_CHUNK]}}
+        if cutoff is not None:
+            query["month"] = {"$gte": cutoff.strftime("%Y-%m")}
+
+        cursor = monthly_col.find(
+            query,
+            {key: 1, "month": 1, "date": 1, "nav": 1, "_id": 0},
+            batch_size=CURSOR_BATCH
+        )
+        LOADER_STATS["queries"] += 1
+
+        for d in cursor:
+            keys.append(d.get(key))
+            months.append(d.get("month"))
+            dates.append(d.get("date"))
+            navs.append(d.get("nav"))
+
+    LOADER_STATS["docs"] += len(keys)
+
+    df = pd.DataFrame({key: keys, "month": months, "date": dates, "nav": navs})
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    df["nav"] = pd.to_numeric(df["nav"], errors="coerce")
+    df = df.dropna(subset=["month", "date", "nav"])
+    df["month"] = pd.PeriodIndex(df["month"], freq="M")
+    return df
+
+
+def _matrix_month_counts(matrix, codes, cutoff):
+    """
+    {code: months with at least one NAV in the matrix} from `cutoff` on.
+    """
+    present, block = matrix.block(codes)
+    if not present:
+        return {}
+
+    base = matrix.dates.astype("datetime64[ns]")
+    start = 0 if cutoff is None else np.searchsorted(base, cutoff.to_datetime64())
+    months = matrix.dates[start:].astype("datetime64[M]")
+    if not len(months):
+        return dict.fromkeys(present, 0)
+
+    bounds = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    valid = ~np.isnan(np.asarray(block[:, start:]))
+    covered = np.logical_or.reduceat(valid, bounds, axis=1).sum(axis=1)
+    return dict(zip(present, covered.tolist()))
+
+
+def _combine_monthly(frames, key):
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return monthly_last(_empty(key), key)
+    df = pd.concat(frames, ignore_index=True)
+    return df.sort_values([key, "month"], kind="stable").reset_index(drop=True)
+
+
+def load_fund_monthly(nav_col, monthly_col, scheme_codes, months=None, as_of=None):
+    """
+    Month-end NAVs for many schemes, same shape as
+    monthly_last(load_fund_nav(...)):
+        scheme_code | month (Period[M]) | date | nav
+    """
+    codes = list(dict.fromkeys(scheme_codes))
+    cutoff = months_cutoff(months, as_of) if months else None
+    frames = []
+    matrix = _matrix()
+
+    if codes and _monthly_rebuilt(monthly_col):
+        started = time.time()
+        stored = _query_monthly(monthly_col, "scheme_code", codes, cutoff)
+        counts = stored["scheme_code"].value_counts().to_dict()
+        expected = _matrix_month_counts(matrix, codes, cutoff) if matrix is not None else {}
+        complete = {c for c, n in counts.items() if n >= expected.get(c, 0)}
+        LOADER_STATS["seconds"] += time.time() - started
+
+        frames.append(stored[stored["scheme_code"].isin(complete)])
+        codes = [c for c in codes if c not in complete]
+
+    if codes:
+        frames.append(monthly_last(
+            load_fund_nav(nav_col, codes, months, as_of), "scheme_code"
+        ))
+
+    return _combine_monthly(frames, "scheme_code")
+
+
+def load_benchmark_monthly(benchmark_col, monthly_col, benchmarks, months=None, as_of=None):
+    """
+    Month-end closes for many indices, same shape as
+    monthly_last(load_benchmark_nav(...)):
+        benchmark | month (Period[M]) | date | nav
+    """
+    codes = [b for b in dict.fromkeys(benchmarks) if b]
+    cutoff = months_cutoff(months, as_of) if months else None
+    frames = []
+
+    if codes and _monthly_rebuilt(monthly_col):
+        started = time.time()
+        stored = _query_monthly(monthly_col, "benchmark", codes, cutoff)
+        LOADER_STATS["seconds"] += time.time() - started
+        frames.append(stored)
+
+        seen = set(stored["benchmark"])
+        codes = [b for b in codes if b not in seen]
+
+    if codes:
+        frames.append(monthly_last(
+            load_benchmark_nav(benchmark_col, codes, months, as_of), "benchmark"
+        ))
+
+    return _combine_monthly(frames, "benchmark")
+
+
+# =========================
+# SHAPING
+# =========================
+def split_by(long, key):
+    """
+    {code: frame(date, nav)} from a long frame, each sorted by date.
+    """
+    return {
+        code: grp.drop(columns=key).reset_index(drop=True)
+        for code, grp in long.groupby(key, sort=False)
+    }
+
+
+def monthly_last(long, key):
+    """
+    Last NAV per (code, calendar month):
+        key | month (Period[M]) | date | nav
+    """
+    if long.empty:
+        out = long.copy()
+        out["month"] = pd.Series(dtype="period[M]")
+        return out[[key, "month", "date", "nav"]]
+
+    df = long.copy()
+    df["month"] = df["date"].dt.to_period("M")
+    return df.groupby([key, "month"], sort=True).last().reset_index()
+
+
+def pivot_nav(long, key, column="date"):
+    """
+    Wide frame: index = `column` (date or month), one column per code.
+    """
+    return long.pivot(index=column, columns=key, values="nav").sort_index()
+
+
+def loader_summary():
+    return (
+        f"NAV loader: {LOADER_STATS['queries']} queries, "
+        f"{LOADER_STATS['docs']} docs, "
+        f"{LOADER_STATS['matrix_rows']} matrix rows, "
+        f"{LOADER_STATS['seconds']:.2f}s"
+    )
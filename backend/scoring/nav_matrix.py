@@ -0,0 +1,295 @@
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# =========================
+# CONFIG
+# =========================
+# Dense scheme x trading-day NAV matrix on local disk, shared by all
+# scoring phases through np.load(mmap_mode="r").
+#
+# Layout (one directory per build, CURRENT points at the live one):
+#   <NAV_MATRIX_DIR>/CURRENT
+#   <NAV_MATRIX_DIR>/v<timestamp>/nav.npy       float64 [schemes, days], NaN = no NAV
+#   <NAV_MATRIX_DIR>/v<timestamp>/dates.npy     datetime64[D] [days]
+#   <NAV_MATRIX_DIR>/v<timestamp>/schemes.json  scheme_code per row
+#   <NAV_MATRIX_DIR>/v<timestamp>/meta.json
+NAV_MATRIX_DIR = os.getenv(
+    "NAV_MATRIX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "nav_matrix")
+)
+
+# Days re-read on every refresh so late AMFI revisions are picked up;
+# schemes given older rows are flagged by the writers
+# (data_ingestion/amfi/nav_bulk.py) and get their full history re-read
+REFRESH_TAIL_DAYS = int(os.getenv("NAV_MATRIX_TAIL_DAYS", "10"))
+DIRTY_COLLECTION = "nav_matrix_dirty"   # same as data_ingestion/amfi/nav_bulk.py
+KEEP_VERSIONS = 2
+
+
+# =========================
+# READ SIDE
+# =========================
+class NavMatrix:
+    """
+    Read-only view over one build of the NAV matrix.
+    `values` is a memory map: rows are only paged in when touched.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dates = np.load(os.path.join(path, "dates.npy"))
+        self.values = np.load(os.path.join(path, "nav.npy"), mmap_mode="r")
+
+        with open(os.path.join(path, "schemes.json"), "r", encoding="utf-8") as f:
+            self.codes = json.load(f)
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        self.index = {code: i for i, code in enumerate(self.codes)}
+
+    def __contains__(self, scheme_code):
+        return scheme_code in self.index
+
+    def row(self, scheme_code):
+        """
+        Zero-copy NAV row (NaN where the scheme has no NAV), or None.
+        """
+        i = self.index.get(scheme_code)
+        return None if i is None else self.values[i]
+
+    def frame(self, scheme_code):
+        """
+        Long frame with `date` (datetime64) and `nav` columns, sorted by
+        date -- the shape Mongo-backed fetch helpers build. None if absent.
+        """
+        row = self.row(scheme_code)
+        if row is None:
+            return None
+
+        mask = ~np.isnan(row)
+        if not mask.any():
+            return None
+
+        return pd.DataFrame({
+            "date": pd.DatetimeIndex(self.dates[mask].astype("datetime64[ns]")),
+            "nav": np.asarray(row[mask]),
+        })
+
+    def block(self, scheme_codes):
+        """
+        Returns (codes_present, 2-D array) for many schemes at once.
+        """
+        present = [c for c in scheme_codes if c in self.index]
+        rows = [self.index[c] for c in present]
+        return present, self.values[rows]
+
+
+def load_nav_matrix(store_dir=NAV_MATRIX_DIR):
+    """
+    Opens the live build, or returns None when no matrix has been built
+    (or USE_NAV_MATRIX=0 forces the Mongo path).
+    """
+    if os.getenv("USE_NAV_MATRIX", "1") == "0":
+        return None
+    try:
+        with open(os.path.join(store_dir, "CURRENT"), "r", encoding="utf-8") as f:
+            version = f.read().strip()
+        return NavMatrix(os.path.join(store_dir, version))
+    except (OSError, ValueError):
+        return None
+
+
+# =========================
+# WRITE SIDE
+# =========================
+def _read_long(nav_col, query):
+    codes, dates, navs = [], [], []
+
+    cursor = nav_col.find(
+        query,
+        {"scheme_code": 1, "date": 1, "nav": 1, "_id": 0},
+        batch_size=10000
+    )
+    for d in cursor:
+        codes.append(d.get("scheme_code"))
+        dates.append(d.get("date"))
+        navs.append(d.get("nav"))
+
+    df = pd.DataFrame({"scheme_code": codes, "date": dates, "nav": navs})
+    if df.empty:
+        return df
+
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    df["nav"] = pd.to_numeric(df["nav"], errors="coerce")
+    df = df.dropna(subset=["scheme_code", "date", "nav"])
+    df["date"] = df["date"].dt.normalize()
+    return df
+
+
+def _day_axis(df):
+    return df["date"].to_numpy().astype("datetime64[D]")
+
+
+def _write_version(store_dir, codes, dates, fill):
+    """
+    Allocates a new version directory, lets `fill(mat)` populate the
+    memmap, then flips CURRENT atomically.
+    """
+    version = "v" + datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+    path = os.path.join(store_dir, version)
+    os.makedirs(path)
+
+    mat = np.lib.format.open_memmap(
+        os.path.join(path, "nav.npy"), mode="w+",
+        dtype=np.float64, shape=(len(codes), len(dates))
+    )
+    mat[:] = np.nan
+    fill(mat)
+    mat.flush()
+    del mat
+
+    np.save(os.path.join(path, "dates.npy"), dates)
+    with open(os.path.join(path, "schemes.json"), "w", encoding="utf-8") as f:
+        json.dump(list(codes), f)
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "built_at": datetime.utcnow().isoformat(),
+            "schemes": len(codes),
+            "days": len(dates),
+            "first_date": str(dates[0]) if len(dates) else None,
+            "last_date": str(dates[-1]) if len(dates) else None,
+        }, f, indent=2)
+
+    tmp = os.path.join(store_dir, "CURRENT.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(store_dir, "CURRENT"))
+
+    # open memmaps of older versions stay valid after unlink (POSIX)
+    versions = sorted(v for v in os.listdir(store_dir) if v.startswith("v"))
+    for old in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(store_dir, old), ignore_errors=True)
+
+    return path
+
+
+def _scatter(mat, df, code_pos, date_axis):
+    rows = df["scheme_code"].map(code_pos).to_numpy()
+    cols = np.searchsorted(date_axis, _day_axis(df))
+    mat[rows, cols] = df["nav"].to_numpy(dtype=np.float64)
+
+
+def _dirty_codes(nav_col):
+    """
+    (scheme_codes, read_at) flagged in DIRTY_COLLECTION by the writers.
+    """
+    read_at = datetime.utcnow()
+    codes = [d["_id"] for d in nav_col.database[DIRTY_COLLECTION].find({}, {"_id": 1})]
+    return codes, read_at
+
+
+def _clear_dirty(nav_col, codes, read_at):
+    # marks set again while the refresh ran stay for the next one
+    nav_col.database[DIRTY_COLLECTION].delete_many(
+        {"_id": {"$in": codes}, "marked_at": {"$lte": read_at}}
+    )
+
+
+def refresh_nav_matrix(nav_col, store_dir=NAV_MATRIX_DIR, full=False):
+    """
+    Brings the on-disk matrix up to date with nav_history.
+
+    - no build yet / full=True -> full rebuild from every NAV document
+    - otherwise                -> re-reads the last REFRESH_TAIL_DAYS days,
+                                  plus full history for new schemes and
+                                  for schemes flagged in DIRTY_COLLECTION,
+                                  and writes a new version
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    current = None if full else load_nav_matrix(store_dir)
+
+    if current is None or not len(current.dates):
+        print("NAV matrix: full build...")
+        dirty, read_at = _dirty_codes(nav_col)
+        df = _read_long(nav_col, {})
+        if df.empty:
+            print("NAV matrix: nav_history is empty, nothing built")
+            return None
+
+        codes = sorted(df["scheme_code"].unique())
+        dates = np.unique(_day_axis(df))
+        code_pos = {c: i for i, c in enumerate(codes)}
+
+        path = _write_version(
+            store_dir, codes, dates,
+            lambda mat: _scatter(mat, df, code_pos, dates)
+        )
+        print(f"NAV matrix: {len(codes)} schemes x {len(dates)} days -> {path}")
+        if dirty:
+            _clear_dirty(nav_col, dirty, read_at)
+        return path
+
+    nav_col.create_index("date")
+
+    cutoff = (
+        pd.Timestamp(current.dates[-1]) - timedelta(days=REFRESH_TAIL_DAYS)
+    ).date().isoformat()
+    tail = _read_long(nav_col, {"date": {"$gte": cutoff}})
+
+    dirty, read_at = _dirty_codes(nav_col)
+    stale = set(dirty)
+    if not tail.empty:
+        stale |= set(tail["scheme_code"]) - set(current.index)
+    stale = sorted(stale)
+
+    if stale:
+        history = _read_long(nav_col, {"scheme_code": {"$in": stale}})
+        tail = pd.concat([tail, history], ignore_index=True)
+    new_codes = sorted(set(tail["scheme_code"]) - set(current.index)) if not tail.empty else []
+
+    codes = list(current.codes) + new_codes
+    dates = np.union1d(current.dates, _day_axis(tail)) if not tail.empty else current.dates
+    code_pos = {c: i for i, c in enumerate(codes)}
+
+    def fill(mat):
+        n_old = len(current.codes)
+        if np.array_equal(dates[:len(current.dates)], current.dates):
+            mat[:n_old, :len(current.dates)] = current.values
+        else:
+            mat[:n_old, np.searchsorted(dates, current.dates)] = current.values
+        # stale rows are rewritten from their full history
+        for code in stale:
+            if code in current.index:
+                mat[current.index[code]] = np.nan
+        if not tail.empty:
+            _scatter(mat, tail, code_pos, dates)
+
+    path = _write_version(store_dir, codes, dates, fill)
+    print(
+        f"NAV matrix: refreshed {len(tail)} rows since {cutoff}, "
+        f"{len(new_codes)} new / {sum(c in current.index for c in stale)} re-read schemes "
+        f"-> {len(codes)} x {len(dates)}"
+    )
+    if dirty:
+        _clear_dirty(nav_col, dirty, read_at)
+    return path
+
+
+# =========================
+# ENTRY (daily pipeline, after store_nav.py)
+# =========================
+if __name__ == "__main__":
+    import sys
+    import certifi
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+
+    client = MongoClient(os.getenv("MONGO_URI"), tlsCAFile=certifi.where())
+    refresh_nav_matrix(client["mfscreener"]["nav_history"], full="--full" in sys.argv)
@@ -1,11 +1,19 @@
-import numpy as np
-from scipy.stats import rankdata
 import os
 from dotenv import load_dotenv
 import certifi
 from pymongo import MongoClient
 from datetime import datetime
 import math
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from publish import publish_collection
+from rank_engine import (
+    percentile_ranks, symmetric_band_scores, one_sided_penalty_scores,
+    to_matrix, score_or_none
+)
 
 # =========================
 # Mongo Config
@@ -41,6 +49,44 @@ CATEGORY_MAP = {
 
 MIN_FUNDS = 3
 
+# Percentile-ranked metrics; REVERSED ones rank lower values higher
+RANKED_METRICS = [
+    "cagr_1y","cagr_3y","cagr_5y","return_3m","return_6m",
+    "alpha_3y","alpha_5y","alpha_iqr_3y","alpha_iqr_5y",
+    "volatility","max_dd",
+    "sharpe","sortino","ir","up_beta","down_beta",
+    "pe","pb","roe","sector_hhi","turnover","ter","manager_exp"
+]
+REVERSED_METRICS = {
+    "volatility","max_dd","iqr_3y","iqr_5y","ter","turnover","sector_hhi","down_beta","pe","pb"
+}
+
+IN_CHUNK = 500   # keys per $in query
+
+# Only the fields normalisation reads
+SCORE_FIELDS = {
+    "scheme_code": 1, "metrics.performance": 1, "metrics.risk": 1,
+    "metrics.risk_adjusted": 1
+}
+FUND_MASTER_FIELDS = {"scheme_code": 1, "fund_key": 1}
+HOLDINGS_FIELDS = {
+    "fund_key": 1, "top_10_weight": 1, "equity_stock_count": 1,
+    "metrics.top_10_equity": 1, "metrics.equity_stock_count": 1,
+    "section_summary.top_10_equity": 1, "portfolio_valuation": 1
+}
+SECTOR_FIELDS = {
+    "fund_key": 1, "sector_concentration.sector_weights": 1,
+    "sector_concentration.top_3_sector_pct": 1
+}
+ATTRIBUTE_FIELDS = {
+    "fund_key": 1, "portfolio_turnover": 1, "ter_direct_pct": 1,
+    "monthly_avg_aum_cr": 1, "fund_manager.experience_years": 1
+}
+CONSISTENCY_FIELDS = {
+    "scheme_code": 1, "consistency.rolling_alpha_3y": 1,
+    "consistency.rolling_alpha_5y": 1
+}
+
 # =========================
 # Helpers
 # =========================
@@ -52,18 +98,6 @@ def clean_number(x):
     except TypeError:
         return x
 
-def percentile_map(values, reverse=False):
-    clean = [v for v in values if v is not None]
-    if len(clean) < MIN_FUNDS:
-        return {}
-
-    arr = np.array(clean, dtype=float)
-    if reverse:
-        arr = -arr
-
-    ranks = rankdata(arr, method="average") / len(arr) * 100
-    return dict(zip(clean, ranks))
-
 def extract_top10(ph):
     # 1️⃣ Preferred: standard field
     if ph.get("top_10_weight") is not None:
@@ -80,40 +114,6 @@ def extract_top10(ph):
     # 4️⃣ Absolute fallback
     return None
 
-def symmetric_band(value, p10, p25, p75, p90):
-    if value is None:
-        return None
-
-    # Core band
-    if p25 <= value <= p75:
-        return 75
-
-    # Lower tail
-    if value < p25:
-        if p25 == p10:
-            return 25
-        score = 75 - (p25 - value) / (p25 - p10) * 50
-        return max(25, round(score, 2))
-
-    # Upper tail
-    if value > p75:
-        if p90 == p75:
-            return 25
-        score = 75 - (value - p75) / (p90 - p75) * 50
-        return max(25, round(score, 2))
-
-    return 25
-
-
-def one_sided_penalty(value, p75, p90):
-    if value is None:
-        return None
-    if value <= p75:
-        return 75
-    if value <= p90:
-        return 75 - (value - p75) / (p90 - p75) * 25
-    return 30
-
 def consistency_confidence(obs_3y, obs_5y, max_3y=120, max_5y=96):
     """
     Returns confidence score in 0–100 range based on available rolling windows.
@@ -132,17 +132,21 @@ def calculate_hhi(sector_weights):
         return None
     return sum((w / 100) ** 2 for w in sector_weights.values())
 
-def percentile_map_by_scheme(merged, field, reverse=False):
-    data = [(m["scheme_code"], m[field]) for m in merged if m[field] is not None]
-    if len(data) < MIN_FUNDS:
-        return {}
 
-    values = np.array([v for _, v in data], dtype=float)
-    if reverse:
-        values = -values
+def fetch_keyed(coll, key, values, projection, stats):
+    """
+    {key value: doc} for many keys with chunked $in queries. The first
+    doc per key wins, as find_one would return it.
+    """
+    values = list(dict.fromkeys(v for v in values if v is not None))
+    out = {}
 
-    pct = rankdata(values, method="average") / len(values) * 100
-    return {code: float(pct[i]) for i, (code, _) in enumerate(data)}
+    for i in range(0, len(values), IN_CHUNK):
+        for doc in coll.find({key: {"$in": values[i:i + IN_CHUNK]}}, projection):
+            out.setdefault(doc.get(key), doc)
+        stats["queries"] += 1
+
+    return out
 
 
 # =========================
@@ -151,23 +155,38 @@ def percentile_map_by_scheme(merged, field, reverse=False):
 def normalize_category(category, score_coll):
 
     print(f"\n[*] Normalizing {category}")
-    score_docs = list(db[score_coll].find({}))
+    started = time.time()
+    stats = {"queries": 1}
+
+    score_docs = list(db[score_coll].find({}, SCORE_FIELDS))
     if not score_docs:
         return
 
+    # -------- Bulk join: every source prefetched with $in --------
+    schemes = [s.get("scheme_code") for s in score_docs]
+    fund_master = fetch_keyed(db.fund_master_v2, "scheme_code", schemes, FUND_MASTER_FIELDS, stats)
+    fund_keys = [fm["fund_key"] for fm in fund_master.values()]
+
+    holdings = fetch_keyed(db.portfolio_holdings_v2, "fund_key", fund_keys, HOLDINGS_FIELDS, stats)
+    sectors = fetch_keyed(db.qual_sector_concentration, "fund_key", fund_keys, SECTOR_FIELDS, stats)
+    attributes = fetch_keyed(db.qualitative_fund_attributes, "fund_key", fund_keys, ATTRIBUTE_FIELDS, stats)
+    consistency = fetch_keyed(
+        db[f"{score_coll}_consistency"], "scheme_code", schemes, CONSISTENCY_FIELDS, stats
+    )
+
     merged = []
 
     for s in score_docs:
         scheme = s.get("scheme_code")
-        fm = db.fund_master_v2.find_one({"scheme_code": scheme})
+        fm = fund_master.get(scheme)
         if not fm:
             continue
 
         fund_key = fm["fund_key"]
-        ph = db.portfolio_holdings_v2.find_one({"fund_key": fund_key})
-        qs = db.qual_sector_concentration.find_one({"fund_key": fund_key})
-        qa = db.qualitative_fund_attributes.find_one({"fund_key": fund_key})
-        sc = db[f"{score_coll}_consistency"].find_one({"scheme_code": scheme})
+        ph = holdings.get(fund_key)
+        qs = sectors.get(fund_key)
+        qa = attributes.get(fund_key)
+        sc = consistency.get(scheme)
 
         if not (ph and qs and qa):
             continue
@@ -266,34 +285,33 @@ def normalize_category(category, score_coll):
             "roe": pv.get("portfolio_roe"),
         })
 
+    print(f"[i] Joined {len(merged)}/{len(score_docs)} funds: "
+          f"{stats['queries']} queries, {time.time() - started:.2f}s")
+
     if len(merged) < MIN_FUNDS:
         return
 
-    # -------- Percentile maps --------
-    pm = {
-        k: percentile_map([m[k] for m in merged], reverse=k in {
-            "volatility","max_dd","iqr_3y","iqr_5y","ter","turnover","sector_hhi","down_beta","pe","pb"
-        })
-        for k in [
-            "cagr_1y","cagr_3y","cagr_5y","return_3m","return_6m",
-            "alpha_3y","alpha_5y","alpha_iqr_3y","alpha_iqr_5y",
-            "volatility","max_dd",
-            "sharpe","sortino","ir","up_beta","down_beta",
-            "pe","pb","roe","sector_hhi","turnover","ter","manager_exp"
-        ]
+    # -------- Percentile ranks (all metrics, one pass, keyed by scheme) --------
+    ranks = percentile_ranks(
+        to_matrix(merged, RANKED_METRICS),
+        reverse=[k in REVERSED_METRICS for k in RANKED_METRICS],
+        min_funds=MIN_FUNDS
+    )
+    pct = {
+        m["scheme_code"]: dict(zip(RANKED_METRICS, map(score_or_none, ranks[i])))
+        for i, m in enumerate(merged)
     }
-    pm_turnover = percentile_map_by_scheme(merged, "turnover", reverse=True)
-
-    # -------- Thresholds --------
-    def pct_vals(k): return [m[k] for m in merged if m[k] is not None]
 
-    p_stock = np.percentile(pct_vals("stock_count"), [10,25,75,90])
-    p_aum   = np.percentile(pct_vals("aum"), [10,25,75,90])
-    p_top10 = np.percentile(pct_vals("top10"), [75,90])
-    p_top3  = np.percentile(pct_vals("top3_sector"), [75,90])
+    # -------- Band scores --------
+    bands = to_matrix(merged, ["stock_count", "aum", "top10", "top3_sector"])
+    band_stock = symmetric_band_scores(bands[:, 0])
+    band_aum = symmetric_band_scores(bands[:, 1])
+    band_top10 = one_sided_penalty_scores(bands[:, 2])
+    band_top3 = one_sided_penalty_scores(bands[:, 3])
 
     out = []
-    for m in merged:
+    for i, m in enumerate(merged):
+        r = pct[m["scheme_code"]]
         consistency_conf = consistency_confidence(
         m.get("rolling_3y_obs"),
         m.get("rolling_5y_obs")
@@ -305,29 +323,29 @@ def normalize_category(category, score_coll):
             "category": category,
 
             "normalized_sub_scores": {
-                "returns": {k: pm[k].get(m[k]) for k in ["cagr_1y","cagr_3y","cagr_5y","return_3m","return_6m"]},
+                "returns": {k: r[k] for k in ["cagr_1y","cagr_3y","cagr_5y","return_3m","return_6m"]},
                 "consistency": {
-                    **{k: pm[k].get(m[k]) for k in ["alpha_3y","alpha_5y","alpha_iqr_3y","alpha_iqr_5y",]},
+                    **{k: r[k] for k in ["alpha_3y","alpha_5y","alpha_iqr_3y","alpha_iqr_5y",]},
                     "confidence": consistency_conf
                 },
                 "risk": {
-                    "volatility": pm["volatility"].get(m["volatility"]),
-                    "max_dd": pm["max_dd"].get(m["max_dd"]),
-                    "up_beta": pm["up_beta"].get(m["up_beta"]),
-                    "down_beta": pm["down_beta"].get(m["down_beta"]),
+                    "volatility": r["volatility"],
+                    "max_dd": r["max_dd"],
+                    "up_beta": r["up_beta"],
+                    "down_beta": r["down_beta"],
                 },
-                "risk_adjusted": {k: pm[k].get(m[k]) for k in ["sharpe","sortino","ir"]},
+                "risk_adjusted": {k: r[k] for k in ["sharpe","sortino","ir"]},
                 "portfolio_quality": {
-                    "stock_count": symmetric_band(m["stock_count"], *p_stock),
-                    "aum": symmetric_band(m["aum"], *p_aum),
-                    "top10": one_sided_penalty(m["top10"], *p_top10),
-                    "sector_hhi": pm["sector_hhi"].get(m["sector_hhi"]),
-                    "top3_sector": one_sided_penalty(m["top3_sector"], *p_top3),
-                    "turnover": pm_turnover.get(m["scheme_code"]),
-                    "ter": pm["ter"].get(m["ter"]),
-                    "manager_experience": pm["manager_exp"].get(m["manager_exp"]),
+                    "stock_count": score_or_none(band_stock[i]),
+                    "aum": score_or_none(band_aum[i]),
+                    "top10": score_or_none(band_top10[i]),
+                    "sector_hhi": r["sector_hhi"],
+                    "top3_sector": score_or_none(band_top3[i]),
+                    "turnover": r["turnover"],
+                    "ter": r["ter"],
+                    "manager_experience": r["manager_exp"],
                 },
-                "valuation": {k: pm[k].get(m[k]) for k in ["pe","pb","roe"]},
+                "valuation": {k: r[k] for k in ["pe","pb","roe"]},
             },
             "meta": {
                 "universe_size": len(merged),
@@ -336,8 +354,7 @@ def normalize_category(category, score_coll):
         })
 
     coll = f"normalized_{category.lower().replace(' ', '_')}_scores"
-    db[coll].delete_many({})
-    db[coll].insert_many(out)
+    publish_collection(db, coll, out, indexes=[("scheme_code", {}), ("fund_key", {})])
 
     print(f"[OK] Normalized {len(out)} funds")
 
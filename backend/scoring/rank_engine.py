@@ -0,0 +1,130 @@
+import numpy as np
+
+# =========================
+# PERCENTILE RANK ENGINE
+# =========================
+# Cross-sectional scoring for normalisation, on a fund x metric matrix
+# (float64, NaN = missing). Every metric is ranked in one vectorized
+# pass; results stay row-aligned with the funds, so equal values from
+# different funds can never collide.
+
+
+def percentile_ranks(values, reverse=None, min_funds=1):
+    """
+    Average-method percentile rank (rank / n * 100, as
+    scipy.stats.rankdata(method="average")) of every column, among that
+    column's non-NaN values.
+
+    reverse   bool per column: rank descending (lower value = better)
+    min_funds columns with fewer values are left all-NaN
+
+    Returns a float64 matrix shaped like `values`, NaN where missing.
+    """
+    x = np.array(values, dtype=np.float64)
+    if reverse is not None:
+        x[:, np.asarray(reverse, dtype=bool)] *= -1
+
+    rows, cols = x.shape
+    out = np.full((rows, cols), np.nan)
+    if not rows:
+        return out
+
+    order = np.argsort(x, axis=0, kind="stable")        # NaN sorts last
+    ordered = np.take_along_axis(x, order, axis=0)
+    n = (~np.isnan(x)).sum(axis=0)
+
+    # tie groups along each sorted column
+    pos = np.arange(rows)[:, None]
+    new_group = np.ones((rows, cols), dtype=bool)
+    new_group[1:] = ordered[1:] != ordered[:-1]
+    start = np.maximum.accumulate(np.where(new_group, pos, 0), axis=0)
+
+    last = np.ones((rows, cols), dtype=bool)
+    last[:-1] = new_group[1:]
+    end = np.minimum.accumulate(np.where(last, pos, rows - 1)[::-1], axis=0)[::-1]
+
+    ranks = (start + end) / 2 + 1
+    ranked = np.full((rows, cols), np.nan)
+    np.put_along_axis(ranked, order, ranks / np.maximum(n, 1) * 100, axis=0)
+
+    keep = ~np.isnan(x) & (n >= min_funds)
+    out[keep] = ranked[keep]
+    return out
+
+
+def _thresholds(column, q):
+    clean = column[~np.isnan(column)]
+    if not len(clean):
+        return None
+    return np.percentile(clean, q)
+
+
+def _round2(values):
+    # Python's round() (correctly rounded), not np.round
+    return np.array([round(float(v), 2) for v in values], dtype=np.float64)
+
+
+def symmetric_band_scores(column):
+    """
+    Vectorized symmetric_band over one metric column: 75 inside the
+    p25-p75 core, falling linearly to a floor of 25 at p10 / p90.
+    NaN in -> NaN out.
+    """
+    out = np.full(len(column), np.nan)
+    p = _thresholds(column, [10, 25, 75, 90])
+    if p is None:
+        return out
+    p10, p25, p75, p90 = p
+
+    has = ~np.isnan(column)
+    core = has & (column >= p25) & (column <= p75)
+    low = has & (column < p25)
+    high = has & (column > p75)
+
+    out[has] = 25
+    out[core] = 75
+
+    if p25 == p10:
+        out[low] = 25
+    elif low.any():
+        out[low] = np.maximum(25, _round2(75 - (p25 - column[low]) / (p25 - p10) * 50))
+
+    if p90 == p75:
+        out[high] = 25
+    elif high.any():
+        out[high] = np.maximum(25, _round2(75 - (column[high] - p75) / (p90 - p75) * 50))
+
+    return out
+
+
+def one_sided_penalty_scores(column):
+    """
+    Vectorized one_sided_penalty: 75 up to p75, linear down to 50 at
+    p90, 30 beyond. NaN in -> NaN out.
+    """
+    out = np.full(len(column), np.nan)
+    p = _thresholds(column, [75, 90])
+    if p is None:
+        return out
+    p75, p90 = p
+
+    has = ~np.isnan(column)
+    out[has] = 30
+    mid = has & (column > p75) & (column <= p90)
+    out[mid] = 75 - (column[mid] - p75) / (p90 - p75) * 25
+    out[has & (column <= p75)] = 75
+    return out
+
+
+def to_matrix(rows, fields):
+    """
+    [{field: value}] -> float64 matrix [rows, fields], None -> NaN.
+    """
+    return np.array(
+        [[np.nan if r.get(f) is None else r[f] for f in fields] for r in rows],
+        dtype=np.float64
+    ).reshape(len(rows), len(fields))
+
+
+def score_or_none(v):
+    return None if np.isnan(v) else float(v)
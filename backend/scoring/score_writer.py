@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import time
+
+from pymongo import UpdateOne
+
+# =========================
+# CONFIG
+# =========================
+# Shared write-back for the scoring phases. Each phase queues one $set
+# payload per fund; flush() sends them as unordered bulk_write batches
+# and skips funds whose payload hashes the same as on the last run.
+#
+# The hash of the last written payload is kept on the document under
+# write_hash.<phase>, so phases sharing a collection (3A / 3C / 3D on
+# score_*) never invalidate each other. Timestamps go in `stamp`: they
+# are written with a changed payload but are not part of the hash, so
+# e.g. meta.last_updated is the time the phase's output last changed.
+#
+# A payload is only skipped when the document still has every field it
+# sets ($exists on its paths), so fields cleared outside the writer are
+# rewritten. Values edited in place are not detected: run with
+# SCORE_WRITE_FORCE=1 after manual edits to rewrite everything.
+BATCH_SIZE = 1000
+IN_CHUNK = 500          # keys per $in query when reading stored hashes
+HASH_FIELD = "write_hash"
+
+
+def payload_hash(fields):
+    """
+    Stable digest of a $set payload (key order does not matter).
+    """
+    raw = json.dumps(fields, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+class ScoreWriter:
+    """
+    Batched, change-aware writer for one collection and phase:
+
+        writer = ScoreWriter(db["score_large_cap"], "3a", upsert=True)
+        writer.set(scheme_code, {"metrics.performance": ...}, stamp={"meta": ...})
+        stats = writer.flush()
+    """
+
+    def __init__(self, collection, phase, key="scheme_code", upsert=False,
+                 batch_size=BATCH_SIZE, force=None):
+        self.collection = collection
+        self.phase = phase
+        self.key = key
+        self.upsert = upsert
+        self.batch_size = batch_size
+        self.force = os.getenv("SCORE_WRITE_FORCE") == "1" if force is None else force
+        self.pending = {}
+
+    def set(self, code, fields, stamp=None):
+        # a later payload for the same key replaces the earlier one
+        self.pending[code] = (fields, stamp, payload_hash(fields))
+
+    def _stored_hashes(self, codes):
+        """
+        {code: stored hash} for documents that still hold every field
+        their queued payload sets; others are left out (rewritten).
+        """
+        field = f"{HASH_FIELD}.{self.phase}"
+        stored = {}
+
+        # payloads of one phase mostly share their field paths
+        by_paths = {}
+        for code in codes:
+            by_paths.setdefault(frozenset(self.pending[code][0]), []).append(code)
+
+        for paths, group in by_paths.items():
+            present = {p: {"$exists": True} for p in paths}
+            for i in range(0, len(group), IN_CHUNK):
+                cursor = self.collection.find(
+                    {self.key: {"$in": group[i:i + IN_CHUNK]}, **present},
+                    {self.key: 1, field: 1, "_id": 0}
+                )
+                for d in cursor:
+                    stored[d.get(self.key)] = (d.get(HASH_FIELD) or {}).get(self.phase)
+
+        return stored
+
+    def flush(self):
+        """
+        Writes every queued payload that changed. Returns write stats:
+        collection, queued, unchanged, written, matched, modified,
+        upserted, batches, seconds.
+        """
+        started = time.time()
+        codes = list(self.pending)
+        stored = {} if self.force else self._stored_hashes(codes)
+
+        stats = {
+            "collection": self.collection.name,
+            "queued": len(codes),
+            "unchanged": 0,
+            "written": 0,
+            "matched": 0,
+            "modified": 0,
+            "upserted": 0,
+            "batches": 0,
+        }
+
+        ops = []
+        for code in codes:
+            fields, stamp, digest = self.pending[code]
+            if stored.get(code) == digest:
+                stats["unchanged"] += 1
+                continue
+
+            update = dict(fields)
+            if stamp:
+                update.update(stamp)
+            update[f"{HASH_FIELD}.{self.phase}"] = digest
+
+            ops.append(UpdateOne({self.key: code}, {"$set": update}, upsert=self.upsert))
+            if len(ops) >= self.batch_size:
+                self._write(ops, stats)
+                ops = []
+
+        if ops:
+            self._write(ops, stats)
+
+        self.pending = {}
+        stats["seconds"] = round(time.time() - started, 3)
+        return stats
+
+    def _write(self, ops, stats):
+        result = self.collection.bulk_write(ops, ordered=False)
+        stats["written"] += len(ops)
+        stats["matched"] += result.matched_count
+        stats["modified"] += result.modified_count
+        stats["upserted"] += result.upserted_count
+        stats["batches"] += 1
+
+
+def write_summary(stats):
+    return (
+        f"Writes {stats['collection']}: {stats['written']} written, "
+        f"{stats['unchanged']} unchanged of {stats['queued']} "
+        f"({stats['upserted']} new, {stats['batches']} batches, {stats['seconds']:.2f}s)"
+    )
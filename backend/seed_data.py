@@ -5,6 +5,8 @@ from datetime import datetime, timedelta
 from pymongo import MongoClient
 import random
 
+from fund_index import with_category_key
+
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
@@ -56,7 +58,7 @@ funds = [
     },
 ]
 
-funds_col.insert_many(funds)
+funds_col.insert_many([with_category_key(f) for f in funds])
 
 scores = [
     {
@@ -1,19 +1,24 @@
 
 
-from fastapi import FastAPI, APIRouter, HTTPException, Cookie, Header, Response, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Cookie, Header, Response, UploadFile, File, Query
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
 import os
+import base64
 import logging
 from pathlib import Path
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone, timedelta
+from functools import partial
+from collections import OrderedDict
 import httpx
 import numpy as np
+import pandas as pd
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -21,11 +26,17 @@ from models import (
     Fund, User, UserSession, UserPreferences, UserWeightset,
     MetricsRaw, MetricsPercentiles, Metrics, ScoreCache
 )
-from scoring import (
-    calculate_daily_returns, calculate_std_dev, calculate_max_drawdown,
-    calculate_sharpe, calculate_sortino, calculate_beta,
-    calculate_information_ratio, calculate_treynor, calculate_rolling_return,
-    calculate_hit_ratio, percentile_rank, calculate_final_score
+from jobs import JobRunner
+from downsample import METHODS as DOWNSAMPLE_METHODS, downsample, align_as_of, rebase
+from session_cache import SessionCache, as_utc
+from fund_index import FUND_INDEXES, CATEGORY_KEY_EXPR, STALE_KEY, category_key
+from recompute import run_recompute
+from response_cache import ResponseCache, Uncached
+from fanout import LatencyRecorder, fan_out
+from api_response import FastJSONResponse, MessagePackMiddleware, CompressionMiddleware
+from rankings import (
+    RankingStore, BUCKETS as RANKING_BUCKETS, CATEGORIES as RANKING_CATEGORIES,
+    WEIGHT_PRESETS, weight_vector
 )
 print("MONGO_URL:", os.environ.get("MONGO_URL"))
 print("DB_NAME:", os.environ.get("DB_NAME"))
@@ -37,9 +48,14 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 api_router = APIRouter(prefix="/api")
 
+job_runner = JobRunner()
+session_cache = SessionCache()
+response_cache = ResponseCache()
+ranking_store = RankingStore()
+
 EMERGENT_AUTH_URL = "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"
 
 class LoginRequest(BaseModel):
@@ -63,15 +79,15 @@ async def get_current_user(session_token: Optional[str] = Cookie(None), authoriz
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
+    user = session_cache.get(token)
+    if user is not None:
+        return user
+    
     session_doc = await db.user_sessions.find_one({"session_token": token}, {"_id": 0})
     if not session_doc:
         raise HTTPException(status_code=401, detail="Invalid session")
     
-    expires_at = session_doc["expires_at"]
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at)
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    expires_at = as_utc(session_doc["expires_at"])
     
     if expires_at < datetime.now(timezone.utc):
         raise HTTPException(status_code=401, detail="Session expired")
@@ -83,7 +99,19 @@ async def get_current_user(session_token: Optional[str] = Cookie(None), authoriz
     if isinstance(user_doc.get('created_at'), str):
         user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
     
-    return User(**user_doc)
+    user = User(**user_doc)
+    session_cache.put(token, user, expires_at)
+    return user
+
+# Admin endpoints: signed-in users whose email is listed (comma
+# separated) in ADMIN_EMAILS. Empty -> nobody.
+ADMIN_EMAILS = {e.strip().lower() for e in os.environ.get("ADMIN_EMAILS", "").split(",") if e.strip()}
+
+async def require_admin(session_token: Optional[str] = Cookie(None), authorization: Optional[str] = Header(None)) -> User:
+    user = await get_current_user(session_token, authorization)
+    if user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
 
 @api_router.post("/auth/session")
 async def create_session_from_google(session_id: str, response: Response):
@@ -130,10 +158,11 @@ async def create_session_from_google(session_id: str, response: Response):
     user_session = {
         "user_id": user_id,
         "session_token": session_data.session_token,
-        "expires_at": expires_at.isoformat(),
+        "expires_at": expires_at,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
+    session_cache.invalidate_user(user_id)
     await db.user_sessions.delete_many({"user_id": user_id})
     await db.user_sessions.insert_one(user_session)
     
@@ -161,6 +190,7 @@ async def get_me(session_token: Optional[str] = Cookie(None), authorization: Opt
 @api_router.post("/auth/logout")
 async def logout(response: Response, session_token: Optional[str] = Cookie(None)):
     if session_token:
+        session_cache.invalidate(session_token)
         await db.user_sessions.delete_many({"session_token": session_token})
     
     response.delete_cookie(key="session_token", path="/")
@@ -168,21 +198,55 @@ async def logout(response: Response, session_token: Optional[str] = Cookie(None)
 
 from datetime import datetime, timedelta
 
+# Listing totals per (data version, category, min years, day); the
+# oldest are evicted past FUNDS_COUNT_CACHE_SIZE
+FUNDS_COUNT_CACHE_SIZE = int(os.environ.get("FUNDS_COUNT_CACHE_SIZE", "1000"))
+_funds_counts = OrderedDict()
+
+def _encode_cursor(fund_id):
+    return base64.urlsafe_b64encode(str(fund_id).encode()).decode()
+
+def _decode_cursor(cursor):
+    try:
+        return base64.b64decode(cursor.encode(), altchars=b"-_", validate=True).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _remember_total(count_key, total):
+    _funds_counts[count_key] = total
+    _funds_counts.move_to_end(count_key)
+    while len(_funds_counts) > FUNDS_COUNT_CACHE_SIZE:
+        _funds_counts.popitem(last=False)
+
+async def _funds_total(query, count_key):
+    total = _funds_counts.get(count_key)
+    if total is None:
+        total = await db.funds.count_documents(query)
+    _remember_total(count_key, total)
+    return total
+
 @app.get("/api/funds")
+@response_cache.route(lambda: db)
 async def get_funds(
     category: str | None = None,
     min_history_years: int = 0,
-    page: int = 1,
-    limit: int = 50,
+    page: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = None,
 ):
+    """
+    Funds ordered by fund_id.
+
+    - page mode (default): one $facet aggregation returns the page and
+      the total together
+    - keyset mode (cursor given, "" for the first page): an index range
+      scan after the previous page's last fund_id, so deep pages cost
+      the same as the first; follow next_cursor
+    """
     query = {}
 
     if category:
-     query["category"] = {
-        "$regex": f"^{category.replace(' ', '')}$",
-        "$options": "i"
-     }
-
+        query["category_key"] = category_key(category)
 
     if min_history_years and min_history_years > 0:
         cutoff_date = datetime.utcnow() - timedelta(days=365 * min_history_years)
@@ -192,53 +256,241 @@ async def get_funds(
             "$lte": cutoff_date
         }
 
-    cursor = (
-        db.funds
-        .find(query, {"_id": 0})
-        .skip((page - 1) * limit)
-        .limit(limit)
-    )
+    # the version changes with the data, the cutoff daily
+    count_key = (response_cache.version, query.get("category_key"), min_history_years, datetime.utcnow().date())
 
-    funds = await cursor.to_list(length=limit)
-    total = await db.funds.count_documents(query)
+    if cursor is not None:
+        page_query = dict(query)
+        if cursor:
+            page_query["fund_id"] = {"$gt": _decode_cursor(cursor)}
 
-    return {
+        funds = await (
+            db.funds
+            .find(page_query, {"_id": 0})
+            .sort("fund_id", 1)
+            .limit(limit + 1)
+            .to_list(length=limit + 1)
+        )
+        total = await _funds_total(query, count_key)
+    else:
+        result = await db.funds.aggregate([
+            {"$match": query},
+            {"$sort": {"fund_id": 1}},
+            {"$facet": {
+                "funds": [
+                    {"$skip": (page - 1) * limit},
+                    {"$limit": limit + 1},
+                    {"$project": {"_id": 0}}
+                ],
+                "total": [{"$count": "n"}]
+            }}
+        ]).to_list(length=1)
+
+        facet = result[0] if result else {"funds": [], "total": []}
+        funds = facet["funds"]
+        total = facet["total"][0]["n"] if facet["total"] else 0
+        _remember_total(count_key, total)
+
+    has_more = len(funds) > limit
+    funds = funds[:limit]
+
+    response = {
         "funds": funds,
         "total": total,
-        "page": page,
         "limit": limit,
+        "next_cursor": _encode_cursor(funds[-1]["fund_id"]) if has_more else None,
     }
+    if cursor is None:
+        response["page"] = page
+    return response
+
+# Detail page reads, run concurrently. fund and nav_history are required
+# (504 if they time out); the rest are optional and come back as null,
+# listed under "partial", when slow or failing. Seconds:
+FUND_DETAIL_TIMEOUTS = {
+    "fund": 2.0,
+    "nav_history": 3.0,
+    "metrics": 1.5,
+    "portfolio": 1.0,
+    "score": 1.0,
+}
+FUND_DETAIL_REQUIRED = ("fund", "nav_history")
+FUND_DETAIL_NAV_POINTS = 1825
+
+fund_detail_latency = LatencyRecorder()
 
 @api_router.get("/funds/{fund_id}")
+@response_cache.route(lambda: db)
 async def get_fund_detail(fund_id: str):
-    fund = await db.funds.find_one({"fund_id": fund_id}, {"_id": 0})
-    if not fund:
-        raise HTTPException(status_code=404, detail="Fund not found")
-    
-    nav_cursor = db.nav_history.find(
-        {"fund_id": fund_id},
-        {"_id": 0}
-    ).sort("date", -1).limit(1825)
-    nav_history = await nav_cursor.to_list(length=1825)
+    # per-read timings go to fund_detail_latency only: the body is cached
+    # and replayed to later requests, so it must not carry them
+    results, failures, _ = await fan_out({
+        "fund": db.funds.find_one({"fund_id": fund_id}, {"_id": 0}),
+        "nav_history": (
+            db.nav_history
+            .find({"fund_id": fund_id}, {"_id": 0, "date": 1, "nav": 1})
+            .sort("date", -1)
+            .limit(FUND_DETAIL_NAV_POINTS)
+            .to_list(length=FUND_DETAIL_NAV_POINTS)
+        ),
+        "metrics": db.metrics.find_one(
+            {"fund_id": fund_id},
+            {"_id": 0, "date": 1, "raw": 1, "percentiles": 1, "eligible_for_ranking": 1}
+        ),
+        "portfolio": db.portfolio_snapshots.find_one({"fund_id": fund_id}, {"_id": 0, "fund_id": 0}),
+        "score": db.score_cache.find_one(
+            {"fund_id": fund_id},
+            {"_id": 0, "date": 1, "final_score_default": 1, "bucket_scores": 1}
+        ),
+    }, FUND_DETAIL_TIMEOUTS, fund_detail_latency)
     
-    metrics_doc = await db.metrics.find_one({"fund_id": fund_id}, {"_id": 0})
+    for name in FUND_DETAIL_REQUIRED:
+        if name in failures:
+            raise HTTPException(status_code=504, detail=f"Fund detail {name} query {failures[name]}")
     
-    portfolio_doc = await db.portfolio_snapshots.find_one(
-        {"fund_id": fund_id},
-        {"_id": 0}
-    )
+    if not results["fund"]:
+        raise HTTPException(status_code=404, detail="Fund not found")
     
-    score_doc = await db.score_cache.find_one({"fund_id": fund_id}, {"_id": 0})
+    response = {
+        "fund": results["fund"],
+        "nav_history": results["nav_history"],
+        "metrics": results["metrics"],
+        "portfolio": results["portfolio"],
+        "score": results["score"],
+        "partial": sorted(failures),
+    }
     
-    return {
-        "fund": fund,
-        "nav_history": nav_history,
-        "metrics": metrics_doc,
-        "portfolio": portfolio_doc,
-        "score": score_doc
+    # a partial answer is sent but not cached
+    return Uncached(response) if failures else response
+
+@api_router.get("/admin/fund-detail-latency")
+async def get_fund_detail_latency(session_token: Optional[str] = Cookie(None), authorization: Optional[str] = Header(None)):
+    await require_admin(session_token, authorization)
+    return fund_detail_latency.stats()
+
+@api_router.get("/fund-card/{fund_key}")
+@response_cache.route(lambda: db)
+async def get_fund_card(fund_key: str):
+    """
+    Everything the fund detail page shows, in one indexed read of the
+    fund_card view (built by scoring/build_fund_card.py).
+    """
+    card = await db.fund_card.find_one({"fund_key": fund_key}, {"_id": 0})
+    if not card:
+        raise HTTPException(status_code=404, detail="Fund card not found")
+    
+    return card
+
+@api_router.get("/fund-card/scheme/{scheme_code}")
+@response_cache.route(lambda: db)
+async def get_fund_card_by_scheme(scheme_code: str):
+    card = await db.fund_card.find_one({"scheme_code": scheme_code}, {"_id": 0})
+    if not card:
+        raise HTTPException(status_code=404, detail="Fund card not found")
+    
+    return card
+
+NAV_SERIES_MAX_POINTS = 2000
+
+def _date_range(date_from, date_to):
+    """
+    Mongo filter on `date` for a from/to range. Dates are ISO strings in
+    some collections and native datetimes in others; BSON compares by
+    type first, so one range per type is needed.
+    """
+    if not date_from and not date_to:
+        return {}
+    ranges = []
+    for convert in (lambda d: d.date().isoformat(), lambda d: d.to_pydatetime()):
+        r = {}
+        if date_from:
+            r["$gte"] = convert(pd.Timestamp(date_from))
+        if date_to:
+            # inclusive of the whole `to` day
+            r["$lt"] = convert(pd.Timestamp(date_to) + pd.Timedelta(days=1))
+        ranges.append({"date": r})
+    return {"$or": ranges}
+
+async def _load_series(collection, query, value_field, date_from, date_to):
+    docs = await collection.find(
+        {**query, **_date_range(date_from, date_to)},
+        {"_id": 0, "date": 1, value_field: 1}
+    ).sort("date", 1).to_list(length=None)
+
+    frame = pd.DataFrame(docs, columns=["date", value_field])
+    frame["date"] = pd.to_datetime(frame["date"], errors="coerce", utc=True).dt.tz_localize(None)
+    frame[value_field] = pd.to_numeric(frame[value_field], errors="coerce")
+    frame = frame.dropna().sort_values("date", kind="stable")
+    return frame["date"].to_numpy(dtype="datetime64[ns]"), frame[value_field].to_numpy(dtype=np.float64)
+
+def _finite_list(values):
+    return [None if np.isnan(v) else round(float(v), 4) for v in values]
+
+@api_router.get("/funds/{fund_id}/nav")
+async def get_nav_series(
+    fund_id: str,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    max_points: int = Query(500, ge=3, le=NAV_SERIES_MAX_POINTS),
+    method: str = "lttb",
+    rebase_to_100: bool = Query(False, alias="rebase"),
+    benchmark: bool = False,
+):
+    """
+    Chart-ready NAV series as columnar arrays (dates[], navs[]),
+    downsampled server-side to at most max_points:
+    method=lttb (shape-preserving) or weekly / monthly (period closes).
+    benchmark=true adds the fund's benchmark sampled on the same dates;
+    rebase=true scales both to start at 100.
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise HTTPException(status_code=400, detail=f"method must be one of {', '.join(DOWNSAMPLE_METHODS)}")
+
+    fund = await db.funds.find_one({"fund_id": fund_id}, {"_id": 0, "benchmark": 1})
+    if not fund:
+        raise HTTPException(status_code=404, detail="Fund not found")
+
+    try:
+        dates, navs = await _load_series(db.nav_history, {"fund_id": fund_id}, "nav", date_from, date_to)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid from/to date")
+
+    idx = downsample(dates, navs, max_points, method)
+    out_navs = rebase(navs[idx]) if rebase_to_100 else navs[idx]
+
+    response = {
+        "fund_id": fund_id,
+        "dates": [str(d)[:10] for d in dates[idx].astype("datetime64[D]")],
+        "navs": _finite_list(out_navs),
+        "points": len(idx),
+        "source_points": len(navs),
+        "method": method,
+        "rebased": rebase_to_100,
     }
 
+    if benchmark:
+        bench_values = np.full(len(idx), np.nan)
+        if fund.get("benchmark") and len(idx):
+            # a little history before the first point for the as-of match
+            b_from = (pd.Timestamp(dates[idx[0]]) - pd.Timedelta(days=14)).date().isoformat()
+            b_dates, b_values = await _load_series(
+                db.benchmark_history, {"index": fund["benchmark"]}, "value",
+                b_from, date_to
+            )
+            bench_values = align_as_of(dates[idx], b_dates, b_values)
+            if rebase_to_100:
+                bench_values = rebase(bench_values)
+
+        response["benchmark"] = {
+            "name": fund.get("benchmark"),
+            "values": _finite_list(bench_values),
+        }
+
+    # plain lists / strings only: skip FastAPI's jsonable_encoder pass
+    return FastJSONResponse(response)
+
 @api_router.get("/metrics/{fund_id}")
+@response_cache.route(lambda: db)
 async def get_metrics(fund_id: str):
     metrics_doc = await db.metrics.find_one({"fund_id": fund_id}, {"_id": 0})
     if not metrics_doc:
@@ -254,155 +506,52 @@ async def update_preferences(preferences: UserPreferences, session_token: Option
         {"user_id": user.user_id},
         {"$set": {"preferences": preferences.model_dump()}}
     )
+    session_cache.invalidate_user(user.user_id)
     
     return {"message": "Preferences updated successfully"}
 
-@api_router.post("/admin/recompute")
+@api_router.post("/admin/recompute", status_code=202)
 async def trigger_recompute(min_history_years: int = 3, session_token: Optional[str] = Cookie(None), authorization: Optional[str] = Header(None)):
-    try:
-        user = await get_current_user(session_token, authorization)
-    except:
-        pass
-    
-    min_date = datetime.now(timezone.utc) - timedelta(days=min_history_years * 365)
+    await require_admin(session_token, authorization)
     
-    funds_cursor = db.funds.find(
-        {"inception_date": {"$lte": min_date.isoformat()}},
-        {"_id": 0}
+    # runs in the background; poll GET /api/admin/jobs/{job_id}
+    job, created = job_runner.submit(
+        "recompute",
+        partial(run_recompute, db),
+        min_history_years=min_history_years
     )
-    eligible_funds = await funds_cursor.to_list(length=1000)
-    
-    computed_count = 0
-    for fund in eligible_funds:
-        fund_id = fund["fund_id"]
-        
-        nav_cursor = db.nav_history.find(
-            {"fund_id": fund_id},
-            {"_id": 0}
-        ).sort("date", 1)
-        nav_history = await nav_cursor.to_list(length=10000)
-        
-        if len(nav_history) < min_history_years * 252:
-            continue
-        
-        nav_values = [n["nav"] for n in nav_history]
-        daily_returns = calculate_daily_returns(nav_values)
-        
-        last_year_returns = daily_returns[-252:] if len(daily_returns) >= 252 else daily_returns
-        
-        return_1y = calculate_rolling_return(nav_values[-1], nav_values[-252], 1) if len(nav_values) >= 252 else 0
-        return_3y = calculate_rolling_return(nav_values[-1], nav_values[-756], 3) if len(nav_values) >= 756 else 0
-        return_5y = calculate_rolling_return(nav_values[-1], nav_values[-1260], 5) if len(nav_values) >= 1260 else 0
-        
-        benchmark_cursor = db.benchmark_history.find(
-            {"index": fund["benchmark"]},
-            {"_id": 0}
-        ).sort("date", 1)
-        benchmark_history = await benchmark_cursor.to_list(length=10000)
-        benchmark_values = [b["value"] for b in benchmark_history]
-        benchmark_returns = calculate_daily_returns(benchmark_values)
-        
-        min_len = min(len(daily_returns), len(benchmark_returns))
-        fund_returns_aligned = daily_returns[-min_len:]
-        bench_returns_aligned = benchmark_returns[-min_len:]
-        
-        metrics_raw = MetricsRaw(
-            return_1y=return_1y,
-            return_3y=return_3y,
-            return_5y=return_5y,
-            rolling_3y_vs_category=return_3y,
-            rolling_5y_vs_category=return_5y,
-            hit_ratio_3y=50.0,
-            std_dev_1y=calculate_std_dev(last_year_returns),
-            max_drawdown=calculate_max_drawdown(nav_values[-252:]),
-            beta=calculate_beta(fund_returns_aligned, bench_returns_aligned),
-            sharpe=calculate_sharpe(last_year_returns),
-            sortino=calculate_sortino(last_year_returns),
-            information_ratio=calculate_information_ratio(return_1y, 0.1, fund_returns_aligned, bench_returns_aligned),
-            treynor=calculate_treynor(return_1y, calculate_beta(fund_returns_aligned, bench_returns_aligned)),
-            vol_skew=1.0
-        )
-        
-        metrics_doc = {
-            "fund_id": fund_id,
-            "date": datetime.now(timezone.utc).isoformat(),
-            "raw": metrics_raw.model_dump(),
-            "percentiles": {},
-            "eligible_for_ranking": True
-        }
-        
-        await db.metrics.update_one(
-            {"fund_id": fund_id},
-            {"$set": metrics_doc},
-            upsert=True
-        )
-        
-        computed_count += 1
-    
-    category_map = {}
-    for fund in eligible_funds:
-        cat = fund["category"]
-        if cat not in category_map:
-            category_map[cat] = []
-        category_map[cat].append(fund["fund_id"])
-    
-    for category, fund_ids in category_map.items():
-        metrics_cursor = db.metrics.find(
-            {"fund_id": {"$in": fund_ids}},
-            {"_id": 0}
-        )
-        all_metrics = await metrics_cursor.to_list(length=len(fund_ids))
-        
-        metric_names = ['return_1y', 'return_3y', 'return_5y', 'rolling_3y_vs_category', 
-                       'rolling_5y_vs_category', 'hit_ratio_3y', 'std_dev_1y', 'max_drawdown',
-                       'beta', 'sharpe', 'sortino', 'information_ratio', 'treynor', 'vol_skew']
-        
-        for metric_name in metric_names:
-            values = [m["raw"].get(metric_name) for m in all_metrics if m["raw"].get(metric_name) is not None]
-            
-            for metric_doc in all_metrics:
-                raw_value = metric_doc["raw"].get(metric_name)
-                if raw_value is not None:
-                    percentile = percentile_rank(raw_value, values)
-                    
-                    if metric_name in ['std_dev_1y', 'max_drawdown']:
-                        percentile = 100 - percentile
-                    
-                    if "percentiles" not in metric_doc:
-                        metric_doc["percentiles"] = {}
-                    metric_doc["percentiles"][metric_name] = percentile
-                    
-                    await db.metrics.update_one(
-                        {"fund_id": metric_doc["fund_id"]},
-                        {"$set": {"percentiles": metric_doc["percentiles"]}}
-                    )
-    
-    for fund in eligible_funds:
-        fund_id = fund["fund_id"]
-        metrics_doc = await db.metrics.find_one({"fund_id": fund_id}, {"_id": 0})
-        
-        if metrics_doc and "percentiles" in metrics_doc:
-            score_result = calculate_final_score(metrics_doc["percentiles"], {})
-            
-            score_cache = {
-                "fund_id": fund_id,
-                "date": datetime.now(timezone.utc).isoformat(),
-                "final_score_default": score_result["final_score"],
-                "bucket_scores": score_result["bucket_scores"]
-            }
-            
-            await db.score_cache.update_one(
-                {"fund_id": fund_id},
-                {"$set": score_cache},
-                upsert=True
-            )
     
     return {
-        "message": "Recompute triggered successfully",
-        "computed_funds": computed_count,
-        "total_eligible": len(eligible_funds)
+        "message": "Recompute queued" if created else "Recompute already in progress",
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "status_url": f"/api/admin/jobs/{job['job_id']}"
     }
 
+@api_router.get("/admin/jobs/{job_id}")
+async def get_job(job_id: str, session_token: Optional[str] = Cookie(None), authorization: Optional[str] = Header(None)):
+    await require_admin(session_token, authorization)
+    job = job_runner.store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job
+
+@api_router.get("/admin/session-cache")
+async def get_session_cache_stats(session_token: Optional[str] = Cookie(None), authorization: Optional[str] = Header(None)):
+    await require_admin(session_token, authorization)
+    return session_cache.stats()
+
+@api_router.get("/admin/response-cache")
+async def get_response_cache_stats(session_token: Optional[str] = Cookie(None), authorization: Optional[str] = Header(None)):
+    await require_admin(session_token, authorization)
+    return response_cache.stats()
+
+@api_router.get("/admin/single-flight")
+async def get_single_flight_stats(session_token: Optional[str] = Cookie(None), authorization: Optional[str] = Header(None)):
+    await require_admin(session_token, authorization)
+    return response_cache.flights.stats()
+
 @api_router.post("/admin/upload-factsheet")
 async def upload_factsheet(file: UploadFile = File(...), session_token: Optional[str] = Cookie(None), authorization: Optional[str] = Header(None)):
     try:
@@ -413,10 +562,93 @@ async def upload_factsheet(file: UploadFile = File(...), session_token: Optional
     return {"message": "Factsheet upload feature coming soon"}
 
 @api_router.get("/categories")
+@response_cache.route(lambda: db)
 async def get_categories():
     categories = await db.funds.distinct("category")
     return {"categories": categories}
 
+async def _ranking_weights(preset, weightset, custom, session_token, authorization):
+    """
+    {bucket: weight} from, in order: explicit bucket weights, a saved
+    weightset of the signed-in user, a preset.
+    """
+    if custom:
+        return "custom", custom
+
+    if weightset:
+        user = await get_current_user(session_token, authorization)
+        saved = user.preferences.saved_weights if user.preferences else []
+        for ws in saved:
+            if ws.name == weightset:
+                return f"saved:{ws.name}", ws.weights
+        raise HTTPException(status_code=404, detail=f"Weightset {weightset!r} not found")
+
+    if preset not in WEIGHT_PRESETS:
+        raise HTTPException(status_code=400, detail=f"Unknown preset, expected one of {sorted(WEIGHT_PRESETS)}")
+    return preset, WEIGHT_PRESETS[preset]
+
+@api_router.get("/rankings/{category}")
+async def get_rankings(
+    category: str,
+    preset: str = "balanced",
+    weightset: str | None = None,
+    consistency: float | None = None,
+    recent_performance: float | None = None,
+    risk: float | None = None,
+    valuation: float | None = None,
+    portfolio_quality: float | None = None,
+    page: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=500),
+    session_token: Optional[str] = Cookie(None),
+    authorization: Optional[str] = Header(None),
+):
+    """
+    Category funds ranked by overall score for a preset, a saved
+    weightset (?weightset=<name>, needs a session) or explicit bucket
+    weights (?consistency=..&risk=..; unset buckets weigh 0).
+    Served from the in-memory RankingStore.
+    """
+    label = RANKING_CATEGORIES.get(category)
+    if label is None:
+        raise HTTPException(status_code=400, detail="Invalid category")
+
+    ranking = ranking_store.get(label)
+    if ranking is None:
+        raise HTTPException(status_code=404, detail="No rankings published for this category")
+
+    custom = {
+        name: value for name, value in {
+            "consistency": consistency,
+            "recent_performance": recent_performance,
+            "risk": risk,
+            "valuation": valuation,
+            "portfolio_quality": portfolio_quality,
+        }.items() if value is not None
+    }
+    source, weights = await _ranking_weights(preset, weightset, custom, session_token, authorization)
+    try:
+        w = weight_vector(weights)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    offset = (page - 1) * limit
+    scores, order = ranking.rank(w, offset, limit)
+
+    return {
+        "category": label,
+        "weights": {"source": source, **dict(zip(RANKING_BUCKETS, w.tolist()))},
+        "funds": [ranking.row(i, scores[i], offset + n + 1) for n, i in enumerate(order)],
+        "total": len(ranking),
+        "page": page,
+        "limit": limit,
+        "published_at": ranking.published_at,
+    }
+
+@api_router.get("/admin/rankings")
+async def get_rankings_stats(session_token: Optional[str] = Cookie(None), authorization: Optional[str] = Header(None)):
+    await require_admin(session_token, authorization)
+    return ranking_store.stats()
+
 app.include_router(api_router)
 
 app.add_middleware(
@@ -426,6 +658,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MessagePackMiddleware)
+app.add_middleware(CompressionMiddleware)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -433,8 +667,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def ensure_fund_indexes():
+    for keys in FUND_INDEXES:
+        await db.funds.create_index(keys)
+    await db.funds.update_many(STALE_KEY, [{"$set": {"category_key": CATEGORY_KEY_EXPR}}])
+
+@app.on_event("startup")
+async def ensure_session_indexes():
+    # expires_at is a native datetime: Mongo's TTL monitor purges expired
+    # sessions. Older sessions stored it as an ISO string; convert those.
+    legacy = await db.user_sessions.find(
+        {"expires_at": {"$type": "string"}},
+        {"_id": 1, "expires_at": 1}
+    ).to_list(length=None)
+    if legacy:
+        await db.user_sessions.bulk_write([
+            UpdateOne({"_id": s["_id"]}, {"$set": {"expires_at": as_utc(s["expires_at"])}})
+            for s in legacy
+        ], ordered=False)
+    await db.user_sessions.create_index("expires_at", expireAfterSeconds=0)
+    await db.user_sessions.create_index("session_token")
+
+@app.on_event("startup")
+async def load_rankings():
+    # full load now, then reload whatever publish_log says was republished
+    await ranking_store.refresh(db)
+    ranking_store.start(db)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await ranking_store.stop()
+    await job_runner.shutdown()
     client.close()
 @app.get("/debug/categories")
 async def debug_categories():
@@ -0,0 +1,81 @@
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+# =========================
+# SESSION CACHE
+# =========================
+# Token -> User cache in front of user_sessions + users, so an
+# authenticated request normally costs no database round trip.
+#
+# An entry lives until the session expires or SESSION_CACHE_TTL seconds
+# pass, whichever is first; the least recently used entries are evicted
+# beyond SESSION_CACHE_SIZE. Logout / login / profile writes invalidate
+# entries in this process; other workers catch up within the TTL.
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "60"))
+
+
+def as_utc(value):
+    """
+    Native UTC datetime from a stored expiry (datetime or ISO string).
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class SessionCache:
+
+    def __init__(self, max_size=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token):
+        entry = self.entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        user, expires_at, cached_until = entry
+        if cached_until <= time.monotonic() or expires_at <= datetime.now(timezone.utc):
+            del self.entries[token]
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(token)
+        self.hits += 1
+        return user
+
+    def put(self, token, user, expires_at):
+        self.entries[token] = (user, as_utc(expires_at), time.monotonic() + self.ttl)
+        self.entries.move_to_end(token)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, token):
+        self.entries.pop(token, None)
+
+    def invalidate_user(self, user_id):
+        for token in [t for t, e in self.entries.items() if e[0].user_id == user_id]:
+            del self.entries[token]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups * 100, 1) if lookups else 0.0,
+        }
@@ -0,0 +1,81 @@
+import asyncio
+import os
+
+# =========================
+# SINGLE-FLIGHT
+# =========================
+# Concurrent calls with the same key share one in-flight computation:
+# the first caller starts it, later callers await the same result (or
+# exception). With a cold response cache, a burst of identical requests
+# then runs the underlying Mongo queries once instead of once each.
+#
+# The computation runs as its own task, so a caller that goes away
+# (client disconnect) does not cancel it for the others. At most
+# SINGLE_FLIGHT_MAX_WAITERS callers queue behind one key; beyond that
+# do() raises SingleFlightFull.
+SINGLE_FLIGHT_MAX_WAITERS = int(os.getenv("SINGLE_FLIGHT_MAX_WAITERS", "1000"))
+
+
+class SingleFlightFull(Exception):
+    pass
+
+
+class SingleFlight:
+
+    def __init__(self, max_waiters=SINGLE_FLIGHT_MAX_WAITERS):
+        self.max_waiters = max_waiters
+        self.inflight = {}
+        self.waiters = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.max_waiters_seen = 0
+
+    async def do(self, key, fn):
+        """
+        Result of fn() (an async callable), shared with every concurrent
+        caller using the same key.
+        """
+        task = self.inflight.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self.inflight[key] = task
+            self.waiters[key] = 0
+            task.add_done_callback(lambda t: self._done(key, t))
+            self.executed += 1
+            return await asyncio.shield(task)
+
+        if self.waiters[key] >= self.max_waiters:
+            self.rejected += 1
+            raise SingleFlightFull(f"{self.max_waiters} callers already waiting on {key!r}")
+
+        self.waiters[key] += 1
+        self.coalesced += 1
+        self.max_waiters_seen = max(self.max_waiters_seen, self.waiters[key])
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if self.inflight.get(key) is task:
+                self.waiters[key] -= 1
+
+    def _done(self, key, task):
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+            del self.waiters[key]
+        # mark the exception retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        calls = self.executed + self.coalesced
+        return {
+            "inflight": len(self.inflight),
+            "waiting": sum(self.waiters.values()),
+            "max_waiters": self.max_waiters,
+            "max_waiters_seen": self.max_waiters_seen,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "coalesced_rate": round(self.coalesced / calls * 100, 1) if calls else 0.0,
+        }
@@ -184,12 +184,22 @@ class MutualFundScreenerTester:
             "Admin Recompute Trigger",
             "POST",
             "admin/recompute?min_history_years=3",
-            200
+            202
         )
         
         if recompute_result:
             print(f"   Recompute result: {recompute_result.get('message', 'No message')}")
-            print(f"   Computed funds: {recompute_result.get('computed_funds', 'N/A')}")
+            print(f"   Job id: {recompute_result.get('job_id', 'N/A')}")
+            
+            # Recompute runs in the background: check its job status
+            job_result = self.run_test(
+                "Admin Recompute Job Status",
+                "GET",
+                f"admin/jobs/{recompute_result.get('job_id')}",
+                200
+            )
+            if job_result:
+                print(f"   Job status: {job_result.get('status')} ({job_result.get('stage')})")
 
     def test_user_preferences(self):
         """Test user preferences endpoints"""